@@ -6,10 +6,15 @@ Estructura refactorizada con separación de responsabilidades
 
 import os
 import json
-from flask import Flask, Response
+from flask import Flask, Response, request, g
 from flask_cors import CORS
-from src.config.settings import SERVER_CONFIG
+from src.config.settings import SERVER_CONFIG, LOGGING_CONFIG, PROFILING_CONFIG, CASSETTE_CONFIG
 from src.routers.agent_routes import agent_bp
+from src.utils.logger import setup_logging, start_request
+from src.utils.profiler import request_profiling
+from src.utils.cassette import RECORD, REPLAY, new_cassette_name, request_cassette
+
+setup_logging(LOGGING_CONFIG['level'], LOGGING_CONFIG['json'])
 
 app = Flask(__name__)
 CORS(app)  # Permitir CORS para conectar con el frontend
@@ -25,6 +30,38 @@ class UTF8JSONEncoder(json.JSONEncoder):
 
 app.json_encoder = UTF8JSONEncoder
 
+# Id de correlación por petición (cabecera X-Request-ID), traza detallada y perfilado muestreados
+@app.before_request
+def bind_request_context():
+    g.request_id = start_request(
+        request.headers.get('X-Request-ID'),
+        force_trace=request.headers.get('X-Trace') == '1',
+        sample_rate=LOGGING_CONFIG['trace_sample_rate']
+    )
+    request_profiling(request.headers.get('X-Profile') == '1', PROFILING_CONFIG['sample_rate'])
+    # Solo con CASSETTE_HEADERS_ENABLED (entornos de prueba):
+    # X-Cassette-Record: 1 graba la petición en un cassette con nombre del servidor (cabecera X-Cassette-Name);
+    # X-Cassette-Replay: <nombre> la reproduce sin red (X-Cassette-Latency: 0 para no esperar)
+    if not CASSETTE_CONFIG['allow_headers']:
+        request_cassette(None)
+    elif request.headers.get('X-Cassette-Replay'):
+        latency = request.headers.get('X-Cassette-Latency')
+        request_cassette(REPLAY, request.headers['X-Cassette-Replay'],
+                         float(latency) if latency and latency.replace('.', '', 1).isdigit() else None)
+    elif request.headers.get('X-Cassette-Record') == '1':
+        g.cassette_name = new_cassette_name()
+        request_cassette(RECORD, g.cassette_name)
+    else:
+        request_cassette(None)
+
+@app.after_request
+def add_request_id_header(response):
+    if 'request_id' in g:
+        response.headers['X-Request-ID'] = g.request_id
+    if 'cassette_name' in g:
+        response.headers['X-Cassette-Name'] = g.cassette_name
+    return response
+
 # Registrar los blueprints (rutas)
 app.register_blueprint(agent_bp)
 
@@ -51,6 +88,16 @@ if __name__ == '__main__':
     print(f"   - POST /agent/query")
     print(f"   - POST /agent/suggestions")
     print(f"   - POST /agent/generate-news")
+    print(f"   - POST /agent/generate-news-async")
+    print(f"   - POST /agent/jobs")
+    print(f"   - GET  /agent/jobs/<job_id>")
+    print(f"   - GET  /agent/profiles")
+    print(f"   - GET  /agent/metrics/llm")
+    print(f"   - GET  /agent/metrics/admission")
+    print(f"   - GET  /agent/metrics/cache")
+    print(f"   - GET  /agent/articles")
+    print(f"   - GET  /agent/articles/<id>")
+    print(f"   - POST /agent/articles/<id>/derivatives")
     
     app.run(
         host=SERVER_CONFIG['host'],
@@ -1,9 +1,9 @@
 from crewai import Agent
 from src.config.settings import get_llm
+from src.utils.logger import trace_enabled
 
-llm = get_llm()
 
-def create_critic_agent():
+def create_critic_agent(llm=None):
     """
     Crea y retorna un agente Critic (Analista de Sesgos) configurado
     
@@ -15,6 +15,9 @@ def create_critic_agent():
     - Solicitar corrección o más fuentes
     - Aprobar hechos cuando cumplan estándares de calidad
     
+    Args:
+        llm: LLM a usar (por defecto, el perfil de la etapa 'critique')
+        
     Returns:
         Agent: Un agente Critic configurado con el LLM
     """
@@ -29,6 +32,6 @@ def create_critic_agent():
             'los hechos para pasar a la siguiente fase. Tu rigor analítico garantiza que solo se publiquen noticias '
             'con información verificada y libre de sesgos.'
         ),
-        llm=llm,
-        verbose=True
+        llm=llm or get_llm('critique'),
+        verbose=trace_enabled()
     )
@@ -1,9 +1,9 @@
 from crewai import Agent
 from src.config.settings import get_llm
+from src.utils.logger import trace_enabled
 
-llm = get_llm()
 
-def create_manager_agent():
+def create_manager_agent(llm=None):
     """
     Crea y retorna un agente Manager (Jefe de Redacción) configurado
     
@@ -15,6 +15,9 @@ def create_manager_agent():
     - Realizar revisión final
     - Publicar noticia
     
+    Args:
+        llm: LLM a usar (por defecto, el perfil de la etapa 'planning')
+        
     Returns:
         Agent: Un agente Manager configurado con el LLM
     """
@@ -28,7 +31,7 @@ def create_manager_agent():
             'delegar tareas específicas a los miembros del equipo, revisar el trabajo final y aprobar '
             'la publicación. Tienes una visión estratégica y capacidad de coordinación excepcional.'
         ),
-        llm=llm,
-        verbose=True,
+        llm=llm or get_llm('planning'),
+        verbose=trace_enabled(),
         allow_delegation=True
     )
@@ -1,9 +1,9 @@
 from crewai import Agent
 from src.config.settings import get_llm
+from src.utils.logger import trace_enabled
 
-llm = get_llm()
 
-def create_watchdog_agent():
+def create_watchdog_agent(llm=None):
     """
     Crea y retorna un agente Watchdog (Investigador) configurado
     
@@ -13,6 +13,9 @@ def create_watchdog_agent():
     - Entregar informe preliminar
     - Replanificar análisis si se detectan problemas (backtracking)
     
+    Args:
+        llm: LLM a usar (por defecto, el perfil de la etapa 'investigation')
+        
     Returns:
         Agent: Un agente Watchdog configurado con el LLM
     """
@@ -27,7 +30,7 @@ def create_watchdog_agent():
             'hasta alcanzar el umbral de calidad requerido. Tienes una gran capacidad de análisis y '
             'experiencia en evaluación de fuentes periodísticas.'
         ),
-        llm=llm,
-        verbose=True,
+        llm=llm or get_llm('investigation'),
+        verbose=trace_enabled(),
         allow_delegation=False
     )
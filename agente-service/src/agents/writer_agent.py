@@ -1,9 +1,9 @@
 from crewai import Agent
 from src.config.settings import get_llm
+from src.utils.logger import trace_enabled
 
-llm = get_llm()
 
-def create_writer_agent():
+def create_writer_agent(llm=None):
     """
     Crea y retorna un agente Writer (Redactor) configurado
     
@@ -13,6 +13,9 @@ def create_writer_agent():
     - Formatear salida
     - Preparar la noticia para revisión final
     
+    Args:
+        llm: LLM a usar (por defecto, el perfil de la etapa 'writing')
+        
     Returns:
         Agent: Un agente Writer configurado con el LLM
     """
@@ -26,6 +29,6 @@ def create_writer_agent():
             'objetiva, y formatear la salida según los estándares periodísticos. Tu estilo es claro, preciso y '
             'libre de opiniones personales, presentando solo los hechos verificados de manera equilibrada.'
         ),
-        llm=llm,
-        verbose=True
+        llm=llm or get_llm('writing'),
+        verbose=trace_enabled()
     )
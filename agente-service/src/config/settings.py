@@ -1,9 +1,10 @@
 import os
-from langchain_openai import ChatOpenAI
+from functools import lru_cache
 from src.utils.env_loader import get_openai_api_key
+from src.utils.llm_metrics import PromptCacheCallback
 
-# Configurar la API key de OpenAI
-os.environ["OPENAI_API_KEY"] = get_openai_api_key()
+# Configurar la API key de OpenAI (puede faltar si se usa el modelo falso)
+os.environ["OPENAI_API_KEY"] = get_openai_api_key() or ""
 
 # Configuración del LLM
 LLM_CONFIG = {
@@ -11,17 +12,378 @@ LLM_CONFIG = {
     "temperature": 0.7
 }
 
-def get_llm():
-    """Crea y retorna una instancia del LLM configurado"""
+# Proveedor del LLM: "openai" o "fake" (modelo local de respuestas fijas para pruebas)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai")
+
+# Perfiles de modelo disponibles. expected_latency es la duración típica (s) de una etapa;
+# max_tokens es el límite de salida de las llamadas sin presupuesto de etapa (STAGE_OUTPUT_BUDGETS)
+MODEL_PROFILES = {
+    "fast": {
+        "model": os.getenv("MODEL_FAST", "gpt-4o-mini"),
+        "temperature": 0.3,
+        "max_tokens": 1000,
+        "timeout": 30,
+        "expected_latency": 10
+    },
+    "balanced": {
+        "model": os.getenv("MODEL_BALANCED", "gpt-4o-mini"),
+        "temperature": 0.7,
+        "max_tokens": 1500,
+        "timeout": 60,
+        "expected_latency": 20
+    },
+    "quality": {
+        "model": os.getenv("MODEL_QUALITY", "gpt-4o"),
+        "temperature": 0.7,
+        "max_tokens": 2000,
+        "timeout": 90,
+        "expected_latency": 45
+    }
+}
+
+# Perfil por etapa del flujo según el nivel de la solicitud
+STAGE_ROUTING = {
+    "economy": {
+        "planning": "fast",
+        "investigation": "fast",
+        "critique": "fast",
+        "reinvestigation": "fast",
+        "writing": "fast",
+        "final_review": "fast",
+        "repair": "fast",
+        "derivative": "fast"
+    },
+    "standard": {
+        "planning": "fast",
+        "investigation": "balanced",
+        "critique": "fast",
+        "reinvestigation": "balanced",
+        "writing": "quality",
+        "final_review": "balanced",
+        "repair": "fast",
+        "derivative": "fast"
+    },
+    "premium": {
+        "planning": "balanced",
+        "investigation": "quality",
+        "critique": "balanced",
+        "reinvestigation": "quality",
+        "writing": "quality",
+        "final_review": "quality",
+        "repair": "balanced",
+        "derivative": "balanced"
+    }
+}
+
+# Perfil más barato/rápido al que se degrada cuando el SLO de latencia está en riesgo
+FALLBACK_PROFILE = {
+    "quality": "balanced",
+    "balanced": "fast"
+}
+
+# Tiempo objetivo (s) de una generación completa
+LATENCY_SLO_SECONDS = int(os.getenv("LATENCY_SLO_SECONDS", 180))
+
+# Presupuesto de salida por etapa. max_tokens limita la generación de la etapa con
+# cualquier perfil (sustituye al del perfil: una etapa que escribe el artículo completo no
+# puede quedar cortada por el perfil rápido de economy o del recorte por plazo);
+# context_chars limita el plan que se reinyecta en los prompts posteriores.
+STAGE_OUTPUT_BUDGETS = {
+    "planning": {"max_tokens": 400, "context_chars": 1200},
+    "investigation": {"max_tokens": 1200},
+    "critique": {"max_tokens": 500},
+    "reinvestigation": {"max_tokens": 1200},
+    "writing": {"max_tokens": 1800},
+    "final_review": {"max_tokens": 1900},
+    "repair": {"max_tokens": 1900},
+    "derivative": {"max_tokens": 1900}
+}
+
+# Respuestas del modelo falso. Las respuestas siguen el formato que espera el parser de CrewAI
+FAKE_LLM_RESPONSES = [
+    "Thought: Tengo toda la información necesaria.\n"
+    "Final Answer: CODE02\n"
+    "<article><header><h1>Noticia de prueba</h1><p class=\"entradilla\">Entradilla de prueba</p></header>"
+    "<section class=\"cuerpo\"><p>Cuerpo de prueba.</p></section>"
+    "<footer><p class=\"conclusion\">Conclusión</p><div class=\"fuentes\"><h3>Fuentes:</h3>"
+    "<ul><li>Fuente de prueba</li></ul></div></footer></article>"
+]
+
+
+def select_model_profile(stage: str, tier: str = "standard", remaining_seconds: float = None) -> str:
+    """
+    Elige el perfil de modelo para una etapa
+
+    Args:
+        stage: Etapa del flujo (planning, investigation, critique, writing...)
+        tier: Nivel de la solicitud (economy, standard, premium)
+        remaining_seconds: Tiempo restante dentro del SLO; si el perfil elegido no
+            cabe, se degrada a uno más rápido
+
+    Returns:
+        str: Nombre del perfil en MODEL_PROFILES
+    """
+    routing = STAGE_ROUTING.get(tier) or STAGE_ROUTING["standard"]
+    profile = routing.get(stage, "balanced")
+    if remaining_seconds is not None:
+        while profile in FALLBACK_PROFILE and MODEL_PROFILES[profile]["expected_latency"] > remaining_seconds:
+            profile = FALLBACK_PROFILE[profile]
+    return profile
+
+
+def stage_max_tokens(stage: str, profile: str) -> int:
+    """Límite de salida de una etapa: su presupuesto en STAGE_OUTPUT_BUDGETS o, si no tiene, el del perfil"""
+    return STAGE_OUTPUT_BUDGETS.get(stage, {}).get("max_tokens") or MODEL_PROFILES[profile]["max_tokens"]
+
+
+@lru_cache(maxsize=None)
+def _build_llm(profile: str, max_tokens: int = None):
+    """Crea (una sola vez por proceso) el cliente LLM de un perfil y límite de salida"""
+    if LLM_PROVIDER == "fake":
+        from langchain_core.language_models.fake_chat_models import FakeListChatModel
+        return FakeListChatModel(responses=FAKE_LLM_RESPONSES)
+    # Se importa al crear el primer cliente: leer la configuración no necesita el SDK del proveedor
+    from langchain_openai import ChatOpenAI
+
+    if profile == "default":
+        return ChatOpenAI(
+            model=LLM_CONFIG["model"],
+            temperature=LLM_CONFIG["temperature"],
+            callbacks=[PromptCacheCallback()]
+        )
+    config = MODEL_PROFILES[profile]
     return ChatOpenAI(
-        model=LLM_CONFIG["model"],
-        temperature=LLM_CONFIG["temperature"]
+        model=config["model"],
+        temperature=config["temperature"],
+        max_tokens=max_tokens or config["max_tokens"],
+        request_timeout=config["timeout"],
+        # Registra los tokens servidos desde el cache de prefijos del proveedor
+        callbacks=[PromptCacheCallback()]
     )
 
+
+def get_llm(stage: str = None, tier: str = "standard", remaining_seconds: float = None):
+    """
+    Retorna el LLM configurado
+
+    Sin etapa retorna el modelo por defecto (LLM_CONFIG); con etapa usa el
+    perfil elegido por select_model_profile y el presupuesto de salida de la etapa.
+    """
+    if stage is None:
+        return _build_llm("default")
+    profile = select_model_profile(stage, tier, remaining_seconds)
+    return _build_llm(profile, stage_max_tokens(stage, profile))
+
 # Configuración del servidor
 SERVER_CONFIG = {
     "host": "0.0.0.0",
     "port": int(os.getenv("PORT", 5000)),
-    "debug": True
+    "debug": True,
+    # Hilos del loop compartido de /generate-news-async para las llamadas bloqueantes (crítica, reinvestigación)
+    "async_executor_workers": int(os.getenv("ASYNC_EXECUTOR_WORKERS", 32))
+}
+
+
+# Configuración del motor de recuperación (fan-out de búsquedas)
+RETRIEVAL_CONFIG = {
+    "max_variants": 2,            # Variantes de consulta derivadas del plan/crítica
+    "min_quality_sources": 6,     # Fuentes de calidad necesarias para cortar antes
+    "max_articles": 10,           # Artículos que pasan al prompt
+    "scraper_max_results": 3,
+    "title_similarity": 0.85,     # Umbral para considerar dos títulos el mismo artículo
+    "timeout": int(os.getenv("RETRIEVAL_TIMEOUT", 90)),
+    # Hilos de búsqueda compartidos por todas las peticiones (cada retrieve lanza hasta 7 búsquedas)
+    "executor_workers": int(os.getenv("RETRIEVAL_EXECUTOR_WORKERS", 32))
+}
+
+
+# Cola de trabajos distribuida (varios nodos trabajadores)
+DISTRIBUTED_CONFIG = {
+    "redis_url": os.getenv("REDIS_URL"),   # Sin REDIS_URL se usa el broker en memoria del proceso
+    "nodes": [n.strip() for n in os.getenv("WORKER_NODES", "local").split(",") if n.strip()],
+    "virtual_nodes": 100,                  # Réplicas de cada nodo en el anillo de hashing
+    "result_ttl": int(os.getenv("JOB_RESULT_TTL", 86400)),
+    "broker_retry_max_seconds": 30         # Espera máxima entre reintentos si el broker falla
+}
+
+
+# Logging estructurado
+LOGGING_CONFIG = {
+    "level": os.getenv("LOG_LEVEL", "INFO"),
+    "json": os.getenv("LOG_FORMAT", "json").lower() == "json",
+    # Fracción de peticiones con la salida detallada de CrewAI (o cabecera X-Trace: 1)
+    "trace_sample_rate": float(os.getenv("LOG_TRACE_SAMPLE_RATE", 0.0))
+}
+
+
+# Perfilado bajo demanda (cabecera X-Profile: 1 o muestreo)
+PROFILING_CONFIG = {
+    "sample_rate": float(os.getenv("PROFILE_SAMPLE_RATE", 0.0)),
+    "dir": os.getenv("PROFILE_DIR", "profiles"),
+    "interval": 0.005,      # Segundos entre muestras de pila
+    "top_n": 25             # Pilas y líneas de asignación en el resumen
+}
+
+
+# Prefiltro de fiabilidad de fuentes (antes de la crítica con LLM)
+SOURCE_RELIABILITY_CONFIG = {
+    "table_path": os.getenv(
+        "SOURCE_RELIABILITY_TABLE",
+        os.path.join(os.path.dirname(__file__), "source_reliability.json")
+    ),
+    "reliable_score": 0.7,        # Puntuación a partir de la cual una fuente cuenta como fiable
+    "min_reliable_sources": 3,    # Fuentes fiables distintas necesarias para aprobar sin LLM
+    "reject_threshold": 0.4,      # Por debajo, se vuelve a buscar (CODE01) sin consultar al Critic
+    "top_k": 5                    # Fuentes mejor puntuadas que cuentan para la media
+}
+
+
+# Plazo por petición (cabecera X-Request-Timeout o campo "deadline_seconds" del body)
+DEADLINE_CONFIG = {
+    "default_seconds": LATENCY_SLO_SECONDS,
+    "min_seconds": 10,
+    "max_seconds": int(os.getenv("MAX_REQUEST_DEADLINE", 600)),
+    "retrieval_share": 0.3,          # Fracción del tiempo restante para cada ronda de búsqueda
+    "critique_cycle_seconds": 45,    # Coste estimado de una ronda extra (búsqueda + reinvestigación + crítica)
+    "writing_reserve_seconds": 40    # Tiempo reservado para redacción, revisión y validación
+}
+
+
+# Archivo de artículos generados (sqlite con el HTML comprimido)
+ARCHIVE_CONFIG = {
+    "db_path": os.getenv("ARCHIVE_DB", os.path.join("data", "articles.sqlite3")),
+    # gzip se sirve tal cual con Content-Encoding; zstd (requiere zstandard) ocupa menos en disco
+    "codec": os.getenv("ARCHIVE_CODEC", "gzip").lower(),
+    "compression_level": 6,
+    "list_limit": 50,
+    "max_age": 3600      # Cache-Control de los artículos (no cambian una vez guardados)
+}
+
+
+# Crítica incremental: tras un CODE01 el Critic recibe solo los cambios del informe y sus problemas abiertos
+INCREMENTAL_CRITIQUE_CONFIG = {
+    "enabled": os.getenv("INCREMENTAL_CRITIQUE", "true").lower() == "true",
+    # Si los cambios superan esta fracción del informe nuevo, se critica el informe completo
+    "max_diff_ratio": 0.7
+}
+
+
+# Grabación/reproducción de las llamadas al LLM y HTTP (cabeceras X-Cassette-Record / X-Cassette-Replay)
+CASSETTE_CONFIG = {
+    "dir": os.getenv("CASSETTE_DIR", "cassettes"),
+    # Las cabeceras X-Cassette-* solo se atienden en entornos de prueba: cualquiera podría
+    # reproducir interacciones grabadas de otras peticiones
+    "allow_headers": os.getenv("CASSETTE_HEADERS_ENABLED", "false").lower() == "true",
+    # Modo para todas las peticiones (record o replay), p. ej. en pruebas de rendimiento sin red
+    "mode": os.getenv("CASSETTE_MODE"),
+    "name": os.getenv("CASSETTE_NAME"),
+    # En reproducción: 1.0 = latencias originales, 0 = sin esperas
+    "latency_scale": float(os.getenv("CASSETTE_LATENCY_SCALE", 1.0))
 }
 
+
+def _parse_weights(value: str) -> dict:
+    """"cliente-a=3,cliente-b=0.5" -> {"cliente-a": 3.0, "cliente-b": 0.5}"""
+    weights = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() and weight.strip():
+            weights[name.strip()] = float(weight)
+    return weights
+
+
+def _parse_api_keys(value: str) -> dict:
+    """"cliente-a=clave1,cliente-b=clave2" -> {"clave1": "cliente-a", "clave2": "cliente-b"}"""
+    keys = {}
+    for item in value.split(","):
+        name, _, key = item.partition("=")
+        if name.strip() and key.strip():
+            keys[key.strip()] = name.strip()
+    return keys
+
+
+# Control de admisión por cliente (X-API-Key, X-Client-ID o IP) delante de /generate-news
+ADMISSION_CONFIG = {
+    "enabled": os.getenv("ADMISSION_ENABLED", "true").lower() == "true",
+    "max_concurrent": int(os.getenv("ADMISSION_MAX_CONCURRENT", 8)),          # Generaciones simultáneas del proceso
+    "per_client_concurrency": int(os.getenv("ADMISSION_CLIENT_CONCURRENCY", 2)),
+    "rate_per_minute": float(os.getenv("ADMISSION_RATE_PER_MINUTE", 20)),
+    "burst": int(os.getenv("ADMISSION_BURST", 5)),
+    "max_queue_per_client": int(os.getenv("ADMISSION_MAX_QUEUE", 10)),
+    "max_wait_seconds": float(os.getenv("ADMISSION_MAX_WAIT", 60)),
+    # Pesos de la cola justa por nombre de cliente (el de su API key o su X-Client-ID)
+    "weights": _parse_weights(os.getenv("ADMISSION_WEIGHTS", "")),
+    "default_weight": 1.0,
+    # Solo las API keys configuradas identifican a un cliente; cualquier otra petición cuenta por su IP
+    "api_keys": _parse_api_keys(os.getenv("ADMISSION_API_KEYS", "")),
+    # X-Client-ID solo se acepta detrás de un proxy que autentica al cliente y fija la cabecera
+    "trust_client_id": os.getenv("ADMISSION_TRUST_CLIENT_ID", "false").lower() == "true",
+    # Clientes sin actividad que se olvidan (con el bucket lleno) y máximo de clientes recordados
+    "client_idle_seconds": float(os.getenv("ADMISSION_CLIENT_IDLE", 600)),
+    "max_clients": int(os.getenv("ADMISSION_MAX_CLIENTS", 10000)),
+    "initial_service_seconds": LATENCY_SLO_SECONDS / 2
+}
+
+
+# Hechos validados (CODE02) reutilizables entre artículos
+FACT_STORE_CONFIG = {
+    "enabled": os.getenv("FACT_STORE_ENABLED", "true").lower() == "true",
+    "db_path": os.getenv("FACT_STORE_DB", os.path.join("data", "facts.sqlite3")),
+    "max_facts_per_report": 20,
+    "max_facts_injected": 8,       # Hechos que se añaden a la tarea de investigación
+    "max_age_days": float(os.getenv("FACT_MAX_AGE_DAYS", 30)),
+    "max_sources_per_fact": 3,
+    "min_source_overlap": 2,       # Términos de la afirmación que debe compartir un artículo para respaldarla
+    "min_fact_chars": 40,
+    "max_fact_chars": 320
+}
+
+
+# Modo degradado: noticia extractiva sin LLM cuando el proveedor falla o el servicio está saturado
+DEGRADED_CONFIG = {
+    "enabled": os.getenv("DEGRADED_MODE_ENABLED", "true").lower() == "true",
+    # Circuito del proveedor LLM
+    "failure_threshold": int(os.getenv("LLM_CIRCUIT_FAILURES", 3)),     # Fallos seguidos que lo abren
+    "reset_seconds": float(os.getenv("LLM_CIRCUIT_RESET", 60)),         # Tiempo abierto antes de probar
+    # Carga (generaciones en curso + en cola, respecto de max_concurrent) a partir de la que no se encola
+    "load_threshold": float(os.getenv("DEGRADED_LOAD_THRESHOLD", 2.0)),
+    "search_seconds": 20,           # Plazo de la búsqueda (cada ronda usa su parte, ver DEADLINE_CONFIG)
+    "max_sentences": 8,
+    "min_sentences": 2,             # Con menos material se responde error en lugar de una noticia vacía
+    "sentences_per_paragraph": 2
+}
+
+
+# Reordenación local por relevancia (solicitud, plan e intereses del usuario) antes del prompt del Watchdog
+RERANK_CONFIG = {
+    "enabled": os.getenv("RERANK_ENABLED", "true").lower() == "true",
+    "top_k": int(os.getenv("RERANK_TOP_K", 6)),    # Artículos que pasan al Watchdog
+    "dim": 2048,                                   # Dimensión de los vectores de hashing
+    "weights": {"solicitud": 0.5, "plan": 0.3, "intereses": 0.2},
+    "prior_weight": 0.25,       # Peso del orden de la búsqueda (calidad, fuentes que coinciden)
+    "cache_entries": 4096,
+    "cache_ttl": 3600
+}
+
+
+# Versiones derivadas de un artículo archivado (resumen, redes sociales, otro idioma) con una sola llamada
+DERIVATIVE_CONFIG = {
+    # html: la salida sigue el esquema <article> y se valida como la noticia original
+    "formats": {
+        "resumen": {"html": False, "instrucciones": "Un resumen de 3 a 5 frases con los hechos principales, en texto plano"},
+        "social": {"html": False, "instrucciones": (
+            "Una publicación para redes sociales de máximo 280 caracteres, con un tono informativo, "
+            "1 o 2 hashtags y sin enlaces inventados")},
+        "titulares": {"html": False, "instrucciones": "Tres titulares alternativos, uno por línea, sin numerar"},
+        "articulo": {"html": True, "instrucciones": "El artículo completo"}
+    },
+    "default_format": "resumen",
+    "max_language_chars": 40
+}
+
+
+# Salidas de las etapas de Crew en el cache compartido entre workers (src.utils.shared_cache,
+# configurado con SHARED_CACHE_*): el mismo prompt con el mismo modelo no se vuelve a pedir
+STAGE_CACHE_CONFIG = {
+    "ttl": int(os.getenv("STAGE_CACHE_TTL", 1800))     # 0 desactiva el cache de etapas
+}
@@ -0,0 +1,161 @@
+import gzip
+import hashlib
+import json
+import re
+
+from src.config.settings import ARCHIVE_CONFIG
+from src.services.article_archive import get_article_archive, decompress
+
+_DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+# Respuestas JSON más pequeñas no compensan la compresión
+_MIN_GZIP_SIZE = 1024
+
+
+def _accepts(accept_encoding: str, coding: str) -> bool:
+    """True si Accept-Encoding admite la codificación (respeta q=0)"""
+    for part in (accept_encoding or '').lower().split(','):
+        name, _, params = part.strip().partition(';')
+        if name.strip() in (coding, '*'):
+            return params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Comparación débil de If-None-Match (como indica HTTP para GET)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    return any(tag.strip().removeprefix('W/') == opaque for tag in if_none_match.split(','))
+
+
+def _cache_headers(etag: str, content_type: str) -> dict:
+    return {
+        'ETag': etag,
+        'Cache-Control': f"public, max-age={ARCHIVE_CONFIG['max_age']}",
+        'Vary': 'Accept-Encoding',
+        'Content-Type': content_type
+    }
+
+
+def _encode_json(body: dict, accept_encoding: str, headers: dict) -> bytes:
+    raw = json.dumps(body, ensure_ascii=False).encode('utf-8')
+    if len(raw) >= _MIN_GZIP_SIZE and _accepts(accept_encoding, 'gzip'):
+        headers['Content-Encoding'] = 'gzip'
+        return gzip.compress(raw, compresslevel=ARCHIVE_CONFIG['compression_level'])
+    return raw
+
+
+def handle_get_article(article_id: str, if_none_match: str = None, accept_encoding: str = "", as_json: bool = False):
+    """
+    Devuelve un artículo archivado sin volver a ejecutar el flujo
+
+    El HTML se sirve con los bytes guardados cuando el cliente acepta la misma
+    codificación (gzip o zstd); si no, se descomprime (y se vuelve a comprimir
+    en gzip si lo acepta).
+
+    Args:
+        article_id: Id devuelto en "articulo_id" al generar la noticia
+        if_none_match: Cabecera If-None-Match del cliente
+        accept_encoding: Cabecera Accept-Encoding del cliente
+        as_json: True para recibir el HTML junto con los metadatos en JSON
+
+    Returns:
+        tuple: (body, int, dict) El cuerpo (bytes, o dict si es un error), el código de estado HTTP
+        y las cabeceras de la respuesta
+    """
+    try:
+        article = get_article_archive().get_compressed(article_id)
+        if article is None:
+            return {
+                "status": "error",
+                "message": f"No existe el artículo {article_id}"
+            }, 404, {}
+
+        etag = f'W/"{article["etag"]}{"-json" if as_json else ""}"'
+        content_type = 'application/json; charset=utf-8' if as_json else 'text/html; charset=utf-8'
+        headers = _cache_headers(etag, content_type)
+        if _etag_matches(if_none_match, etag):
+            return b'', 304, headers
+
+        codec = article['codec']
+        if not as_json and _accepts(accept_encoding, codec):
+            headers['Content-Encoding'] = codec
+            return article['html'], 200, headers
+
+        html = decompress(article['html'], codec)
+        if not as_json:
+            if _accepts(accept_encoding, 'gzip'):
+                headers['Content-Encoding'] = 'gzip'
+                return gzip.compress(html, compresslevel=ARCHIVE_CONFIG['compression_level']), 200, headers
+            return html, 200, headers
+
+        body = {
+            "status": "ok",
+            "id": article['id'],
+            "tema": article['topic'],
+            "fecha": article['created_date'],
+            "titulo": article['title'],
+            "solicitud": article['solicitud'],
+            "noticia": html.decode('utf-8'),
+            **article['metadata']
+        }
+        return _encode_json(body, accept_encoding, headers), 200, headers
+
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Error leyendo el artículo: {str(e)}"
+        }, 500, {}
+
+
+def handle_list_articles(topic: str = None, date: str = None, limit: int = None, offset: int = 0,
+                         if_none_match: str = None, accept_encoding: str = ""):
+    """
+    Lista los artículos archivados (más recientes primero) por tema o fecha
+
+    Args:
+        topic: Tema (se normaliza igual que al guardar, p. ej. "IA en Chile")
+        date: Fecha de creación en formato YYYY-MM-DD (UTC)
+        limit: Número máximo de artículos (acotado por ARCHIVE_CONFIG['list_limit'])
+        offset: Artículos a saltar, para paginar
+        if_none_match: Cabecera If-None-Match del cliente
+        accept_encoding: Cabecera Accept-Encoding del cliente
+
+    Returns:
+        tuple: (body, int, dict) igual que handle_get_article
+    """
+    if date and not _DATE_RE.match(date):
+        return {
+            "status": "error",
+            "message": "Fecha inválida: use el formato YYYY-MM-DD"
+        }, 400, {}
+
+    try:
+        limit = min(limit or ARCHIVE_CONFIG['list_limit'], ARCHIVE_CONFIG['list_limit'])
+        articles = get_article_archive().list(topic, date, limit, max(offset or 0, 0))
+
+        # El listado cambia solo si cambian los artículos que contiene
+        digest = hashlib.sha256(f"{topic}|{date}|{limit}|{offset}".encode('utf-8'))
+        for article in articles:
+            digest.update(f"{article['id']}:{article['etag']}".encode('ascii'))
+        etag = f'W/"{digest.hexdigest()[:32]}"'
+        headers = _cache_headers(etag, 'application/json; charset=utf-8')
+        # El listado crece con cada artículo nuevo: se revalida siempre
+        headers['Cache-Control'] = 'no-cache'
+        if _etag_matches(if_none_match, etag):
+            return b'', 304, headers
+
+        body = {
+            "status": "ok",
+            "count": len(articles),
+            "articles": articles
+        }
+        return _encode_json(body, accept_encoding, headers), 200, headers
+
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Error listando los artículos: {str(e)}"
+        }, 500, {}
@@ -0,0 +1,160 @@
+import re
+import time
+from src.agents.writer_agent import create_writer_agent
+from src.config.settings import get_llm, ADMISSION_CONFIG, DERIVATIVE_CONFIG, STAGE_ROUTING
+from src.controllers.news_controller import admission_rejected_response
+from src.controllers.news_pipeline import run_stage_crew
+from src.services.admission import AdmissionRejected, client_identity, get_admission_controller
+from src.services.article_archive import get_article_archive
+from src.services.llm_circuit import get_llm_circuit, is_provider_failure
+from src.tasks.news_tasks import create_derivative_task
+from src.utils.html_postprocessor import postprocess_article_html
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_FENCE_RE = re.compile(r'^```[a-zA-Z]*\s*|\s*```$')
+
+
+def _unavailable_response(message: str):
+    return {
+        "status": "error",
+        "message": message,
+        "retry_after": max(1, round(get_llm_circuit().stats()['segundos_para_prueba']))
+    }, 503
+
+
+def _derivative_body(article: dict, formato: str, idioma: str, content: str, cached: bool, elapsed: float):
+    body = {
+        "status": "success",
+        "articulo_id": article['id'],
+        "titulo": article['title'],
+        "formato": formato,
+        "idioma": idioma or None,
+        "derivado": content,
+        "cache": cached,
+        "tiempos": {"derivado": round(elapsed, 3)}
+    }
+    if DERIVATIVE_CONFIG['formats'][formato]['html']:
+        validacion_html = postprocess_article_html(content)
+        body["derivado"] = validacion_html['html'] or content
+        body["validacion_html"] = {
+            "valido": validacion_html['valid'],
+            "correcciones": validacion_html['fixes'],
+            "errores": validacion_html['errors']
+        }
+    return body
+
+
+def _generate_derivative(writer, task, client: str = None):
+    """Llamada al Writer; con cliente, ocupa uno de sus huecos del control de admisión mientras dura"""
+    if not ADMISSION_CONFIG['enabled'] or not client:
+        return run_stage_crew(writer, task)
+    admission = get_admission_controller()
+    waited = admission.acquire(client)
+    started = time.monotonic()
+    try:
+        logger.info("Derivado admitido", extra={'client': client, 'queue_wait': round(waited, 3)})
+        return run_stage_crew(writer, task)
+    finally:
+        admission.release(client, time.monotonic() - started)
+
+
+def handle_article_derivative(article_id: str, formato: str = None, idioma: str = None, tier: str = "standard",
+                              client: str = None):
+    """
+    Genera una versión derivada (resumen, redes, titulares u otro idioma) de un artículo archivado
+
+    No vuelve a ejecutar el flujo: el Writer recibe el informe aprobado (CODE02) que se
+    guardó con el artículo y hace una sola llamada al modelo. Cada formato e idioma se
+    guarda en el archivo, así que pedirlo otra vez no llama al modelo.
+
+    Args:
+        article_id: Id devuelto en "articulo_id" al generar la noticia
+        formato: Uno de DERIVATIVE_CONFIG['formats'] (por defecto, resumen)
+        idioma: Idioma de la salida (por defecto, el de la noticia)
+        tier: Nivel de la solicitud, que decide el modelo de la etapa
+        client: Identidad del cliente (client_identity); la llamada al modelo pasa por su
+            control de admisión como /generate-news. Sin cliente no se limita
+
+    Returns:
+        tuple: (dict, int) La versión derivada y el código de estado HTTP, o 429 con "retry_after"
+    """
+    # Los valores llegan del JSON tal cual: un número o una lista es un 400, no un 500
+    for field, value in (('formato', formato), ('idioma', idioma), ('tier', tier)):
+        if value is not None and not isinstance(value, str):
+            return {"status": "error", "message": f"'{field}' debe ser un texto"}, 400
+    formato = (formato or DERIVATIVE_CONFIG['default_format']).strip().lower()
+    if formato not in DERIVATIVE_CONFIG['formats']:
+        return {
+            "status": "error",
+            "message": f"Formato desconocido: {formato}",
+            "formatos": list(DERIVATIVE_CONFIG['formats'])
+        }, 400
+    tier = tier or 'standard'
+    if tier not in STAGE_ROUTING:
+        return {
+            "status": "error",
+            "message": f"Nivel desconocido: {tier}",
+            "niveles": list(STAGE_ROUTING)
+        }, 400
+    idioma = ' '.join((idioma or '').split()).lower()
+    if len(idioma) > DERIVATIVE_CONFIG['max_language_chars']:
+        return {"status": "error", "message": "Idioma inválido"}, 400
+
+    started = time.monotonic()
+    try:
+        archive = get_article_archive()
+        article = archive.get(article_id)
+        if article is None:
+            return {"status": "error", "message": f"No existe el artículo {article_id}"}, 404
+        if not article['informe']:
+            return {"status": "error", "message": "El artículo no tiene informe validado guardado"}, 409
+
+        content = archive.get_derivative(article_id, formato, idioma)
+        if content is not None:
+            return _derivative_body(article, formato, idioma, content, True, time.monotonic() - started), 200
+
+        if not get_llm_circuit().allow():
+            return _unavailable_response("Proveedor LLM no disponible (circuito abierto)")
+        writer = create_writer_agent(get_llm('derivative', tier))
+        task = create_derivative_task(article['informe'], article['solicitud'],
+                                      DERIVATIVE_CONFIG['formats'][formato]['instrucciones'], idioma,
+                                      article['title'], agent=writer)
+        try:
+            content = _FENCE_RE.sub('', _generate_derivative(writer, task, client).strip())
+        except AdmissionRejected as e:
+            return admission_rejected_response(client, e)
+        except Exception as e:
+            if not is_provider_failure(e):
+                raise
+            get_llm_circuit().record_failure()
+            return _unavailable_response(f"Error del proveedor LLM: {str(e)}")
+        get_llm_circuit().record_success()
+
+        body = _derivative_body(article, formato, idioma, content, False, time.monotonic() - started)
+        # Una salida HTML sin la estructura requerida no se guarda: la próxima petición la reintenta
+        if body.get('validacion_html', {}).get('valido', True):
+            archive.save_derivative(article_id, formato, idioma, body['derivado'])
+        logger.info("Versión derivada generada", extra={'article_id': article_id, 'format': formato,
+                                                        'language': idioma, 'elapsed': body['tiempos']['derivado']})
+        return body, 200
+
+    except Exception as e:
+        logger.exception("Error generando la versión derivada")
+        return {
+            "status": "error",
+            "message": f"Error generando la versión derivada: {str(e)}"
+        }, 500
+
+
+def handle_admitted_article_derivative(api_key: str, client_id: str, remote_addr: str, *args, **kwargs):
+    """
+    handle_article_derivative con la identidad del cliente de la petición
+
+    Args:
+        api_key, client_id, remote_addr: Identidad del cliente (ver handle_admitted_news_generation)
+        *args, **kwargs: Los de handle_article_derivative
+    """
+    client = client_identity(api_key, client_id, remote_addr) if ADMISSION_CONFIG['enabled'] else None
+    return handle_article_derivative(*args, client=client, **kwargs)
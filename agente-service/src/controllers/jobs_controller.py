@@ -0,0 +1,126 @@
+import threading
+import time
+from src.config.settings import ADMISSION_CONFIG
+from src.controllers.news_controller import handle_news_generation
+from src.services.admission import AdmissionRejected, client_identity, get_admission_controller
+from src.services.job_queue import JobQueue, JobWorker, is_local_broker
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_job_queue = None
+_local_workers = []
+_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """
+    Retorna la cola de trabajos del proceso
+
+    Con el broker en memoria no hay procesos worker.py que lo compartan, así que
+    se arranca un hilo trabajador por nodo dentro del propio servidor.
+    """
+    global _job_queue
+    with _lock:
+        if _job_queue is None:
+            _job_queue = JobQueue()
+            if is_local_broker(_job_queue.broker):
+                for node in _job_queue.nodes:
+                    worker = JobWorker(node, run_admitted_job, _job_queue.broker)
+                    threading.Thread(target=worker.run_forever, name=f"job-worker-{node}", daemon=True).start()
+                    _local_workers.append(worker)
+        return _job_queue
+
+
+def _rejected_response(client: str, error: AdmissionRejected):
+    logger.warning("Trabajo rechazado por admisión", extra={'client': client, 'reason': error.reason,
+                                                            'retry_after': error.retry_after})
+    return {
+        "status": "error",
+        "message": str(error),
+        "motivo": error.reason,
+        "retry_after": error.retry_after
+    }, 429
+
+
+def run_admitted_job(solicitud_noticia: str, client: str = None, **params):
+    """
+    Handler de JobWorker: el trabajo ocupa un hueco de su cliente mientras se genera
+
+    La cuota del cliente se cobró al encolar; aquí solo se espera un hueco en la
+    cola justa, igual que una petición a /generate-news.
+    """
+    if not ADMISSION_CONFIG['enabled'] or not client:
+        return handle_news_generation(solicitud_noticia, **params)
+    admission = get_admission_controller()
+    try:
+        waited = admission.acquire(client, charge=False)
+    except AdmissionRejected as e:
+        return _rejected_response(client, e)
+    started = time.monotonic()
+    try:
+        logger.info("Trabajo admitido", extra={'client': client, 'queue_wait': round(waited, 3)})
+        return handle_news_generation(solicitud_noticia, **params)
+    finally:
+        admission.release(client, time.monotonic() - started)
+
+
+def handle_submit_job(api_key: str, client_id: str, remote_addr: str, solicitud_noticia: str,
+                      max_iterations: int = 3, quality_threshold: float = 0.8, tier: str = "standard",
+                      deadline_seconds: float = None, user_interests: list = None):
+    """
+    Encola una generación de noticia para que la procese el nodo de su tema
+
+    Encolar gasta cuota del cliente como una petición a /generate-news (429 si no le
+    queda) y el trabajador espera un hueco del cliente antes de generarla.
+    El plazo (deadline_seconds) empieza a contar cuando el trabajador toma el trabajo.
+
+    Args:
+        api_key, client_id, remote_addr: Identidad del cliente (ver handle_admitted_news_generation)
+
+    Returns:
+        tuple: (dict, int) El id del trabajo y el nodo asignado, y el código HTTP (202), o 429 con "retry_after"
+    """
+    client = None
+    if ADMISSION_CONFIG['enabled']:
+        client = client_identity(api_key, client_id, remote_addr)
+        try:
+            get_admission_controller().charge(client)
+        except AdmissionRejected as e:
+            return _rejected_response(client, e)
+    try:
+        job = get_job_queue().submit(solicitud_noticia, {
+            "max_iterations": max_iterations,
+            "quality_threshold": quality_threshold,
+            "tier": tier,
+            "deadline_seconds": deadline_seconds,
+            "user_interests": user_interests or [],
+            "client": client
+        })
+        return {"status": "queued", **job}, 202
+
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Error encolando la generación: {str(e)}"
+        }, 500
+
+
+def handle_get_job(job_id: str):
+    """
+    Consulta el estado de un trabajo y, si terminó, su resultado
+
+    Returns:
+        tuple: (dict, int) El estado del trabajo y el código HTTP
+    """
+    try:
+        job = get_job_queue().get(job_id)
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Error consultando el trabajo: {str(e)}"
+        }, 500
+
+    if job is None:
+        return {"status": "error", "message": f"No existe el trabajo {job_id}"}, 404
+    return job, 200
@@ -0,0 +1,46 @@
+from src.services.admission import get_admission_controller
+from src.services.llm_circuit import get_llm_circuit
+from src.utils.llm_metrics import prompt_cache_metrics
+from src.utils.shared_cache import get_shared_cache
+
+
+def handle_llm_metrics():
+    """
+    Uso de tokens acumulado por modelo, con los tokens servidos desde el cache de prefijos
+
+    Returns:
+        tuple: (dict, int) Las métricas y el código de estado HTTP
+    """
+    return {
+        "status": "ok",
+        "modelos": prompt_cache_metrics.snapshot()
+    }, 200
+
+
+def handle_admission_metrics():
+    """
+    Estado del control de admisión: huecos ocupados, cola, esperas y rechazos por cliente,
+    y el circuito del proveedor LLM que decide el modo degradado
+
+    Returns:
+        tuple: (dict, int) Las métricas y el código de estado HTTP
+    """
+    return {
+        "status": "ok",
+        "admision": get_admission_controller().stats(),
+        "circuito_llm": get_llm_circuit().stats()
+    }, 200
+
+
+def handle_cache_metrics():
+    """
+    Estado del cache compartido entre workers: entradas y tamaño del archivo, y aciertos de este proceso
+
+    Returns:
+        tuple: (dict, int) Las métricas y el código de estado HTTP
+    """
+    cache = get_shared_cache()
+    return {
+        "status": "ok",
+        "cache_compartido": cache.stats() if cache is not None else None
+    }, 200
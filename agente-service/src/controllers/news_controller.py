@@ -1,245 +1,457 @@
-import re
-from src.crews.agent_crews import create_news_generation_crew
-from src.tasks.news_tasks import (
-    create_planning_task,
-    create_investigation_task,
-    create_critique_task,
-    create_reinvestigation_task,
-    create_writing_task,
-    create_final_review_task
+import math
+import time
+from src.config.settings import (
+    get_llm, select_model_profile, DEADLINE_CONFIG, PROFILING_CONFIG, CASSETTE_CONFIG, ADMISSION_CONFIG,
+    DEGRADED_CONFIG, SERVER_CONFIG
 )
-from crewai import Crew
-from src.agents.manager_agent import create_manager_agent
-from src.agents.watchdog_agent import create_watchdog_agent
-from src.agents.critic_agent import create_critic_agent
-from src.agents.writer_agent import create_writer_agent
+from src.controllers.news_pipeline import build_news_pipeline_graph
+from src.services.admission import AdmissionRejected, client_identity, get_admission_controller
+from src.services.article_archive import get_article_archive
+from src.services.degraded_builder import build_degraded_article
+from src.services.llm_circuit import get_llm_circuit, is_provider_failure
+from src.services.retrieval_service import RetrievalEngine
 from src.tools.news_api_tool import NewsAPITool
 from src.tools.tools import NewsSearchTool
-from src.tools.tools import NewsSearchTool
+from src.utils.cassette import RECORD, CassetteMiss, CassetteNotFound, cassette_scope, new_cassette_name
+from src.utils.deadline import Deadline, DeadlineExceeded, deadline_scope, watch_disconnect
+from src.utils.event_loop import get_shared_event_loop
+from src.utils.logger import current_request_id, get_logger
+from src.utils.memo import run_scope
+from src.utils.profiler import profiled
 
+logger = get_logger(__name__)
 
-interador = 0
+# Solo se perfilan las peticiones marcadas (cabecera X-Profile o muestreo, ver server.py)
+_profiled = profiled(PROFILING_CONFIG['dir'], PROFILING_CONFIG['interval'], PROFILING_CONFIG['top_n'],
+                     request_id_getter=current_request_id)
 
-def format_articles_as_text(articles: list) -> str:
-    """
-    Formatea una lista de artículos como texto para incluir en el prompt
-    
-    Args:
-        articles: Lista de artículos del endpoint
-        
-    Returns:
-        str: Texto formateado con la información de los artículos
-    """
-    if not articles:
-        return "No se encontraron artículos."
-    
-    formatted_text = f"Se encontraron {len(articles)} artículos:\n\n"
-    
-    for i, article in enumerate(articles, 1):
-        formatted_text += f"{i}. {article.get('title', 'Sin título')}\n"
-        formatted_text += f"   Fuente: {article.get('source', 'Desconocida')}\n"
-        formatted_text += f"   URL: {article.get('url', 'N/A')}\n"
-        snippet = article.get('snippet', '')
-        if snippet:
-            formatted_text += f"   Resumen: {snippet}\n"
-        if article.get('type'):
-            formatted_text += f"   Tipo: {article.get('type')}\n"
-        formatted_text += "\n"
-    
-    return formatted_text
-
-def detect_code01_code02(text: str):
+# Los grafos no guardan estado de la petición: se construyen (y validan) una sola vez
+NEWS_PIPELINE_GRAPH = build_news_pipeline_graph()
+ASYNC_NEWS_PIPELINE_GRAPH = build_news_pipeline_graph(use_async=True)
+
+
+def _create_retrieval_engine() -> RetrievalEngine:
+    """Motor de recuperación de una petición, con sus clientes del backend y del scraper"""
+    return RetrievalEngine(NewsAPITool(), NewsSearchTool())
+
+
+def _stage_llm_router(tier: str, deadline: Deadline):
+    """Retorna la función que elige el LLM de cada etapa para esta petición"""
+
+    def stage_llm(stage: str):
+        # El router degrada a un modelo más rápido si queda poco margen dentro del plazo
+        remaining = deadline.remaining()
+        if select_model_profile(stage, tier, remaining) != select_model_profile(stage, tier):
+            deadline.degrade(f"Modelo más rápido en la etapa {stage} por falta de tiempo")
+        return get_llm(stage, tier, remaining)
+
+    return stage_llm
+
+
+def _cassette_scope():
+    """Cassette de la petición (cabeceras X-Cassette-*) o el configurado por entorno"""
+    # Grabando todas las peticiones, cada una va a su propio archivo (el nombre no sale de X-Request-ID)
+    name = CASSETTE_CONFIG['name']
+    if not name and CASSETTE_CONFIG['mode'] == RECORD:
+        name = new_cassette_name()
+        logger.info("Grabando cassette", extra={'cassette': name})
+    return cassette_scope(CASSETTE_CONFIG['dir'], CASSETTE_CONFIG['mode'], name, CASSETTE_CONFIG['latency_scale'])
+
+
+def _cassette_error_response(error: CassetteMiss):
+    """404 si el cassette pedido no existe; 409 si la petición no coincide con lo grabado"""
+    logger.warning("Reproducción de cassette fallida", extra={'error': str(error)})
+    status = 404 if isinstance(error, CassetteNotFound) else 409
+    return {"status": "error", "message": str(error)}, status
+
+
+def _request_deadline(deadline_seconds) -> Deadline:
+    """Plazo de la petición: el solicitado, acotado a los límites configurados, o el SLO por defecto"""
+    seconds = float(deadline_seconds or DEADLINE_CONFIG['default_seconds'])
+    # NaN pasa por min/max sin acotarse y el plazo nunca vencería
+    if not math.isfinite(seconds):
+        raise ValueError(f"Plazo inválido: {deadline_seconds}")
+    return Deadline(min(max(seconds, DEADLINE_CONFIG['min_seconds']), DEADLINE_CONFIG['max_seconds']))
+
+
+def _invalid_deadline_response(error: Exception):
+    return {"status": "error", "message": str(error)}, 400
+
+
+def _deadline_response(error: DeadlineExceeded, deadline: Deadline):
+    completed = sorted(getattr(error, 'partial_context', {}).get('_timings', {}))
+    logger.warning("Generación interrumpida por plazo", extra={'reason': str(error), 'completed': completed})
+    return {
+        "status": "error",
+        "message": f"Generación interrumpida: {str(error)}",
+        "degradaciones": deadline.degradations,
+        "etapas_completadas": completed
+    }, 504
+
+
+def _archive_article(result: dict, solicitud_noticia: str, noticia: str):
+    """Guarda la noticia aprobada en el archivo; un fallo aquí no invalida la respuesta"""
+    try:
+        return get_article_archive().save(noticia, solicitud_noticia, result['informe_actual'], {
+            "plan": result['plan_context'],
+            "fuentes": [
+                {k: a.get(k) for k in ('title', 'url', 'source', 'type')}
+                for a in result['articulos_finales']
+            ],
+            "iteraciones_critica": result['iteraciones'],
+            "fiabilidad_fuentes": result['fiabilidad_fuentes'],
+            "tiempos": result['_timings']
+        })
+    except Exception:
+        logger.exception("No se pudo archivar la noticia")
+        return None
+
+
+def _build_response(result: dict, solicitud_noticia: str, max_iterations: int, deadline: Deadline):
+    """Arma la respuesta HTTP a partir del contexto final del grafo"""
+    logger.info("Generación finalizada", extra={'code': result['code_detected'],
+                                               'iterations': result['iteraciones'],
+                                               'timings': result['_timings']})
+    # Si después de todas las iteraciones aún hay problemas, reportar
+    if result['code_detected'] == 'CODE01':
+        return {
+            "status": "warning",
+            "message": f"No se pudo alcanzar el umbral de calidad después de {max_iterations} iteraciones",
+            "solicitud": solicitud_noticia,
+            "plan": result['plan_context'],
+            "ultimo_informe": result['informe_actual'],
+            "ultimo_analisis": result['critique_text'],
+            "iteraciones": result['iteraciones'],
+            "criticas_llm": result['criticas_llm'],
+            "fiabilidad_fuentes": result['fiabilidad_fuentes'],
+            "degradaciones": deadline.degradations,
+            "tiempos": result['_timings']
+        }, 200
+
+    validacion_html = result['validacion_html']
+    noticia = validacion_html['html'] or result['noticia_final']
+    return {
+        "status": "success",
+        "message": "Noticia generada exitosamente",
+        "solicitud": solicitud_noticia,
+        "noticia": noticia,
+        # Para releerla sin regenerar: GET /agent/articles/<articulo_id>
+        "articulo_id": _archive_article(result, solicitud_noticia, noticia),
+        "plan": result['plan_context'],
+        "iteraciones_critica": result['iteraciones'],
+        "criticas_llm": result['criticas_llm'],
+        "fiabilidad_fuentes": result['fiabilidad_fuentes'],
+        "codigo_final": result['code_detected'],
+        "validacion_html": {
+            "valido": validacion_html['valid'],
+            "correcciones": validacion_html['fixes'],
+            "errores": validacion_html['errors']
+        },
+        "degradaciones": deadline.degradations,
+        "tiempos": result['_timings']
+    }, 200
+
+
+def _degraded_unavailable(message: str):
+    """503 del modo degradado: el cliente reintenta cuando el circuito del proveedor vuelva a probar"""
+    return {
+        "status": "error",
+        "message": message,
+        "modo": "degradado",
+        "retry_after": max(1, round(get_llm_circuit().stats()['segundos_para_prueba']))
+    }, 503
+
+
+def _degraded_response(solicitud_noticia: str, motivo: str, articles: list, started: float):
+    """Respuesta del modo degradado: noticia extractiva, marcada como no generada por el LLM"""
+    built = build_degraded_article(solicitud_noticia, articles)
+    elapsed = round(time.monotonic() - started, 3)
+    logger.warning("Generación en modo degradado", extra={'reason': motivo, 'sentences': built['frases'],
+                                                          'elapsed': elapsed})
+    if built['html'] is None:
+        return _degraded_unavailable(
+            f"Sin capacidad de LLM ({motivo}) ni material suficiente para una noticia extractiva"
+        )
+    validacion_html = built['html']
+    return {
+        "status": "success",
+        "message": "Noticia extractiva generada sin LLM",
+        "modo": "degradado",
+        "generado_por_llm": False,
+        "motivo_degradacion": motivo,
+        "solicitud": solicitud_noticia,
+        "noticia": validacion_html['html'],
+        "fuentes": built['fuentes'],
+        "validacion_html": {
+            "valido": validacion_html['valid'],
+            "correcciones": validacion_html['fixes'],
+            "errores": validacion_html['errors']
+        },
+        "tiempos": {"degradado": elapsed}
+    }, 200
+
+
+def handle_degraded_generation(solicitud_noticia: str, motivo: str):
     """
-    Detecta si el texto contiene CODE01 (problemas detectados) o CODE02 (aprobado).
-    Esta versión siempre retorna que el texto está bien (CODE02, True).
-    
+    Genera la noticia en modo degradado: búsqueda y resumen extractivo, sin LLM
+
     Args:
-        text: El texto a analizar
+        solicitud_noticia: La solicitud de noticia del usuario
+        motivo: Por qué no se usa el LLM (se devuelve en "motivo_degradacion")
 
     Returns:
-        tuple: (code, bool) - Siempre ('CODE02', True)
+        tuple: (dict, int) La noticia extractiva, o 503 si la búsqueda no trajo material o falló
     """
-    global interador
-    interador += 1
-    return f'CODE0{interador%2+1}', True
+    started = time.monotonic()
+    try:
+        with deadline_scope(Deadline(DEGRADED_CONFIG['search_seconds'])):
+            articles = _create_retrieval_engine().retrieve(solicitud_noticia).get('articles', [])
+        return _degraded_response(solicitud_noticia, motivo, articles, started)
+    except Exception as e:
+        # Es el último recurso cuando el LLM no está: un fallo aquí sigue siendo "reintenta luego"
+        logger.exception("Error en la generación degradada")
+        return _degraded_unavailable(f"Sin capacidad de LLM ({motivo}) y la generación extractiva falló: {str(e)}")
+
+
+async def handle_degraded_generation_async(solicitud_noticia: str, motivo: str):
+    """Versión asíncrona de handle_degraded_generation"""
+    started = time.monotonic()
+    try:
+        retrieval_engine = _create_retrieval_engine()
+        try:
+            with deadline_scope(Deadline(DEGRADED_CONFIG['search_seconds'])):
+                articles = (await retrieval_engine.aretrieve(solicitud_noticia)).get('articles', [])
+        finally:
+            await retrieval_engine.aclose()
+        return _degraded_response(solicitud_noticia, motivo, articles, started)
+    except Exception as e:
+        logger.exception("Error en la generación degradada")
+        return _degraded_unavailable(f"Sin capacidad de LLM ({motivo}) y la generación extractiva falló: {str(e)}")
+
+
+def _llm_unavailable() -> bool:
+    """Circuito del proveedor abierto: la generación va directamente al modo degradado"""
+    return DEGRADED_CONFIG['enabled'] and not get_llm_circuit().allow()
+
+
+def _provider_failed(error: Exception) -> bool:
+    """Registra el fallo en el circuito si viene del proveedor; True si hay que degradar"""
+    if not is_provider_failure(error):
+        return False
+    get_llm_circuit().record_failure()
+    logger.warning("Fallo del proveedor LLM", extra={'error': str(error), 'circuit': get_llm_circuit().state})
+    return DEGRADED_CONFIG['enabled']
 
-def handle_news_generation(solicitud_noticia: str, max_iterations: int = 3, quality_threshold: float = 0.8):
+
+@_profiled
+def handle_news_generation(solicitud_noticia: str, max_iterations: int = 3, quality_threshold: float = 0.8,
+                           tier: str = "standard", deadline_seconds: float = None, user_interests: list = None,
+                           client_socket=None):
     """
     Maneja el flujo completo de generación de noticias con manejo de CODE01/CODE02
-    
-    Implementa el flujo:
-    1. Manager: Recibe solicitud, analiza, planifica (HTN)
+
+    Implementa el flujo (definido como grafo en src.controllers.news_pipeline):
+    1. Manager: Recibe solicitud, analiza, planifica (HTN), en paralelo con la búsqueda inicial
     2. Watchdog: Investiga y recopila información
-    3. Critic: Analiza y detecta problemas (CODE01) o aprueba (CODE02)
+    3. Critic: Analiza y detecta problemas (CODE01) o aprueba (CODE02); el prefiltro de fuentes
+       decide sin LLM cuando la fiabilidad de las fuentes es concluyente
     4. Si CODE01: Watchdog replanifica y busca fuentes alternativas (backtracking)
     5. Si CODE02: Writer redacta el artículo
     6. Manager: Revisión final y publicación
-    
+
     Args:
         solicitud_noticia: La solicitud de noticia del usuario
         max_iterations: Número máximo de iteraciones para corrección
-        quality_threshold: Umbral de calidad requerido (0.0 - 1.0)
-        
+        quality_threshold: Umbral de calidad requerido (0.0 - 1.0); con fuentes fiables que lo
+            superan se aprueba sin consultar al Critic
+        tier: Nivel de la solicitud (economy, standard, premium) que decide el modelo de cada etapa
+        deadline_seconds: Plazo total de la petición; las etapas reparten el tiempo restante y,
+            si no alcanza, se omiten rondas de crítica o se usan modelos más rápidos
+        user_interests: Intereses del usuario; se envían al backend y ordenan los artículos
+            que llegan al Watchdog
+        client_socket: Socket del cliente (si el servidor lo expone) para cancelar al desconectarse
+
     Returns:
         tuple: (dict, int) Un diccionario con el estado y la noticia generada, y el código de estado HTTP
     """
     try:
-        # Paso 1: Manager - Planificación
-        print("📋 Paso 1: Manager iniciando planificación...")
-        manager = create_manager_agent()
-        planning_task = create_planning_task(solicitud_noticia)
-        planning_crew = Crew(
-            agents=[manager],
-            tasks=[planning_task],
-            verbose=True
-        )
-        plan_result = planning_crew.kickoff()
-        plan_context = str(plan_result)
-        # print(f"✅ Plan generado: {plan_context[:100]}...")
-        
-        # Paso 2: Watchdog - Investigación inicial
-        print("🔍 Paso 2: Buscando información del backend...")
-        # Llamar al endpoint del backend para obtener noticias
-
-        tool = NewsSearchTool()
-        result = tool._run(
-            query=solicitud_noticia,
-            max_results=3
-        )
+        deadline = _request_deadline(deadline_seconds)
+    except ValueError as e:
+        return _invalid_deadline_response(e)
+    if _llm_unavailable():
+        return handle_degraded_generation(solicitud_noticia, "Proveedor LLM no disponible (circuito abierto)")
+    try:
+        # Las llamadas repetidas a herramientas dentro de la ejecución se resuelven con el memo
+        with deadline_scope(deadline), watch_disconnect(client_socket, deadline), run_scope(), _cassette_scope():
+            result = NEWS_PIPELINE_GRAPH.run({
+                'solicitud': solicitud_noticia,
+                'max_iterations': max_iterations,
+                'quality_threshold': quality_threshold,
+                'stage_llm': _stage_llm_router(tier, deadline),
+                'retrieval_engine': _create_retrieval_engine(),
+                'user_interests': user_interests or []
+            })
+        get_llm_circuit().record_success()
+        return _build_response(result, solicitud_noticia, max_iterations, deadline)
 
-        informacion_pre_buscada = result
-        
-        print("🔍 Paso 2.1: Watchdog analizando información...")
-        watchdog = create_watchdog_agent()
-        investigation_task = create_investigation_task(solicitud_noticia, plan_context, informacion_pre_buscada)
-        investigation_crew = Crew(
-            agents=[watchdog],
-            tasks=[investigation_task],
-            verbose=True
-        )
-        investigation_result = investigation_crew.kickoff()
-        informe_preliminar = str(investigation_result)
-        # print(f"✅ Informe preliminar generado: {informe_preliminar[:200]}...")
-        
-        # Paso 3: Critic - Análisis y validación (con loop de corrección)
-        print("🔬 Paso 3: Critic iniciando análisis...")
-        critic = create_critic_agent()
-        iteration = 0
-        informe_actual = informe_preliminar
-        code_detected = 'CODE01'
-        
-        while (code_detected == 'CODE01') and (iteration < max_iterations):
-            iteration += 1
-            print(f"🔄 Iteración {iteration}/{max_iterations} - Analizando calidad...")
-            
-            critique_task = create_critique_task(informe_actual, solicitud_noticia)
-            critique_crew = Crew(
-                agents=[critic],
-                tasks=[critique_task],
-                verbose=True
-            )
-            critique_result = critique_crew.kickoff()
-            critique_text = str(critique_result)
-            
-            # Detectar CODE01 o CODE02
-            code, found = detect_code01_code02(critique_text)
-            code_detected = code
-            print("*"*30)
-            print(code_detected)
-            print("*"*30)
-            print(f"📊 Código detectado: {code}")
-            
-            if code == 'CODE01':
-                print(f"⚠️ CODE01: Problemas detectados en iteración {iteration}")
-                print("🔄 Buscando información adicional del backend...")
-                
-                # Buscar información adicional del backend con términos alternativos
-                news_tool = NewsAPITool()
-                # Intentar buscar con variaciones de la consulta
-                search_result = news_tool.search_news(solicitud_noticia, [])
-                
-                informacion_adicional = ""
-                if search_result.get('success'):
-                    articles = search_result.get('articles', [])
-                    informacion_adicional = format_articles_as_text(articles)
-                    print(f"✅ Se encontraron {len(articles)} artículos adicionales del backend")
-                else:
-                    print(f"⚠️ No se pudieron obtener artículos adicionales: {search_result.get('error', 'Error desconocido')}")
-                
-                print("🔄 Watchdog replanificando análisis (backtracking)...")
-                
-                # Paso 3.1: Watchdog - Replanificación y análisis de información adicional
-                reinvestigation_task = create_reinvestigation_task(
-                    solicitud_noticia,
-                    critique_text,
-                    plan_context,
-                    informacion_adicional
-                )
-                reinvestigation_crew = Crew(
-                    agents=[watchdog],
-                    tasks=[reinvestigation_task],
-                    verbose=True
-                )
-                reinvestigation_result = reinvestigation_crew.kickoff()
-                informe_actual = str(reinvestigation_result)
-                print(f"✅ Nuevo informe generado: {informe_actual[:200]}...")
-                
-                # Continuar al siguiente ciclo de validación
-                continue
-            elif code == 'CODE02':
-                print(f"✅ CODE02: Información aprobada después de {iteration} iteración(es)")
-                break
-        
-        # Si después de todas las iteraciones aún hay problemas, reportar
-        if code_detected == 'CODE01':
-            return {
-                "status": "warning",
-                "message": f"No se pudo alcanzar el umbral de calidad después de {max_iterations} iteraciones",
-                "solicitud": solicitud_noticia,
-                "plan": plan_context,
-                "ultimo_informe": informe_actual,
-                "ultimo_analisis": critique_text,
-                "iteraciones": iteration
-            }, 200
-        
-        # Paso 4: Writer - Redacción del artículo
-        print("✍️ Paso 4: Writer iniciando redacción...")
-        writer = create_writer_agent()
-        writing_task = create_writing_task(informe_actual, solicitud_noticia)
-        writing_crew = Crew(
-            agents=[writer],
-            tasks=[writing_task],
-            verbose=True
-        )
-        writing_result = writing_crew.kickoff()
-        articulo = str(writing_result)
-        # print(f"✅ Artículo redactado: {articulo[:200]}...")
-        
-        # Paso 5: Manager - Revisión final y publicación
-        print("👁️ Paso 5: Manager realizando revisión final...")
-        final_review_task = create_final_review_task(articulo, solicitud_noticia, plan_context)
-        final_review_crew = Crew(
-            agents=[manager],
-            tasks=[final_review_task],
-            verbose=True
-        )
-        final_review_result = final_review_crew.kickoff()
-        noticia_final = str(final_review_result)
-        # print(f"✅ Noticia final aprobada: {noticia_final[:200]}...")
-        
+    except DeadlineExceeded as e:
+        return _deadline_response(e, deadline)
+    except CassetteMiss as e:
+        return _cassette_error_response(e)
+    except Exception as e:
+        if _provider_failed(e):
+            return handle_degraded_generation(solicitud_noticia, f"Error del proveedor LLM: {str(e)}")
+        logger.exception("Error generando la noticia")
         return {
-            "status": "success",
-            "message": "Noticia generada exitosamente",
-            "solicitud": solicitud_noticia,
-            "noticia": noticia_final,
-            "plan": plan_context,
-            "iteraciones_critica": iteration,
-            "codigo_final": code_detected
-        }, 200
-        
+            "status": "error",
+            "message": f"Error generando la noticia: {str(e)}"
+        }, 500
+
+
+@_profiled
+async def handle_news_generation_async(solicitud_noticia: str, max_iterations: int = 3, quality_threshold: float = 0.8,
+                                       tier: str = "standard", deadline_seconds: float = None,
+                                       user_interests: list = None, client_socket=None):
+    """
+    Versión asíncrona de handle_news_generation
+
+    Las llamadas HTTP (búsquedas y re-búsquedas) se esperan en el event loop y los
+    kickoff de CrewAI, que bloquean, se ejecutan en un pool de hilos, de modo que
+    una generación no retiene un hilo mientras espera a la red.
+
+    Args y Returns: igual que handle_news_generation
+    """
+    try:
+        deadline = _request_deadline(deadline_seconds)
+    except ValueError as e:
+        return _invalid_deadline_response(e)
+    if _llm_unavailable():
+        return await handle_degraded_generation_async(solicitud_noticia,
+                                                      "Proveedor LLM no disponible (circuito abierto)")
+    retrieval_engine = _create_retrieval_engine()
+    try:
+        with deadline_scope(deadline), watch_disconnect(client_socket, deadline), run_scope(), _cassette_scope():
+            result = await ASYNC_NEWS_PIPELINE_GRAPH.arun({
+                'solicitud': solicitud_noticia,
+                'max_iterations': max_iterations,
+                'quality_threshold': quality_threshold,
+                'stage_llm': _stage_llm_router(tier, deadline),
+                'retrieval_engine': retrieval_engine,
+                'user_interests': user_interests or []
+            })
+        get_llm_circuit().record_success()
+        return _build_response(result, solicitud_noticia, max_iterations, deadline)
+
+    except DeadlineExceeded as e:
+        return _deadline_response(e, deadline)
+    except CassetteMiss as e:
+        return _cassette_error_response(e)
     except Exception as e:
+        if _provider_failed(e):
+            return await handle_degraded_generation_async(solicitud_noticia, f"Error del proveedor LLM: {str(e)}")
+        logger.exception("Error generando la noticia")
         return {
             "status": "error",
             "message": f"Error generando la noticia: {str(e)}"
         }, 500
+    finally:
+        await retrieval_engine.aclose()
 
+
+def admission_rejected_response(client: str, error: AdmissionRejected):
+    logger.warning("Petición rechazada por admisión", extra={'client': client, 'reason': error.reason,
+                                                             'retry_after': error.retry_after})
+    return {
+        "status": "error",
+        "message": str(error),
+        "motivo": error.reason,
+        "retry_after": error.retry_after
+    }, 429
+
+
+def _overload_reason(admission, client: str, error: AdmissionRejected = None):
+    """
+    Motivo para servir en modo degradado por carga, o None si la petición debe esperar o rechazarse
+
+    La respuesta degradada gasta un token del cliente como cualquier otra: sin
+    cuota, AdmissionRejected (rate_limit) y el cliente recibe su 429.
+    """
+    if not DEGRADED_CONFIG['enabled']:
+        return None
+    # El límite de tasa es propio del cliente: sigue respondiendo 429
+    if error is not None:
+        if error.reason == 'rate_limit':
+            return None
+        # wait_timeout ya gastó el token; queue_full lo devolvió
+        if error.reason == 'queue_full':
+            admission.charge(client, degraded=True)
+        return f"Servicio saturado ({error.reason})"
+    load = admission.load()
+    if load >= DEGRADED_CONFIG['load_threshold']:
+        admission.charge(client, degraded=True)
+        return f"Servicio saturado (carga {load:.1f})"
+    return None
+
+
+def _admitted_generation(generate, degrade, api_key: str, client_id: str, remote_addr: str, *args, **kwargs):
+    """Control de admisión alrededor de generate(*args, **kwargs); degrade(solicitud, motivo) si hay sobrecarga"""
+    if not ADMISSION_CONFIG['enabled']:
+        return generate(*args, **kwargs)
+    client = client_identity(api_key, client_id, remote_addr)
+    admission = get_admission_controller()
+    try:
+        reason = _overload_reason(admission, client)
+        if reason:
+            return degrade(args[0], reason)
+        waited = admission.acquire(client)
+    except AdmissionRejected as e:
+        try:
+            reason = _overload_reason(admission, client, e)
+        except AdmissionRejected as rate_limited:
+            return admission_rejected_response(client, rate_limited)
+        if reason:
+            return degrade(args[0], reason)
+        return admission_rejected_response(client, e)
+    started = time.monotonic()
+    try:
+        logger.info("Generación admitida", extra={'client': client, 'queue_wait': round(waited, 3)})
+        return generate(*args, **kwargs)
+    finally:
+        admission.release(client, time.monotonic() - started)
+
+
+def handle_admitted_news_generation(api_key: str, client_id: str, remote_addr: str, *args, **kwargs):
+    """
+    handle_news_generation detrás del control de admisión del cliente
+
+    Args:
+        api_key: Cabecera X-API-Key (identifica al cliente si viene)
+        client_id: Cabecera X-Client-ID
+        remote_addr: IP del cliente, si no hay ninguna de las anteriores
+        *args, **kwargs: Los de handle_news_generation
+
+    Con la cola saturada (o si la espera se agota) se responde en modo degradado
+    en lugar de rechazar, si está habilitado; la respuesta degradada también
+    gasta cuota del cliente, así que su límite de tasa sigue respondiendo 429.
+
+    Returns:
+        tuple: (dict, int) La respuesta de handle_news_generation, o 429 con "retry_after"
+    """
+    return _admitted_generation(handle_news_generation, handle_degraded_generation,
+                                api_key, client_id, remote_addr, *args, **kwargs)
+
+
+def handle_admitted_news_generation_on_shared_loop(api_key: str, client_id: str, remote_addr: str, *args, **kwargs):
+    """
+    Como handle_admitted_news_generation, pero la generación es la del controlador
+    asíncrono y corre en el event loop compartido del proceso (src.utils.event_loop)
+
+    La espera de admisión bloquea el hilo de la petición y no el executor del loop,
+    así que las peticiones en cola no quitan hilos a las que ya se generan.
+    """
+    loop = get_shared_event_loop(SERVER_CONFIG['async_executor_workers'])
+    return _admitted_generation(
+        lambda *a, **kw: loop.run(handle_news_generation_async(*a, **kw)),
+        lambda solicitud, motivo: loop.run(handle_degraded_generation_async(solicitud, motivo)),
+        api_key, client_id, remote_addr, *args, **kwargs
+    )
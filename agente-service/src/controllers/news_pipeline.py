@@ -0,0 +1,518 @@
+"""
+Etapas del flujo de generación de noticias y sus definiciones como grafo
+
+Cada función de etapa recibe sus entradas por nombre y retorna sus salidas;
+el orden y la concurrencia los decide el grafo (src.services.stage_graph).
+"""
+import asyncio
+from crewai import Crew
+from src.tasks.news_tasks import (
+    create_planning_task,
+    create_investigation_task,
+    create_critique_task,
+    create_recritique_task,
+    create_reinvestigation_task,
+    create_writing_task,
+    create_final_review_task,
+    create_html_repair_task
+)
+from src.agents.manager_agent import create_manager_agent
+from src.agents.watchdog_agent import create_watchdog_agent
+from src.agents.critic_agent import create_critic_agent
+from src.agents.writer_agent import create_writer_agent
+from src.config.settings import (
+    STAGE_OUTPUT_BUDGETS, DEADLINE_CONFIG, INCREMENTAL_CRITIQUE_CONFIG, FACT_STORE_CONFIG, STAGE_CACHE_CONFIG
+)
+from src.services.fact_store import get_fact_store, extract_facts, format_known_facts
+from src.services.relevance_ranker import rerank_articles
+from src.services.retrieval_service import merge_article_lists
+from src.services.source_reliability import get_source_reliability_index, format_reliability_findings
+from src.services.stage_graph import Stage, StageGraph
+from src.utils.article_dedup import deduplicate_articles
+from src.utils.cassette import cassette_call
+from src.utils.deadline import current_deadline
+from src.utils.html_postprocessor import postprocess_article_html
+from src.utils.logger import get_logger, trace_enabled
+from src.utils.profiler import profiled_thread
+from src.utils.shared_cache import get_shared_cache, shared_call
+from src.utils.report_diff import diff_report
+from src.utils.structured_output import compact_plan, parse_critique, parse_recritique, format_critique_findings
+
+# Valores que el controlador debe poner en el contexto inicial del grafo
+PIPELINE_INITIAL_KEYS = ('solicitud', 'max_iterations', 'quality_threshold', 'stage_llm', 'retrieval_engine',
+                         'user_interests')
+
+logger = get_logger(__name__)
+
+
+def format_articles_as_text(articles: list) -> str:
+    """
+    Formatea una lista de artículos como texto para incluir en el prompt
+
+    Args:
+        articles: Lista de artículos del endpoint
+
+    Returns:
+        str: Texto formateado con la información de los artículos
+    """
+    if not articles:
+        return "No se encontraron artículos."
+
+    # Las copias de una misma nota de agencia se agrupan en un solo artículo
+    articles = deduplicate_articles(articles)
+    formatted_text = f"Se encontraron {len(articles)} artículos:\n\n"
+
+    for i, article in enumerate(articles, 1):
+        formatted_text += f"{i}. {article.get('title', 'Sin título')}\n"
+        if article.get('sources'):
+            formatted_text += f"   Fuentes: {', '.join(article['sources'])}\n"
+        else:
+            formatted_text += f"   Fuente: {article.get('source', 'Desconocida')}\n"
+        formatted_text += f"   URL: {article.get('url', 'N/A')}\n"
+        snippet = article.get('snippet', '')
+        if snippet:
+            formatted_text += f"   Resumen: {snippet}\n"
+        if article.get('type'):
+            formatted_text += f"   Tipo: {article.get('type')}\n"
+        formatted_text += "\n"
+
+    return formatted_text
+
+
+def detect_code01_code02(text: str):
+    """
+    Detecta si el texto contiene CODE01 (problemas detectados) o CODE02 (aprobado).
+    Lee el campo "codigo" de la salida JSON de la crítica; si no hay JSON usa el
+    último código mencionado. Si no aparece ninguno se aprueba (CODE02, False).
+
+    Args:
+        text: El texto a analizar
+
+    Returns:
+        tuple: (code, bool) - El código y si se encontró explícitamente en el texto
+    """
+    code = parse_critique(text)['codigo']
+    if code is None:
+        return 'CODE02', False
+    return code, True
+
+
+def run_stage_crew(agent, task) -> str:
+    """Ejecuta una tarea con su agente en un Crew de un solo paso y retorna la salida"""
+    crew = Crew(
+        agents=[agent],
+        tasks=[task],
+        verbose=trace_enabled()
+    )
+    # Los kickoff lanzados con asyncio.to_thread también entran en el perfil de la petición
+    with profiled_thread():
+        # Con un cassette activo la respuesta se graba o se sirve sin llamar al LLM
+        kickoff = lambda: cassette_call('llm', [agent.role, task.description], lambda: str(crew.kickoff()),
+                                        label=agent.role)
+        if not STAGE_CACHE_CONFIG['ttl']:
+            return kickoff()
+        # El mismo prompt con el mismo modelo ya se resolvió en algún worker del host
+        model = getattr(agent.llm, 'model_name', None) or type(agent.llm).__name__
+        return shared_call(get_shared_cache(), 'llm', [agent.role, model, task.description], kickoff,
+                           lambda output: bool(output and output.strip()), STAGE_CACHE_CONFIG['ttl'])
+
+
+# --- Etapas -----------------------------------------------------------------
+
+def plan_stage(solicitud, stage_llm):
+    logger.info("Manager iniciando planificación", extra={'stage': 'plan'})
+    manager = create_manager_agent(stage_llm('planning'))
+    plan_result = run_stage_crew(manager, create_planning_task(solicitud, agent=manager))
+    # El plan se reinyecta en cada etapa: se reduce a viñetas con tamaño acotado
+    return compact_plan(plan_result, STAGE_OUTPUT_BUDGETS['planning']['context_chars'])
+
+
+def search_stage(solicitud, user_interests, retrieval_engine):
+    logger.info("Buscando información del backend", extra={'stage': 'search'})
+    result = retrieval_engine.retrieve(solicitud, user_interests=user_interests)
+    logger.info("Artículos combinados", extra={'stage': 'search', 'articles': result['count'],
+                                                'queries': len(result.get('queries', []))})
+    return result.get('articles', [])
+
+
+def search_variants_stage(solicitud, plan_context, user_interests, retrieval_engine):
+    logger.info("Buscando variantes derivadas del plan", extra={'stage': 'search_variants'})
+    result = retrieval_engine.retrieve(solicitud, plan_context, user_interests, include_base=False)
+    return result.get('articles', [])
+
+
+async def asearch_stage(solicitud, user_interests, retrieval_engine):
+    logger.info("Buscando información del backend", extra={'stage': 'search'})
+    result = await retrieval_engine.aretrieve(solicitud, user_interests=user_interests)
+    logger.info("Artículos combinados", extra={'stage': 'search', 'articles': result['count'],
+                                                'queries': len(result.get('queries', []))})
+    return result.get('articles', [])
+
+
+async def asearch_variants_stage(solicitud, plan_context, user_interests, retrieval_engine):
+    logger.info("Buscando variantes derivadas del plan", extra={'stage': 'search_variants'})
+    result = await retrieval_engine.aretrieve(solicitud, plan_context, user_interests, include_base=False)
+    return result.get('articles', [])
+
+
+def collect_sources_stage(solicitud, plan_context, user_interests, articulos_base, articulos_variantes):
+    candidatos = merge_article_lists(articulos_base, articulos_variantes,
+                                     max_articles=len(articulos_base) + len(articulos_variantes))
+    # Solo los más relevantes para la solicitud, el plan y los intereses llegan al Watchdog
+    articulos = rerank_articles(candidatos, solicitud, plan_context, user_interests)
+    logger.info("Artículos reordenados", extra={'stage': 'collect_sources', 'candidates': len(candidatos),
+                                                'kept': len(articulos)})
+    return {
+        'articulos_usados': articulos,
+        'informacion_pre_buscada': format_articles_as_text(articulos)
+    }
+
+
+def known_facts_stage(solicitud):
+    """Hechos ya validados en artículos anteriores sobre las entidades de la solicitud"""
+    if not FACT_STORE_CONFIG['enabled']:
+        return ''
+    facts = get_fact_store().lookup(solicitud)
+    logger.info("Hechos conocidos", extra={'stage': 'known_facts', 'facts': len(facts)})
+    return format_known_facts(facts)
+
+
+def investigate_stage(solicitud, plan_context, informacion_pre_buscada, hechos_conocidos, stage_llm):
+    logger.info("Watchdog analizando información", extra={'stage': 'investigate'})
+    watchdog = create_watchdog_agent(stage_llm('investigation'))
+    task = create_investigation_task(solicitud, plan_context, informacion_pre_buscada, agent=watchdog,
+                                     hechos_conocidos=hechos_conocidos)
+    return run_stage_crew(watchdog, task)
+
+
+def remember_facts_stage(informe_actual, articulos_finales, aprobado_por_critic):
+    """
+    Guarda los hechos del informe aprobado para las próximas generaciones
+
+    Solo si lo aprobó el Critic con un CODE02 explícito: ni el prefiltro de
+    fuentes ni una crítica ilegible validan las frases del informe.
+    """
+    if not FACT_STORE_CONFIG['enabled']:
+        return 0
+    if not aprobado_por_critic:
+        logger.info("Informe sin aprobación explícita del Critic, no se guardan hechos",
+                    extra={'stage': 'remember_facts'})
+        return 0
+    try:
+        added = get_fact_store().add_facts(extract_facts(informe_actual, articulos_finales or []))
+    except Exception:
+        # El almacén de hechos es una optimización: un fallo no invalida la noticia
+        logger.exception("No se pudieron guardar los hechos del informe")
+        return 0
+    logger.info("Hechos guardados", extra={'stage': 'remember_facts', 'facts': added})
+    return added
+
+
+def _incremental_changes(informe, previous):
+    """Cambios frente al informe ya criticado, o None si conviene criticarlo completo"""
+    if not (INCREMENTAL_CRITIQUE_CONFIG['enabled'] and previous and previous['problemas']):
+        return None
+    cambios = diff_report(previous['informe'], informe)
+    # Un informe reescrito casi entero no ahorra nada: se critica completo
+    if not cambios or len(cambios) > INCREMENTAL_CRITIQUE_CONFIG['max_diff_ratio'] * len(informe):
+        return None
+    return cambios
+
+
+def critique_once(informe, solicitud, stage_llm, previous=None):
+    """
+    Una pasada del Critic
+
+    Si hay una crítica anterior con problemas abiertos, el Critic recibe solo los
+    cambios del informe y confirma cuáles quedaron resueltos.
+
+    Args:
+        informe: Informe a criticar
+        solicitud: Solicitud original
+        stage_llm: Función que elige el LLM de la etapa
+        previous: Crítica anterior ({'informe', 'problemas'}) o None
+
+    Returns:
+        tuple: (código, hallazgos en texto compacto, crítica para la siguiente pasada);
+        la crítica lleva 'aprobado' si el Critic dio un CODE02 explícito
+    """
+    critic = create_critic_agent(stage_llm('critique'))
+    cambios = _incremental_changes(informe, previous)
+    if cambios is None:
+        critique_output = run_stage_crew(critic, create_critique_task(informe, solicitud, agent=critic))
+        code, explicit = detect_code01_code02(critique_output)
+        critique = parse_critique(critique_output)
+        # Una crítica que no viene en JSON se pasa tal cual: sus hallazgos están en el texto
+        findings = format_critique_findings(critique) if critique['problemas'] else critique_output
+    else:
+        task = create_recritique_task(cambios, previous['problemas'], solicitud, agent=critic)
+        critique = parse_recritique(run_stage_crew(critic, task), previous['problemas'])
+        code = critique['codigo']
+        # parse_recritique nunca aprueba por omisión: un CODE02 suyo siempre es explícito
+        explicit = True
+        logger.info("Crítica incremental", extra={'stage': 'critique', 'code': code,
+                                                  'resolved': len(critique['resueltos']),
+                                                  'open': len(critique['problemas'])})
+        findings = format_critique_findings(critique)
+    return code, findings, {'informe': informe, 'problemas': critique['problemas'],
+                            'aprobado': code == 'CODE02' and bool(explicit)}
+
+
+def assess_sources(articulos_usados, quality_threshold) -> dict:
+    """Prefiltro de fiabilidad: decide CODE01/CODE02 sin LLM cuando las fuentes son concluyentes"""
+    assessment = get_source_reliability_index().assess(articulos_usados, quality_threshold)
+    logger.info("Prefiltro de fuentes", extra={'stage': 'critique', 'decision': assessment['decision'],
+                                               'score': assessment['score'],
+                                               'reliable_sources': len(assessment['reliable_sources'])})
+    return assessment
+
+
+def _reinvestigate(solicitud, plan_context, user_interests, critique_text, search_result, articulos_usados,
+                   stage_llm) -> str:
+    """Incorpora las fuentes nuevas y ejecuta la reinvestigación (backtracking) del Watchdog"""
+    informacion_adicional = ""
+    if search_result.get('success'):
+        articles = rerank_articles(search_result.get('articles', []), solicitud, plan_context, user_interests,
+                                   extra_context=critique_text)
+        articulos_usados.extend(articles)
+        informacion_adicional = format_articles_as_text(articles)
+        logger.info("Artículos adicionales del backend", extra={'stage': 'reinvestigate', 'articles': len(articles)})
+    else:
+        logger.warning("No se pudieron obtener artículos adicionales",
+                       extra={'stage': 'reinvestigate', 'error': search_result.get('error', 'Error desconocido')})
+
+    logger.info("Watchdog replanificando análisis (backtracking)", extra={'stage': 'reinvestigate'})
+    watchdog = create_watchdog_agent(stage_llm('reinvestigation'))
+    task = create_reinvestigation_task(
+        solicitud,
+        critique_text,
+        plan_context,
+        informacion_adicional,
+        agent=watchdog
+    )
+    return run_stage_crew(watchdog, task)
+
+
+def _time_for_another_round() -> bool:
+    """Con plazo, una ronda extra de búsqueda y crítica solo se lanza si cabe junto con la redacción"""
+    deadline = current_deadline()
+    if deadline is None:
+        return True
+    needed = DEADLINE_CONFIG['critique_cycle_seconds'] + DEADLINE_CONFIG['writing_reserve_seconds']
+    if deadline.remaining() >= needed:
+        return True
+    deadline.degrade("Se omitieron rondas de crítica adicionales por falta de tiempo")
+    logger.warning("Sin tiempo para otra ronda de crítica", extra={'stage': 'critique',
+                                                                   'remaining': round(deadline.remaining(), 1)})
+    return False
+
+
+def _critique_loop_result(informe_actual, code_detected, critique_text, iteration, articulos_usados,
+                          llm_critiques, assessment, critic_approved):
+    return {
+        'informe_actual': informe_actual,
+        'code_detected': code_detected,
+        'aprobado_por_critic': critic_approved,
+        'critique_text': critique_text,
+        'iteraciones': iteration,
+        'articulos_finales': articulos_usados,
+        'criticas_llm': llm_critiques,
+        'fiabilidad_fuentes': assessment
+    }
+
+
+def _critique_loop(solicitud, plan_context, user_interests, informe_preliminar, articulos_usados, max_iterations,
+                   quality_threshold, stage_llm):
+    """
+    Decisiones del bucle de crítica, comunes al flujo síncrono y al asíncrono
+
+    Es un generador: cede cada paso que espera (crítica del LLM, búsqueda adicional,
+    reinvestigación) como ('call', función, args) o ('search', kwargs) y recibe su
+    resultado; critique_loop_stage y acritique_loop_stage solo deciden cómo esperarlo.
+    Devuelve (StopIteration.value) el resultado de la etapa.
+    """
+    logger.info("Critic iniciando análisis", extra={'stage': 'critique'})
+    iteration = 0
+    llm_critiques = 0
+    informe_actual = informe_preliminar
+    code_detected = 'CODE01'
+    critique_text = ''
+    assessment = None
+    # Problemas abiertos de la última crítica del LLM (para la crítica incremental)
+    previous_critique = None
+    critic_approved = False
+    articulos_usados = list(articulos_usados)
+
+    while (code_detected == 'CODE01') and (iteration < max_iterations):
+        iteration += 1
+        # Si las fuentes deciden por sí solas, no se gasta una llamada al Critic
+        assessment = assess_sources(articulos_usados, quality_threshold)
+        if assessment['decision']:
+            code_detected, critique_text = assessment['decision'], format_reliability_findings(assessment)
+            critic_approved = False
+        else:
+            code_detected, critique_text, previous_critique = yield (
+                'call', critique_once, (informe_actual, solicitud, stage_llm, previous_critique)
+            )
+            critic_approved = previous_critique['aprobado']
+            llm_critiques += 1
+        logger.info("Crítica completada", extra={'stage': 'critique', 'iteration': iteration,
+                                                 'max_iterations': max_iterations, 'code': code_detected,
+                                                 'prefilter': bool(assessment['decision'])})
+
+        if code_detected == 'CODE02' or not _time_for_another_round():
+            break
+
+        # Buscar información adicional con variaciones derivadas de la crítica,
+        # descartando las fuentes que ya se usaron
+        search_result = yield ('search', {
+            'query': solicitud,
+            'plan_context': plan_context,
+            'user_interests': user_interests,
+            'extra_context': critique_text,
+            'exclude_urls': [a.get('url') for a in articulos_usados]
+        })
+        informe_actual = yield ('call', _reinvestigate, (solicitud, plan_context, user_interests, critique_text,
+                                                         search_result, articulos_usados, stage_llm))
+
+    return _critique_loop_result(informe_actual, code_detected, critique_text, iteration, articulos_usados,
+                                 llm_critiques, assessment, critic_approved)
+
+
+def critique_loop_stage(solicitud, plan_context, user_interests, informe_preliminar, articulos_usados, max_iterations,
+                        quality_threshold, stage_llm, retrieval_engine):
+    loop = _critique_loop(solicitud, plan_context, user_interests, informe_preliminar, articulos_usados,
+                          max_iterations, quality_threshold, stage_llm)
+    try:
+        step = next(loop)
+        while True:
+            if step[0] == 'search':
+                step = loop.send(retrieval_engine.retrieve(**step[1]))
+            else:
+                step = loop.send(step[1](*step[2]))
+    except StopIteration as done:
+        return done.value
+
+
+async def acritique_loop_stage(solicitud, plan_context, user_interests, informe_preliminar, articulos_usados,
+                               max_iterations, quality_threshold, stage_llm, retrieval_engine):
+    """Igual que critique_loop_stage, pero la búsqueda adicional se espera en el event loop"""
+    loop = _critique_loop(solicitud, plan_context, user_interests, informe_preliminar, articulos_usados,
+                          max_iterations, quality_threshold, stage_llm)
+    try:
+        step = next(loop)
+        while True:
+            if step[0] == 'search':
+                step = loop.send(await retrieval_engine.aretrieve(**step[1]))
+            else:
+                step = loop.send(await asyncio.to_thread(step[1], *step[2]))
+    except StopIteration as done:
+        return done.value
+
+
+def single_critique_stage(informe_preliminar, solicitud, stage_llm):
+    code, critique_text, _ = critique_once(informe_preliminar, solicitud, stage_llm)
+    return {
+        'informe_actual': informe_preliminar,
+        'code_detected': code,
+        'critique_text': critique_text,
+        'iteraciones': 1
+    }
+
+
+def write_stage(informe_actual, solicitud, stage_llm):
+    logger.info("Writer iniciando redacción", extra={'stage': 'write'})
+    writer = create_writer_agent(stage_llm('writing'))
+    return run_stage_crew(writer, create_writing_task(informe_actual, solicitud, agent=writer))
+
+
+def review_stage(articulo, solicitud, plan_context, stage_llm):
+    logger.info("Manager realizando revisión final", extra={'stage': 'review'})
+    reviewer = create_manager_agent(stage_llm('final_review'))
+    task = create_final_review_task(articulo, solicitud, plan_context, agent=reviewer)
+    return run_stage_crew(reviewer, task)
+
+
+def validate_html_stage(noticia_final, informe_actual, stage_llm):
+    # Extraer, sanear y validar el HTML (sin volver a ejecutar el flujo)
+    validacion_html = postprocess_article_html(noticia_final)
+    if validacion_html['needs_repair']:
+        logger.warning("Estructura HTML irrecuperable, solicitando reparación",
+                       extra={'stage': 'validate_html', 'errors': validacion_html['errors']})
+        writer = create_writer_agent(stage_llm('repair'))
+        task = create_html_repair_task(
+            validacion_html['html'] or noticia_final,
+            validacion_html['errors'],
+            informe_actual,
+            agent=writer
+        )
+        repaired = postprocess_article_html(run_stage_crew(writer, task))
+        repaired['fixes'] = validacion_html['fixes'] + ['Reparación de estructura con el modelo'] + repaired['fixes']
+        if repaired['valid'] or not validacion_html['html']:
+            validacion_html = repaired
+    return validacion_html
+
+
+def _approved(context) -> bool:
+    return context.get('code_detected') == 'CODE02'
+
+
+# --- Grafos -----------------------------------------------------------------
+
+def build_news_pipeline_graph(use_async: bool = False) -> StageGraph:
+    """
+    Flujo del controlador: la planificación y la búsqueda inicial se solapan,
+    las variantes del plan se buscan en cuanto hay plan, y redacción, revisión
+    y validación solo se ejecutan si el Critic aprueba (CODE02)
+
+    Args:
+        use_async: Usa las etapas asíncronas de búsqueda y crítica (para StageGraph.arun)
+    """
+    search = asearch_stage if use_async else search_stage
+    search_variants = asearch_variants_stage if use_async else search_variants_stage
+    critique_loop = acritique_loop_stage if use_async else critique_loop_stage
+    return StageGraph([
+        Stage('plan', plan_stage, ['solicitud', 'stage_llm'], ['plan_context']),
+        Stage('search', search, ['solicitud', 'user_interests', 'retrieval_engine'], ['articulos_base']),
+        Stage('search_variants', search_variants,
+              ['solicitud', 'plan_context', 'user_interests', 'retrieval_engine'], ['articulos_variantes']),
+        Stage('collect_sources', collect_sources_stage,
+              ['solicitud', 'plan_context', 'user_interests', 'articulos_base', 'articulos_variantes'],
+              ['articulos_usados', 'informacion_pre_buscada']),
+        Stage('known_facts', known_facts_stage, ['solicitud'], ['hechos_conocidos']),
+        Stage('investigate', investigate_stage,
+              ['solicitud', 'plan_context', 'informacion_pre_buscada', 'hechos_conocidos', 'stage_llm'],
+              ['informe_preliminar']),
+        Stage('critique_loop', critique_loop,
+              ['solicitud', 'plan_context', 'user_interests', 'informe_preliminar', 'articulos_usados',
+               'max_iterations', 'quality_threshold', 'stage_llm', 'retrieval_engine'],
+              ['informe_actual', 'code_detected', 'critique_text', 'iteraciones', 'articulos_finales',
+               'criticas_llm', 'fiabilidad_fuentes', 'aprobado_por_critic']),
+        Stage('write', write_stage, ['informe_actual', 'solicitud', 'stage_llm'], ['articulo'],
+              condition=_approved),
+        Stage('remember_facts', remember_facts_stage, ['informe_actual', 'articulos_finales', 'aprobado_por_critic'],
+              ['hechos_guardados'], condition=_approved),
+        Stage('review', review_stage, ['articulo', 'solicitud', 'plan_context', 'stage_llm'], ['noticia_final'],
+              condition=_approved),
+        Stage('validate_html', validate_html_stage, ['noticia_final', 'informe_actual', 'stage_llm'],
+              ['validacion_html'], condition=_approved),
+    ], initial_keys=PIPELINE_INITIAL_KEYS)
+
+
+def build_sequential_crew_graph() -> StageGraph:
+    """
+    El flujo secuencial de create_news_generation_crew expresado como grafo:
+    Manager -> Watchdog -> Critic -> Writer -> Manager (revisión final),
+    sin búsqueda previa ni bucle de corrección
+    """
+    return StageGraph([
+        Stage('plan', plan_stage, ['solicitud', 'stage_llm'], ['plan_context']),
+        Stage('known_facts', known_facts_stage, ['solicitud'], ['hechos_conocidos']),
+        Stage('investigate', investigate_stage,
+              ['solicitud', 'plan_context', 'informacion_pre_buscada', 'hechos_conocidos', 'stage_llm'],
+              ['informe_preliminar']),
+        Stage('critique', single_critique_stage, ['informe_preliminar', 'solicitud', 'stage_llm'],
+              ['informe_actual', 'code_detected', 'critique_text', 'iteraciones']),
+        Stage('write', write_stage, ['informe_actual', 'solicitud', 'stage_llm'], ['articulo']),
+        Stage('review', review_stage, ['articulo', 'solicitud', 'plan_context', 'stage_llm'], ['noticia_final']),
+    ], initial_keys=('solicitud', 'stage_llm', 'informacion_pre_buscada'))
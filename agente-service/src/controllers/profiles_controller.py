@@ -0,0 +1,28 @@
+from src.config.settings import PROFILING_CONFIG
+from src.utils.profiler import list_profiles
+
+
+def handle_list_profiles(limit: int = 50):
+    """
+    Lista los perfiles guardados (más recientes primero)
+
+    Args:
+        limit: Número máximo de perfiles a listar
+
+    Returns:
+        tuple: (dict, int) Los perfiles y el código de estado HTTP
+    """
+    try:
+        profiles = list_profiles(PROFILING_CONFIG['dir'], limit)
+        return {
+            "status": "ok",
+            "directory": PROFILING_CONFIG['dir'],
+            "count": len(profiles),
+            "profiles": profiles
+        }, 200
+
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Error listando los perfiles: {str(e)}"
+        }, 500
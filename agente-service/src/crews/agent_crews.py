@@ -12,6 +12,7 @@ from src.agents.manager_agent import create_manager_agent
 from src.agents.watchdog_agent import create_watchdog_agent
 from src.agents.critic_agent import create_critic_agent
 from src.agents.writer_agent import create_writer_agent
+from src.utils.logger import trace_enabled
 
 
 def create_news_generation_crew(solicitud_noticia: str):
@@ -35,11 +36,11 @@ def create_news_generation_crew(solicitud_noticia: str):
     
     # Crear las tareas en orden secuencial
     # La lógica condicional (CODE01/CODE02) se manejará en el controlador
-    planning_task = create_planning_task(solicitud_noticia)
-    investigation_task = create_investigation_task(solicitud_noticia)
-    critique_task = create_critique_task("", solicitud_noticia)  # Se actualizará con el informe
-    writing_task = create_writing_task("", solicitud_noticia)  # Se actualizará con hechos validados
-    final_review_task = create_final_review_task("", solicitud_noticia)
+    planning_task = create_planning_task(solicitud_noticia, agent=manager)
+    investigation_task = create_investigation_task(solicitud_noticia, agent=watchdog)
+    critique_task = create_critique_task("", solicitud_noticia, agent=critic)  # Se actualizará con el informe
+    writing_task = create_writing_task("", solicitud_noticia, agent=writer)  # Se actualizará con hechos validados
+    final_review_task = create_final_review_task("", solicitud_noticia, agent=manager)
     
     # Configurar dependencias entre tareas (usando context para pasar datos)
     investigation_task.context = [planning_task]
@@ -50,7 +51,7 @@ def create_news_generation_crew(solicitud_noticia: str):
     return Crew(
         agents=[manager, watchdog, critic, writer],
         tasks=[planning_task, investigation_task, critique_task, writing_task, final_review_task],
-        verbose=True,
+        verbose=trace_enabled(),
         process="sequential"  # Ejecutar tareas en secuencia
     )
 
@@ -1,6 +1,15 @@
 import json
+import math
 from flask import Blueprint, request, Response
-from src.controllers.news_controller import handle_news_generation
+from src.config.settings import STAGE_ROUTING
+from src.controllers.news_controller import (
+    handle_admitted_news_generation, handle_admitted_news_generation_on_shared_loop
+)
+from src.controllers.jobs_controller import handle_submit_job, handle_get_job
+from src.controllers.profiles_controller import handle_list_profiles
+from src.controllers.metrics_controller import handle_llm_metrics, handle_admission_metrics, handle_cache_metrics
+from src.controllers.articles_controller import handle_get_article, handle_list_articles
+from src.controllers.derivatives_controller import handle_admitted_article_derivative
 
 # Crear un blueprint para las rutas del agente
 agent_bp = Blueprint('agent', __name__, url_prefix='/agent')
@@ -18,41 +27,239 @@ def health():
     )
 
 
-@agent_bp.route('/generate-news', methods=['POST'])
-def generate_news():
+def _json_response(body, status_code=200):
+    # Usar json.dumps con ensure_ascii=False para preservar caracteres UTF-8
+    return Response(
+        json.dumps(body, ensure_ascii=False),
+        mimetype='application/json; charset=utf-8'
+    ), status_code
+
+
+def _cached_response(body, status_code, headers):
+    """Respuesta de los endpoints con ETag: los errores son dict (JSON), el resto bytes ya codificados"""
+    if isinstance(body, dict):
+        return _json_response(body, status_code)
+    return Response(body, status=status_code, headers=headers)
+
+
+def _read_generation_request():
     """
-    Endpoint para generar noticias usando el flujo completo de agentes
-    Body esperado: {
-        "solicitud": "tema de la noticia a generar",
-        "max_iterations": 3 (opcional),
-        "quality_threshold": 0.8 (opcional)
-    }
+    Extrae los parámetros de generación del body
+
+    Returns:
+        tuple: (params, error_response) - error_response es None si el body es válido
     """
     data = request.get_json() or {}
     solicitud = data.get('solicitud')
     max_iterations = data.get('max_iterations')
     quality_threshold = data.get('quality_threshold')
+    tier = data.get('tier') or 'standard'
+    # El plazo puede llegar en la cabecera X-Request-Timeout (segundos) o en el body
+    deadline_seconds = request.headers.get('X-Request-Timeout') or data.get('deadline_seconds')
+    user_interests = data.get('user_interests') or []
 
     if solicitud is None or str(solicitud).strip() == "":
         error_response = {
             "error": "No se proporcionó solicitud para generación de noticia.",
             "detail": "El campo 'solicitud' es obligatorio y no debe estar vacío."
         }
-        return Response(
-            json.dumps(error_response, ensure_ascii=False),
-            mimetype='application/json; charset=utf-8'
-        ), 400
+        return None, _json_response(error_response, 400)
+
+    # Un nivel desconocido se serviría en silencio con el enrutado de "standard"
+    if not isinstance(tier, str) or tier not in STAGE_ROUTING:
+        error_response = {
+            "error": "Nivel inválido.",
+            "detail": f"'tier' debe ser uno de: {', '.join(STAGE_ROUTING)}."
+        }
+        return None, _json_response(error_response, 400)
 
     # Valores por defecto si no fueron provistos
     if max_iterations is None:
         max_iterations = 3
     if quality_threshold is None:
         quality_threshold = 0.8
-    
-    response, status_code = handle_news_generation(solicitud, max_iterations, quality_threshold)
-    # Usar json.dumps con ensure_ascii=False para preservar caracteres UTF-8
-    return Response(
-        json.dumps(response, ensure_ascii=False),
-        mimetype='application/json; charset=utf-8'
-    ), status_code
+    if deadline_seconds is not None:
+        try:
+            deadline_seconds = float(deadline_seconds)
+            if not math.isfinite(deadline_seconds):
+                raise ValueError(deadline_seconds)
+        except (TypeError, ValueError):
+            error_response = {
+                "error": "Plazo inválido.",
+                "detail": "X-Request-Timeout / 'deadline_seconds' debe ser un número de segundos."
+            }
+            return None, _json_response(error_response, 400)
+
+    # Se aceptan como lista o como texto separado por comas ("tecnología,IA")
+    if isinstance(user_interests, str):
+        user_interests = [i.strip() for i in user_interests.split(',') if i.strip()]
+    if not isinstance(user_interests, list) or not all(isinstance(i, str) for i in user_interests):
+        error_response = {
+            "error": "Intereses inválidos.",
+            "detail": "'user_interests' debe ser una lista de textos o un texto separado por comas."
+        }
+        return None, _json_response(error_response, 400)
+
+    return (solicitud, max_iterations, quality_threshold, tier, deadline_seconds, user_interests), None
+
+
+def _client_headers():
+    """Identidad del cliente para el control de admisión: (X-API-Key, X-Client-ID, IP)"""
+    return request.headers.get('X-API-Key'), request.headers.get('X-Client-ID'), request.remote_addr
+
+
+def _generation_response(body, status_code):
+    # Las peticiones rechazadas por admisión (o sin LLM ni material) indican cuándo reintentar
+    response, status_code = _json_response(body, status_code)
+    if status_code in (429, 503) and 'retry_after' in body:
+        response.headers['Retry-After'] = str(body['retry_after'])
+    # Las noticias extractivas del modo degradado se distinguen sin leer el body
+    if body.get('modo') == 'degradado':
+        response.headers['X-Generation-Mode'] = 'extractive'
+    return response, status_code
 
+
+def _client_socket():
+    """Socket del cliente si el servidor WSGI lo expone (para cancelar al desconectarse)"""
+    return request.environ.get('gunicorn.socket') or request.environ.get('werkzeug.socket')
+
+
+@agent_bp.route('/generate-news', methods=['POST'])
+def generate_news():
+    """
+    Endpoint para generar noticias usando el flujo completo de agentes
+    Body esperado: {
+        "solicitud": "tema de la noticia a generar",
+        "max_iterations": 3 (opcional),
+        "quality_threshold": 0.8 (opcional),
+        "tier": "economy" | "standard" | "premium" (opcional),
+        "deadline_seconds": 120 (opcional, también como cabecera X-Request-Timeout),
+        "user_interests": ["tecnología", "salud"] (opcional, ordenan los artículos que se usan)
+    }
+    """
+    params, error = _read_generation_request()
+    if error:
+        return error
+
+    response, status_code = handle_admitted_news_generation(*_client_headers(), *params,
+                                                            client_socket=_client_socket())
+    return _generation_response(response, status_code)
+
+
+@agent_bp.route('/generate-news-async', methods=['POST'])
+def generate_news_async():
+    """
+    Igual que /generate-news, pero con el controlador asíncrono: las búsquedas de todas
+    las peticiones se esperan en un único event loop compartido por el proceso.
+    Mismo body esperado.
+    """
+    params, error = _read_generation_request()
+    if error:
+        return error
+
+    response, status_code = handle_admitted_news_generation_on_shared_loop(*_client_headers(), *params,
+                                                                           client_socket=_client_socket())
+    return _generation_response(response, status_code)
+
+
+@agent_bp.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Encola una generación de noticia y responde de inmediato con el id del trabajo.
+    Mismo body esperado que /generate-news.
+    """
+    params, error = _read_generation_request()
+    if error:
+        return error
+
+    response, status_code = handle_submit_job(*_client_headers(), *params)
+    return _generation_response(response, status_code)
+
+
+@agent_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Estado de un trabajo encolado y, si terminó, su resultado"""
+    response, status_code = handle_get_job(job_id)
+    return _json_response(response, status_code)
+
+
+@agent_bp.route('/profiles', methods=['GET'])
+def list_profiles():
+    """
+    Lista los perfiles de peticiones guardados (enviar X-Profile: 1 para perfilar una petición).
+    Query opcional: ?limit=50
+    """
+    limit = request.args.get('limit', default=50, type=int)
+    response, status_code = handle_list_profiles(limit)
+    return _json_response(response, status_code)
+
+
+@agent_bp.route('/metrics/admission', methods=['GET'])
+def admission_metrics():
+    """Cola, esperas y rechazos por cliente del control de admisión (para ajustar los pesos)"""
+    response, status_code = handle_admission_metrics()
+    return _json_response(response, status_code)
+
+
+@agent_bp.route('/metrics/cache', methods=['GET'])
+def cache_metrics():
+    """Entradas, tamaño y aciertos del cache compartido entre los workers del host"""
+    response, status_code = handle_cache_metrics()
+    return _json_response(response, status_code)
+
+
+@agent_bp.route('/metrics/llm', methods=['GET'])
+def llm_metrics():
+    """Tokens de prompt, de salida y servidos desde el cache del proveedor, por modelo"""
+    response, status_code = handle_llm_metrics()
+    return _json_response(response, status_code)
+
+
+@agent_bp.route('/articles', methods=['GET'])
+def list_articles():
+    """
+    Lista los artículos archivados, más recientes primero.
+    Query opcional: ?topic=IA en Chile&date=2024-05-01&limit=50&offset=0
+    """
+    body, status_code, headers = handle_list_articles(
+        request.args.get('topic'),
+        request.args.get('date'),
+        request.args.get('limit', type=int),
+        request.args.get('offset', default=0, type=int),
+        request.headers.get('If-None-Match'),
+        request.headers.get('Accept-Encoding', '')
+    )
+    return _cached_response(body, status_code, headers)
+
+
+@agent_bp.route('/articles/<article_id>', methods=['GET'])
+def get_article(article_id):
+    """
+    Devuelve el HTML de un artículo archivado (con ETag; 304 si no cambió).
+    Query opcional: ?format=json para recibirlo junto con el plan, las fuentes y los tiempos
+    """
+    body, status_code, headers = handle_get_article(
+        article_id,
+        request.headers.get('If-None-Match'),
+        request.headers.get('Accept-Encoding', ''),
+        as_json=request.args.get('format') == 'json'
+    )
+    return _cached_response(body, status_code, headers)
+
+
+@agent_bp.route('/articles/<article_id>/derivatives', methods=['POST'])
+def article_derivative(article_id):
+    """
+    Versión derivada de un artículo archivado con una sola llamada al Writer (sin repetir el flujo)
+    Body esperado: {
+        "formato": "resumen" | "social" | "titulares" | "articulo" (opcional, por defecto resumen),
+        "idioma": "inglés" (opcional, por defecto el de la noticia),
+        "tier": "economy" | "standard" | "premium" (opcional)
+    }
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        data = {}
+    response, status_code = handle_admitted_article_derivative(*_client_headers(), article_id, data.get('formato'),
+                                                               data.get('idioma'), data.get('tier') or 'standard')
+    return _generation_response(response, status_code)
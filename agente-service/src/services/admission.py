@@ -0,0 +1,317 @@
+"""
+Control de admisión por cliente delante de la generación de noticias
+
+Cada cliente (API key configurada, id de cliente de un proxy de confianza o IP) tiene:
+- un token bucket que limita cuántas generaciones puede pedir por minuto,
+- un máximo de generaciones simultáneas,
+- un peso en la cola justa ponderada (WFQ).
+
+Cuando no hay hueco (capacidad global o del cliente) la petición espera en la
+cola de su cliente. Al liberarse un hueco se atiende la petición con menor
+etiqueta de finalización virtual: un cliente de peso 2 avanza el doble de
+rápido que uno de peso 1, y un cliente que encola cien temas no adelanta a un
+usuario interactivo que llega después con uno.
+
+Los clientes inactivos (sin peticiones en curso ni en cola y con el bucket
+lleno) se olvidan pasado un tiempo, y hay un máximo de clientes recordados.
+"""
+import hmac
+import math
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from src.config.settings import ADMISSION_CONFIG
+
+
+class AdmissionRejected(Exception):
+    """
+    La petición no se admite
+
+    Args:
+        reason: Motivo (rate_limit, queue_full, wait_timeout)
+        retry_after: Segundos sugeridos antes de reintentar (cabecera Retry-After)
+    """
+
+    def __init__(self, reason: str, retry_after: int, message: str):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Token bucket
+
+    Args:
+        rate: Tokens que se reponen por segundo
+        capacity: Máximo de tokens acumulables (ráfaga)
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self) -> float:
+        """Consume un token. Retorna 0 si lo había o los segundos hasta el siguiente"""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def refund(self):
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+
+class _Waiter:
+    __slots__ = ('tag', 'event', 'granted', 'enqueued_at')
+
+    def __init__(self, tag: float):
+        self.tag = tag
+        self.event = threading.Event()
+        self.granted = False
+        self.enqueued_at = time.monotonic()
+
+
+class _ClientState:
+    def __init__(self, weight: float, bucket: TokenBucket):
+        self.weight = weight
+        self.bucket = bucket
+        self.queue: deque = deque()
+        self.in_flight = 0
+        self.last_tag = 0.0
+        self.admitted = 0
+        self.degraded = 0
+        self.rejected: Dict[str, int] = {}
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.last_seen = time.monotonic()
+
+    def idle(self) -> bool:
+        """Sin peticiones en curso ni en cola y con el bucket lleno: olvidarlo no cambia nada"""
+        self.bucket._refill()
+        return not self.queue and self.in_flight == 0 and self.bucket.tokens >= self.bucket.capacity
+
+
+def client_identity(api_key: Optional[str], client_id: Optional[str], remote_addr: Optional[str],
+                    config: Dict = None) -> str:
+    """
+    Identificador del cliente para la admisión y las métricas
+
+    Las cabeceras las pone quien llama: una API key solo cuenta si está en
+    ADMISSION_API_KEYS (el cliente es su nombre, la clave no se expone) y
+    X-Client-ID solo si ADMISSION_TRUST_CLIENT_ID indica que la fija un proxy
+    que ya autenticó al cliente. En cualquier otro caso se usa la IP, así que
+    cambiar de id no da un bucket nuevo.
+    """
+    config = config or ADMISSION_CONFIG
+    if api_key:
+        for key, name in config['api_keys'].items():
+            if hmac.compare_digest(api_key.encode('utf-8'), key.encode('utf-8')):
+                return f"client:{name}"
+    if client_id and config['trust_client_id']:
+        return f"client:{client_id.strip()[:64]}"
+    return f"ip:{remote_addr or 'desconocida'}"
+
+
+class AdmissionController:
+    """
+    Admisión con límite de tasa, concurrencia por cliente y cola justa ponderada
+
+    Args:
+        config: Parámetros (por defecto, ADMISSION_CONFIG)
+    """
+
+    def __init__(self, config: Dict = None):
+        self.config = {**ADMISSION_CONFIG, **(config or {})}
+        self.max_concurrent = self.config['max_concurrent']
+        self._clients: Dict[str, _ClientState] = {}
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._virtual_time = 0.0
+        # Duración media de una generación (EWMA), para estimar Retry-After
+        self._service_time = float(self.config['initial_service_seconds'])
+
+    def _client(self, client: str) -> _ClientState:
+        state = self._clients.get(client)
+        if state is None:
+            self._evict_idle()
+            weight = self.config['weights'].get(client.split(':', 1)[-1], self.config['default_weight'])
+            bucket = TokenBucket(self.config['rate_per_minute'] / 60.0, self.config['burst'])
+            state = self._clients[client] = _ClientState(weight, bucket)
+        state.last_seen = time.monotonic()
+        return state
+
+    def _evict_idle(self):
+        """Olvida los clientes inactivos y, si aún sobran, los inactivos más antiguos"""
+        now = time.monotonic()
+        for client in [c for c, state in self._clients.items()
+                       if now - state.last_seen > self.config['client_idle_seconds'] and state.idle()]:
+            del self._clients[client]
+        excess = len(self._clients) - self.config['max_clients'] + 1
+        if excess > 0:
+            # Los que tienen peticiones en curso o en cola no se tocan: su estado es el de la cola
+            idle = sorted((state.last_seen, client) for client, state in self._clients.items()
+                          if not state.queue and state.in_flight == 0)
+            for _, client in idle[:excess]:
+                del self._clients[client]
+
+    def _queued(self) -> int:
+        return sum(len(state.queue) for state in self._clients.values())
+
+    def _retry_after(self, minimum: float = 1.0) -> int:
+        # Lo que tardaría en vaciarse la cola actual con la capacidad disponible
+        backlog = (self._queued() + 1) * self._service_time / max(1, self.max_concurrent)
+        return max(1, math.ceil(max(minimum, backlog)))
+
+    def _reject(self, state: _ClientState, reason: str, retry_after: int, message: str):
+        state.rejected[reason] = state.rejected.get(reason, 0) + 1
+        raise AdmissionRejected(reason, retry_after, message)
+
+    def _take_token(self, state: _ClientState):
+        wait = state.bucket.take()
+        if wait:
+            self._reject(state, 'rate_limit', math.ceil(wait),
+                         f"Límite de {self.config['rate_per_minute']} generaciones por minuto superado")
+
+    def _dispatch(self):
+        """Concede huecos libres a las esperas con menor etiqueta virtual (WFQ)"""
+        while self._in_flight < self.max_concurrent:
+            candidates = [
+                state for state in self._clients.values()
+                if state.queue and state.in_flight < self.config['per_client_concurrency']
+            ]
+            if not candidates:
+                return
+            state = min(candidates, key=lambda s: s.queue[0].tag)
+            waiter = state.queue.popleft()
+            self._virtual_time = max(self._virtual_time, waiter.tag)
+            waiter.granted = True
+            state.in_flight += 1
+            self._in_flight += 1
+            waiter.event.set()
+
+    def acquire(self, client: str, timeout: float = None, charge: bool = True) -> float:
+        """
+        Espera un hueco para el cliente
+
+        Args:
+            client: Identificador del cliente (client_identity)
+            timeout: Espera máxima en cola (por defecto, max_wait_seconds)
+            charge: Gasta un token del cliente; False si ya se cobró (trabajos encolados con charge)
+
+        Returns:
+            float: Segundos de espera en cola
+
+        Raises:
+            AdmissionRejected: Límite de tasa, cola del cliente llena o espera agotada
+        """
+        timeout = self.config['max_wait_seconds'] if timeout is None else timeout
+        with self._lock:
+            state = self._client(client)
+            if charge:
+                self._take_token(state)
+            if len(state.queue) >= self.config['max_queue_per_client']:
+                if charge:
+                    state.bucket.refund()
+                self._reject(state, 'queue_full', self._retry_after(),
+                             f"Ya hay {len(state.queue)} generaciones de este cliente en espera")
+            tag = max(self._virtual_time, state.last_tag) + 1.0 / state.weight
+            state.last_tag = tag
+            waiter = _Waiter(tag)
+            state.queue.append(waiter)
+            self._dispatch()
+
+        waiter.event.wait(timeout)
+        with self._lock:
+            waited = time.monotonic() - waiter.enqueued_at
+            if not waiter.granted:
+                state.queue.remove(waiter)
+                self._reject(state, 'wait_timeout', self._retry_after(),
+                             f"No hubo capacidad en {timeout:.0f}s de espera")
+            state.admitted += 1
+            state.wait_total += waited
+            state.wait_max = max(state.wait_max, waited)
+            return waited
+
+    def charge(self, client: str, degraded: bool = False):
+        """
+        Gasta un token del cliente sin ocupar hueco ni esperar en cola
+
+        Para las respuestas degradadas por carga y los trabajos que se encolan:
+        también cuentan para el límite de tasa.
+
+        Args:
+            client: Identificador del cliente (client_identity)
+            degraded: Se cobra una respuesta degradada (se cuenta en stats)
+
+        Raises:
+            AdmissionRejected: Límite de tasa
+        """
+        with self._lock:
+            state = self._client(client)
+            self._take_token(state)
+            if degraded:
+                state.degraded += 1
+
+    def release(self, client: str, service_seconds: float = None):
+        """Libera el hueco del cliente y atiende la siguiente espera"""
+        with self._lock:
+            state = self._client(client)
+            state.in_flight -= 1
+            self._in_flight -= 1
+            if service_seconds is not None:
+                self._service_time = 0.8 * self._service_time + 0.2 * service_seconds
+            self._dispatch()
+
+    def load(self) -> float:
+        """Generaciones en curso y en cola respecto de la capacidad (1.0 = todos los huecos ocupados)"""
+        with self._lock:
+            return (self._in_flight + self._queued()) / max(1, self.max_concurrent)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            clients = {}
+            for client, state in self._clients.items():
+                state.bucket._refill()
+                clients[client] = {
+                    'weight': state.weight,
+                    'in_flight': state.in_flight,
+                    'queued': len(state.queue),
+                    'oldest_wait_seconds': round(time.monotonic() - state.queue[0].enqueued_at, 2) if state.queue else 0.0,
+                    'admitted': state.admitted,
+                    'degraded': state.degraded,
+                    'rejected': dict(state.rejected),
+                    'avg_wait_seconds': round(state.wait_total / state.admitted, 3) if state.admitted else 0.0,
+                    'max_wait_seconds': round(state.wait_max, 3),
+                    'tokens': round(state.bucket.tokens, 2)
+                }
+            return {
+                'max_concurrent': self.max_concurrent,
+                'in_flight': self._in_flight,
+                'queued': self._queued(),
+                'service_seconds_ewma': round(self._service_time, 2),
+                'clients': clients
+            }
+
+
+_admission: Optional[AdmissionController] = None
+_admission_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    """Controlador compartido por el proceso"""
+    global _admission
+    with _admission_lock:
+        if _admission is None:
+            _admission = AdmissionController()
+        return _admission
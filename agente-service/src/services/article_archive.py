@@ -0,0 +1,236 @@
+"""
+Archivo de artículos generados
+
+Cada noticia aprobada se guarda comprimida (gzip, o zstd si el paquete
+zstandard está instalado y se configura) junto con su informe validado y sus
+metadatos, en una base sqlite indexada por fecha y por cada término del tema. Las versiones
+derivadas (resumen, redes, otro idioma) se guardan junto al artículo. Releer un artículo no
+vuelve a ejecutar el flujo: con gzip los bytes guardados se sirven tal cual
+con Content-Encoding, sin descomprimir.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from html import unescape
+from typing import Dict, List, Optional
+
+from src.config.settings import ARCHIVE_CONFIG
+from src.utils.keywords import normalize_topic
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+_TITLE_RE = re.compile(r'<h1[^>]*>(.*?)</h1>', re.S | re.I)
+_TAG_RE = re.compile(r'<[^>]+>')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    id TEXT PRIMARY KEY,
+    topic TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    created_date TEXT NOT NULL,
+    title TEXT,
+    solicitud TEXT,
+    codec TEXT NOT NULL,
+    html BLOB NOT NULL,
+    informe BLOB,
+    metadata TEXT,
+    etag TEXT NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_articles_topic ON articles (topic, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_articles_date ON articles (created_date, created_at DESC);
+CREATE TABLE IF NOT EXISTS article_topics (
+    term TEXT NOT NULL,
+    article_id TEXT NOT NULL,
+    PRIMARY KEY (term, article_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS derivatives (
+    article_id TEXT NOT NULL,
+    format TEXT NOT NULL,
+    language TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    codec TEXT NOT NULL,
+    content BLOB NOT NULL,
+    PRIMARY KEY (article_id, format, language)
+);
+"""
+
+_LIST_COLUMNS = "id, topic, created_at, created_date, title, solicitud, etag, size"
+
+
+def _compress(data: bytes, codec: str, level: int) -> bytes:
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    # mtime=0: la misma entrada produce los mismos bytes
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    """Descomprime un blob guardado con el codec indicado"""
+    if codec == 'zstd':
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def _extract_title(html: str) -> str:
+    match = _TITLE_RE.search(html or '')
+    return unescape(_TAG_RE.sub('', match.group(1))).strip() if match else ''
+
+
+class ArticleArchive:
+    """
+    Almacén de artículos en sqlite
+
+    Args:
+        db_path: Ruta de la base de datos (se crea si no existe)
+        codec: 'gzip' o 'zstd' (si zstandard no está instalado se usa gzip)
+        level: Nivel de compresión
+    """
+
+    def __init__(self, db_path: str = None, codec: str = None, level: int = None):
+        self.db_path = db_path or ARCHIVE_CONFIG['db_path']
+        codec = codec or ARCHIVE_CONFIG['codec']
+        self.codec = codec if codec == 'gzip' or zstandard is not None else 'gzip'
+        self.level = level or ARCHIVE_CONFIG['compression_level']
+        if os.path.dirname(self.db_path):
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(_SCHEMA)
+        self._index_missing_topics()
+
+    def _index_missing_topics(self):
+        """Indexa los términos de los artículos guardados antes de existir article_topics"""
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT id, topic FROM articles WHERE id NOT IN (SELECT DISTINCT article_id FROM article_topics)"
+            ).fetchall()
+            for row in rows:
+                self._conn.executemany("INSERT OR IGNORE INTO article_topics VALUES (?, ?)",
+                                       [(term, row['id']) for term in set(row['topic'].split())])
+
+    def save(self, html: str, solicitud: str, informe: str = "", metadata: Dict = None) -> str:
+        """
+        Guarda un artículo
+
+        Args:
+            html: HTML final del artículo
+            solicitud: Solicitud original (de ella sale el tema del índice)
+            informe: Informe validado (CODE02) del que se redactó
+            metadata: Plan, fuentes, tiempos... (se guarda como JSON)
+
+        Returns:
+            str: El id del artículo
+        """
+        article_id = uuid.uuid4().hex
+        raw = html.encode('utf-8')
+        now = time.time()
+        topic = normalize_topic(solicitud)
+        row = (
+            article_id,
+            topic,
+            now,
+            time.strftime('%Y-%m-%d', time.gmtime(now)),
+            _extract_title(html),
+            solicitud,
+            self.codec,
+            _compress(raw, self.codec, self.level),
+            _compress(informe.encode('utf-8'), self.codec, self.level) if informe else None,
+            json.dumps(metadata or {}, ensure_ascii=False),
+            hashlib.sha256(raw).hexdigest()[:32],
+            len(raw)
+        )
+        with self._lock, self._conn:
+            self._conn.execute("INSERT INTO articles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+            self._conn.executemany("INSERT OR IGNORE INTO article_topics VALUES (?, ?)",
+                                   [(term, article_id) for term in set(topic.split())])
+        return article_id
+
+    def get_compressed(self, article_id: str) -> Optional[Dict]:
+        """
+        Fila del artículo con el HTML aún comprimido (para servirlo sin descomprimir)
+
+        Returns:
+            Dict con id, codec, html (bytes comprimidos), etag, size, metadatos... o None
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM articles WHERE id = ?", (article_id,)).fetchone()
+        if row is None:
+            return None
+        article = dict(row)
+        article['metadata'] = json.loads(article['metadata'] or '{}')
+        return article
+
+    def get(self, article_id: str) -> Optional[Dict]:
+        """Artículo con el HTML y el informe ya descomprimidos, o None"""
+        article = self.get_compressed(article_id)
+        if article is None:
+            return None
+        article['html'] = decompress(article['html'], article['codec']).decode('utf-8')
+        article['informe'] = decompress(article['informe'], article['codec']).decode('utf-8') if article['informe'] else ''
+        return article
+
+    def get_derivative(self, article_id: str, fmt: str, language: str = "") -> Optional[str]:
+        """Versión derivada ya generada (formato e idioma) de un artículo, o None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT codec, content FROM derivatives WHERE article_id = ? AND format = ? AND language = ?",
+                (article_id, fmt, language)
+            ).fetchone()
+        return decompress(row['content'], row['codec']).decode('utf-8') if row else None
+
+    def save_derivative(self, article_id: str, fmt: str, language: str, content: str):
+        """Guarda una versión derivada para no volver a pedirla al modelo"""
+        row = (article_id, fmt, language, time.time(), self.codec,
+               _compress(content.encode('utf-8'), self.codec, self.level))
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO derivatives VALUES (?, ?, ?, ?, ?, ?)", row)
+
+    def list(self, topic: str = None, date: str = None, limit: int = 50, offset: int = 0) -> List[Dict]:
+        """
+        Artículos más recientes, opcionalmente filtrados por tema o fecha (YYYY-MM-DD)
+
+        El tema se normaliza como la solicitud y basta con que sus términos estén
+        entre los del artículo: "inteligencia artificial" encuentra los artículos
+        de "Avances de la inteligencia artificial en medicina".
+
+        Returns:
+            List[Dict]: Metadatos de índice, sin HTML
+        """
+        clauses, params = [], []
+        terms = sorted(set(normalize_topic(topic).split())) if topic else []
+        if terms:
+            clauses.append(f"id IN (SELECT article_id FROM article_topics WHERE term IN ({', '.join('?' * len(terms))}) "
+                           "GROUP BY article_id HAVING COUNT(*) = ?)")
+            params.extend([*terms, len(terms)])
+        if date:
+            clauses.append("created_date = ?")
+            params.append(date)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        query = f"SELECT {_LIST_COLUMNS} FROM articles {where} ORDER BY created_at DESC LIMIT ? OFFSET ?"
+        with self._lock:
+            rows = self._conn.execute(query, (*params, limit, offset)).fetchall()
+        return [dict(row) for row in rows]
+
+
+_archive: Optional[ArticleArchive] = None
+_archive_lock = threading.Lock()
+
+
+def get_article_archive() -> ArticleArchive:
+    """Archivo compartido por el proceso (se abre en el primer uso)"""
+    global _archive
+    with _archive_lock:
+        if _archive is None:
+            _archive = ArticleArchive()
+        return _archive
@@ -0,0 +1,102 @@
+"""
+Artículo extractivo para el modo degradado
+
+Cuando no hay capacidad de LLM (circuito abierto o sobrecarga) la noticia se
+arma solo con CPU local: las frases de los títulos y resúmenes de la búsqueda
+se ordenan con TextRank (src.utils.extractive_summary) y se vuelcan, sin
+reescribirlas, en el mismo esquema <article> header/section/footer que exige
+create_writing_task. Cada frase conserva su fuente, que se cita en el footer.
+"""
+import html
+from typing import Dict, List
+
+from src.config.settings import DEGRADED_CONFIG
+from src.utils.article_dedup import deduplicate_articles
+from src.utils.extractive_summary import rank_sentences, tokenize
+from src.utils.html_postprocessor import postprocess_article_html
+from src.utils.report_diff import split_sentences
+
+_MIN_SENTENCE_CHARS = 30
+
+
+def _candidate_sentences(articles: List[Dict], solicitud: str) -> List[Dict]:
+    """Frases de los artículos con el índice del artículo del que salen"""
+    candidates = []
+    seen = set()
+    query_terms = set(tokenize(solicitud))
+    for index, article in enumerate(articles):
+        # Sin ningún término de la solicitud el artículo es ruido de la búsqueda
+        if query_terms and not query_terms & set(tokenize(f"{article.get('title', '')} {article.get('snippet', '')}")):
+            continue
+        # El título encabeza la noticia: solo se usa como frase si no hay resumen
+        text = article.get('snippet') or article.get('title', '')
+        for sentence in split_sentences(text):
+            sentence = sentence.strip(' -–|')
+            key = sentence.lower()
+            if len(sentence) < _MIN_SENTENCE_CHARS or key in seen:
+                continue
+            seen.add(key)
+            candidates.append({'text': sentence, 'article': index})
+    return candidates
+
+
+def _paragraphs(sentences: List[str], per_paragraph: int) -> List[str]:
+    return [' '.join(sentences[i:i + per_paragraph]) for i in range(0, len(sentences), per_paragraph)]
+
+
+def _source_item(article: Dict) -> str:
+    # Las copias de una misma nota citan todos sus medios
+    name = html.escape(', '.join(article.get('sources') or []) or article.get('source') or 'Fuente')
+    title = html.escape(article.get('title') or '')
+    url = article.get('url')
+    if url:
+        return f'<li><a href="{html.escape(url, quote=True)}">{name}</a>: {title}</li>'
+    return f'<li>{name}: {title}</li>'
+
+
+def build_degraded_article(solicitud: str, articles: List[Dict], config: Dict = None) -> Dict:
+    """
+    Arma la noticia extractiva a partir de los artículos de la búsqueda
+
+    Args:
+        solicitud: Solicitud del usuario (orienta qué frases suben)
+        articles: Artículos de RetrievalEngine (title, url, snippet, source)
+        config: Límites (por defecto, DEGRADED_CONFIG)
+
+    Returns:
+        Dict: 'html' (resultado de postprocess_article_html), 'frases' usadas y 'fuentes'
+            citadas; 'html' es None si la búsqueda no trajo material suficiente
+    """
+    config = {**DEGRADED_CONFIG, **(config or {})}
+    articles = deduplicate_articles(articles or [])
+    candidates = _candidate_sentences(articles, solicitud)
+    order = rank_sentences([c['text'] for c in candidates], query=solicitud)[:config['max_sentences']]
+    if len(order) < config['min_sentences']:
+        return {'html': None, 'frases': len(order), 'fuentes': []}
+
+    lead = candidates[order[0]]
+    # El cuerpo sigue el orden de aparición en los artículos, no el de puntuación
+    body = sorted(order[1:])
+    cited = sorted({lead['article'], *(candidates[i]['article'] for i in body)})
+    headline = articles[lead['article']].get('title') or solicitud
+
+    paragraphs = _paragraphs([html.escape(candidates[i]['text']) for i in body], config['sentences_per_paragraph'])
+    article_html = (
+        '<article>'
+        f'<header><h1>{html.escape(headline)}</h1>'
+        f'<p class="entradilla">{html.escape(lead["text"])}</p></header>'
+        '<section class="cuerpo">'
+        + ''.join(f'<p>{paragraph}</p>' for paragraph in paragraphs or [html.escape(lead['text'])]) +
+        '</section>'
+        '<footer><p class="conclusion">Resumen extractivo generado automáticamente a partir de las fuentes '
+        'citadas, sin redacción ni verificación con el modelo de lenguaje.</p>'
+        '<div class="fuentes"><h3>Fuentes:</h3><ul>'
+        + ''.join(_source_item(articles[i]) for i in cited) +
+        '</ul></div></footer>'
+        '</article>'
+    )
+    return {
+        'html': postprocess_article_html(article_html),
+        'frases': len(order),
+        'fuentes': [{k: articles[i].get(k) for k in ('title', 'url', 'source')} for i in cited]
+    }
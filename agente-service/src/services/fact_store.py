@@ -0,0 +1,270 @@
+"""
+Almacén de hechos validados entre artículos
+
+De cada informe aprobado (CODE02) se guardan las frases que afirman algo
+sobre una entidad con nombre propio (empresa, persona, institución, evento),
+con las URLs de las fuentes que la respaldan y cuándo se validó. Si el mismo
+hecho vuelve a aprobarse se suma una confirmación.
+
+Un índice invertido (término de la entidad -> hecho) permite recuperar en
+una sola consulta los hechos relevantes para una nueva solicitud, que se
+inyectan en la tarea de investigación: las noticias de seguimiento sobre un
+tema en curso parten de lo ya verificado.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from src.config.settings import FACT_STORE_CONFIG
+from src.utils.keywords import extract_keywords, strip_accents
+from src.utils.report_diff import split_sentences
+
+_UPPER = 'A-ZÁÉÍÓÚÑÜ'
+_WORD = r'[\wáéíóúñü.&-]+'
+# "Banco Central de Chile", "OpenAI", "OMS": palabras con mayúscula, con conectores en medio
+_ENTITY_RE = re.compile(
+    rf"\b[{_UPPER}]{_WORD}(?:\s+(?:(?:de|del|la|las|los|y|e)\s+)?[{_UPPER}]{_WORD})*"
+)
+_ACRONYM_RE = re.compile(rf"\b[{_UPPER}]{{2,5}}\b")
+_LEADING_ARTICLE_RE = re.compile(r'^(?:El|La|Los|Las|Un|Una)\s+')
+# Primera palabra de la frase y el conector que la une a la entidad ("Ayer la OMS" -> "OMS")
+_LEADING_STARTER_RE = re.compile(r'^\S+(?:\s+(?:(?:de|del|la|las|los|y|e)\s+)?|$)')
+_URL_RE = re.compile(r'https?://[^\s)\]>,;]+')
+_BULLET_RE = re.compile(r'^[\s\-*•#>\d.)]+')
+# Frases del informe que hablan del propio informe, no del tema
+_META_PREFIXES = ('fuente', 'fuentes', 'nota', 'calidad', 'contexto', 'informe', 'hechos principales', 'veredicto')
+# Palabras que abren una frase con mayúscula sin ser un nombre propio ("Ayer", "Según", "Este")
+_SENTENCE_STARTERS = {
+    'el', 'la', 'los', 'las', 'un', 'una', 'unos', 'unas', 'lo', 'este', 'esta', 'estos', 'estas', 'ese', 'esa',
+    'esto', 'eso', 'ello', 'ellos', 'ellas', 'en', 'de', 'del', 'a', 'al', 'con', 'por', 'para', 'sin', 'sobre',
+    'tras', 'desde', 'durante', 'segun', 'entre', 'ante', 'y', 'o', 'pero', 'aunque', 'si', 'no', 'cuando',
+    'mientras', 'como', 'ademas', 'tambien', 'asimismo', 'ayer', 'hoy', 'manana', 'hay', 'se',
+    'su', 'sus', 'otro', 'otra', 'otros', 'otras', 'cada', 'todo', 'todos', 'todas', 'ambos', 'varios', 'varias',
+    'muchos', 'muchas', 'algunos', 'algunas', 'nuevo', 'nueva', 'nuevos', 'nuevas', 'mas', 'menos', 'que',
+    'the', 'an', 'this', 'in', 'on', 'for'
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS facts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    entity_key TEXT NOT NULL,
+    entity TEXT NOT NULL,
+    fact TEXT NOT NULL,
+    fact_hash TEXT NOT NULL,
+    sources TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    confirmations INTEGER NOT NULL DEFAULT 1,
+    UNIQUE (entity_key, fact_hash)
+);
+CREATE TABLE IF NOT EXISTS fact_terms (
+    term TEXT NOT NULL,
+    fact_id INTEGER NOT NULL,
+    PRIMARY KEY (term, fact_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_facts_last_seen ON facts (last_seen);
+"""
+
+
+def _index_terms(text: str, limit: int = 6) -> List[str]:
+    """Términos del índice: palabras clave sin acentos más las siglas (OMS, ONU, IA)"""
+    terms = extract_keywords(text, limit=limit)
+    # Las siglas cortas no pasan el filtro de longitud de extract_keywords
+    terms += [acronym.lower() for acronym in _ACRONYM_RE.findall(text or '') if acronym.lower() not in terms]
+    return terms
+
+
+def extract_entities(sentence: str) -> List[str]:
+    """Entidades con nombre propio de una frase (la primera palabra cuenta salvo que sea solo la mayúscula inicial)"""
+    entities = []
+    for match in _ENTITY_RE.finditer(sentence):
+        entity = match.group(0).strip(' .-')
+        # "Ayer", "Según" o "Este" llevan mayúscula por abrir la frase; "OpenAI despedirá..." no
+        if match.start() == 0 and _is_sentence_starter(entity.split()[0]):
+            entity = _LEADING_STARTER_RE.sub('', entity)
+            if not entity:
+                continue
+        entity = _LEADING_ARTICLE_RE.sub('', entity)
+        if len(entity) > 1 and entity not in entities:
+            entities.append(entity)
+    return entities
+
+
+def _is_sentence_starter(word: str) -> bool:
+    """Palabra común que solo lleva mayúscula por abrir la frase (o adverbio en -mente)"""
+    lowered = strip_accents(word.lower())
+    return lowered in _SENTENCE_STARTERS or lowered.endswith('mente')
+
+
+def _fact_sources(sentence: str, entities: List[str], articles: List[Dict], limit: int,
+                  min_overlap: int) -> List[str]:
+    """
+    URLs que respaldan el hecho
+
+    Las citadas en la frase cuentan siempre. Un artículo del lote solo respalda
+    el hecho si nombra la entidad (o la frase cita su fuente) y además comparte
+    con la frase términos de lo que se afirma: nombrar la misma empresa no basta.
+    """
+    urls = _URL_RE.findall(sentence)
+    lowered = sentence.lower()
+    entity_words = [word for entity in entities for word in entity.split()]
+    claim_terms = set(extract_keywords(_URL_RE.sub(' ', sentence), limit=10, exclude=entity_words))
+    if not claim_terms:
+        return urls[:limit]
+    needed = min(min_overlap, len(claim_terms))
+    for article in articles:
+        if len(urls) >= limit:
+            break
+        url = article.get('url')
+        if not url or url in urls:
+            continue
+        text = f"{article.get('title', '')} {article.get('snippet', '')}".lower()
+        source = (article.get('source') or '').lower()
+        if not (any(entity.lower() in text for entity in entities) or (len(source) > 2 and source in lowered)):
+            continue
+        words = set(re.findall(r'\w+', strip_accents(text)))
+        if len(claim_terms & words) >= needed:
+            urls.append(url)
+    return urls[:limit]
+
+
+def extract_facts(report: str, articles: List[Dict], config: Dict = None) -> List[Dict]:
+    """
+    Hechos de un informe aprobado
+
+    Args:
+        report: Informe validado (CODE02)
+        articles: Artículos usados en el informe (para asociar las fuentes)
+        config: Límites (por defecto, FACT_STORE_CONFIG)
+
+    Returns:
+        List[Dict]: Hechos con 'entity', 'fact' y 'sources'
+    """
+    config = {**FACT_STORE_CONFIG, **(config or {})}
+    facts = []
+    for sentence in split_sentences(report):
+        sentence = _BULLET_RE.sub('', sentence).replace('**', '').strip()
+        if not (config['min_fact_chars'] <= len(sentence) <= config['max_fact_chars']):
+            continue
+        if sentence.endswith(':') or sentence.lower().startswith(_META_PREFIXES):
+            continue
+        entities = extract_entities(sentence)
+        if not entities:
+            continue
+        sources = _fact_sources(sentence, entities, articles, config['max_sources_per_fact'],
+                                config['min_source_overlap'])
+        # Sin fuente que lo respalde no es un hecho reutilizable
+        if not sources:
+            continue
+        facts.append({'entity': entities[0], 'entities': entities, 'fact': sentence, 'sources': sources})
+        if len(facts) >= config['max_facts_per_report']:
+            break
+    return facts
+
+
+class FactStore:
+    """
+    Hechos validados en sqlite con índice por términos de la entidad
+
+    Args:
+        db_path: Ruta de la base de datos (se crea si no existe)
+    """
+
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or FACT_STORE_CONFIG['db_path']
+        if os.path.dirname(self.db_path):
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(_SCHEMA)
+
+    def add_facts(self, facts: List[Dict]) -> int:
+        """
+        Guarda (o confirma) hechos extraídos con extract_facts
+
+        Returns:
+            int: Hechos nuevos
+        """
+        now = time.time()
+        added = 0
+        with self._lock, self._conn:
+            for fact in facts:
+                entity_key = ' '.join(sorted(set(_index_terms(fact['entity'])))) or fact['entity'].lower()
+                fact_hash = hashlib.sha1(' '.join(fact['fact'].lower().split()).encode('utf-8')).hexdigest()
+                row = self._conn.execute(
+                    "SELECT id, sources FROM facts WHERE entity_key = ? AND fact_hash = ?", (entity_key, fact_hash)
+                ).fetchone()
+                if row:
+                    sources = list(dict.fromkeys(json.loads(row['sources']) + fact['sources']))
+                    self._conn.execute(
+                        "UPDATE facts SET last_seen = ?, confirmations = confirmations + 1, sources = ? WHERE id = ?",
+                        (now, json.dumps(sources[:FACT_STORE_CONFIG['max_sources_per_fact']]), row['id'])
+                    )
+                    continue
+                fact_id = self._conn.execute(
+                    "INSERT INTO facts (entity_key, entity, fact, fact_hash, sources, first_seen, last_seen) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (entity_key, fact['entity'], fact['fact'], fact_hash, json.dumps(fact['sources']), now, now)
+                ).lastrowid
+                terms = {term for entity in fact.get('entities', [fact['entity']]) for term in _index_terms(entity)}
+                self._conn.executemany("INSERT OR IGNORE INTO fact_terms VALUES (?, ?)",
+                                       [(term, fact_id) for term in terms])
+                added += 1
+        return added
+
+    def lookup(self, text: str, limit: int = None, max_age_days: float = None) -> List[Dict]:
+        """
+        Hechos relevantes para un texto (solicitud o plan)
+
+        Se ordenan por términos coincidentes, confirmaciones y antigüedad.
+
+        Returns:
+            List[Dict]: Hechos con entity, fact, sources, last_seen y confirmations
+        """
+        limit = limit or FACT_STORE_CONFIG['max_facts_injected']
+        max_age_days = FACT_STORE_CONFIG['max_age_days'] if max_age_days is None else max_age_days
+        terms = _index_terms(text, limit=10)
+        if not terms:
+            return []
+        placeholders = ','.join('?' * len(terms))
+        query = f"""
+            SELECT f.entity, f.fact, f.sources, f.last_seen, f.confirmations, COUNT(*) AS matches
+            FROM fact_terms t JOIN facts f ON f.id = t.fact_id
+            WHERE t.term IN ({placeholders}) AND f.last_seen >= ?
+            GROUP BY f.id
+            ORDER BY matches DESC, f.confirmations DESC, f.last_seen DESC
+            LIMIT ?
+        """
+        with self._lock:
+            rows = self._conn.execute(query, (*terms, time.time() - max_age_days * 86400, limit)).fetchall()
+        return [{**dict(row), 'sources': json.loads(row['sources'])} for row in rows]
+
+
+def format_known_facts(facts: List[Dict]) -> str:
+    """Hechos en el formato compacto que se inyecta en la tarea de investigación"""
+    lines = []
+    for fact in facts:
+        validated = time.strftime('%Y-%m-%d', time.gmtime(fact['last_seen']))
+        confirmations = f", confirmado {fact['confirmations']} veces" if fact['confirmations'] > 1 else ""
+        lines.append(f"- [{fact['entity']}] {fact['fact']} (fuentes: {', '.join(fact['sources'])}; "
+                     f"validado {validated}{confirmations})")
+    return '\n'.join(lines)
+
+
+_store: Optional[FactStore] = None
+_store_lock = threading.Lock()
+
+
+def get_fact_store() -> FactStore:
+    """Almacén compartido por el proceso (se abre en el primer uso)"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = FactStore()
+        return _store
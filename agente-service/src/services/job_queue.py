@@ -0,0 +1,330 @@
+"""
+Cola de trabajos distribuida para generar noticias en varios nodos
+
+Los trabajos se encolan en un broker compatible con Redis y se enrutan con
+hashing consistente sobre el tema normalizado: las solicitudes sobre el mismo
+tema caen siempre en el mismo nodo, que así reutiliza sus caches locales. Los
+resultados se guardan en el propio broker, de modo que cualquier nodo de API
+puede leerlos.
+
+Sin REDIS_URL se usa InMemoryBroker, un sustituto local con la misma interfaz
+(útil para desarrollo y pruebas en un solo proceso).
+
+El trabajador toma cada trabajo con BLMOVE a una lista de "en proceso" del nodo
+y lo quita de ahí al guardar el resultado: si el proceso muere a mitad, al
+arrancar de nuevo devuelve a la cola lo que quedó en proceso (un trabajador por
+nodo). Los errores del broker no lo detienen: reintenta con espera creciente.
+"""
+import bisect
+import hashlib
+import json
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from typing import Callable, Dict, List, Optional
+
+from src.config.settings import DISTRIBUTED_CONFIG
+from src.utils.keywords import normalize_topic
+from src.utils.logger import current_request_id, get_logger, start_request
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+_JOB_KEY = "job:{}"
+_QUEUE_KEY = "jobs:{}"
+_PROCESSING_KEY = "jobs:{}:processing"
+
+logger = get_logger(__name__)
+
+
+class ConsistentHashRing:
+    """
+    Anillo de hashing consistente con nodos virtuales
+
+    Al añadir o quitar un nodo solo se reasigna la fracción de temas que le
+    corresponde, el resto conserva su nodo (y sus caches).
+    """
+
+    def __init__(self, nodes: List[str] = (), virtual_nodes: int = 100):
+        self.virtual_nodes = virtual_nodes
+        self._keys: List[int] = []
+        self._ring: Dict[int, str] = {}
+        for node in nodes:
+            self.add_node(node)
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], 'big')
+
+    def add_node(self, node: str):
+        for i in range(self.virtual_nodes):
+            key = self._hash(f"{node}#{i}")
+            if key not in self._ring:
+                self._ring[key] = node
+                bisect.insort(self._keys, key)
+
+    def remove_node(self, node: str):
+        for i in range(self.virtual_nodes):
+            key = self._hash(f"{node}#{i}")
+            if self._ring.get(key) == node:
+                del self._ring[key]
+                self._keys.remove(key)
+
+    def get_node(self, key: str) -> str:
+        if not self._keys:
+            raise ValueError("El anillo no tiene nodos")
+        index = bisect.bisect(self._keys, self._hash(key)) % len(self._keys)
+        return self._ring[self._keys[index]]
+
+
+class InMemoryBroker:
+    """
+    Sustituto local de Redis con el subconjunto de comandos que usa la cola
+    (lpush, blmove, lmove, lrem, llen, hset, hgetall, expire), con las mismas firmas que redis-py
+    """
+
+    def __init__(self):
+        self._lists = defaultdict(deque)
+        self._hashes: Dict[str, Dict[str, str]] = {}
+        self._expiry: Dict[str, float] = {}
+        self._condition = threading.Condition()
+
+    def _purge(self, key: str):
+        expires = self._expiry.get(key)
+        if expires is not None and expires <= time.time():
+            self._hashes.pop(key, None)
+            self._expiry.pop(key, None)
+
+    def lpush(self, key: str, *values) -> int:
+        with self._condition:
+            for value in values:
+                self._lists[key].appendleft(value)
+            self._condition.notify_all()
+            return len(self._lists[key])
+
+    def _move(self, first_list: str, second_list: str, src: str, dest: str) -> Optional[str]:
+        source = self._lists[first_list]
+        if not source:
+            return None
+        value = source.popleft() if src == 'LEFT' else source.pop()
+        if dest == 'LEFT':
+            self._lists[second_list].appendleft(value)
+        else:
+            self._lists[second_list].append(value)
+        return value
+
+    def lmove(self, first_list: str, second_list: str, src: str = 'LEFT', dest: str = 'RIGHT') -> Optional[str]:
+        with self._condition:
+            return self._move(first_list, second_list, src, dest)
+
+    def blmove(self, first_list: str, second_list: str, timeout: float, src: str = 'LEFT',
+               dest: str = 'RIGHT') -> Optional[str]:
+        deadline = None if not timeout else time.time() + timeout
+        with self._condition:
+            while True:
+                value = self._move(first_list, second_list, src, dest)
+                if value is not None:
+                    return value
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+
+    def lrem(self, name: str, count: int, value: str) -> int:
+        with self._condition:
+            items = self._lists[name]
+            removed = 0
+            for item in list(items):
+                if item == value and (not count or removed < abs(count)):
+                    items.remove(item)
+                    removed += 1
+            return removed
+
+    def llen(self, key: str) -> int:
+        with self._condition:
+            return len(self._lists[key])
+
+    def hset(self, key: str, mapping: Dict[str, str] = None, **kwargs) -> int:
+        with self._condition:
+            self._purge(key)
+            values = self._hashes.setdefault(key, {})
+            values.update({k: str(v) for k, v in {**(mapping or {}), **kwargs}.items()})
+            return len(values)
+
+    def hgetall(self, key: str) -> Dict[str, str]:
+        with self._condition:
+            self._purge(key)
+            return dict(self._hashes.get(key, {}))
+
+    def expire(self, key: str, seconds: int) -> bool:
+        with self._condition:
+            if key not in self._hashes:
+                return False
+            self._expiry[key] = time.time() + seconds
+            return True
+
+
+_local_broker = InMemoryBroker()
+
+
+def get_broker():
+    """
+    Retorna el broker configurado: Redis si hay REDIS_URL (y el paquete redis
+    está instalado), o el broker en memoria compartido por el proceso
+    """
+    url = DISTRIBUTED_CONFIG["redis_url"]
+    if url:
+        if redis is None:
+            logger.warning("REDIS_URL está configurada pero el paquete redis no está instalado. Usando broker en memoria")
+        else:
+            return redis.Redis.from_url(url, decode_responses=True)
+    return _local_broker
+
+
+def is_local_broker(broker) -> bool:
+    return isinstance(broker, InMemoryBroker)
+
+
+class JobQueue:
+    """
+    Cola de trabajos de generación con enrutado por tema y almacén de resultados
+    """
+
+    def __init__(self, broker=None, nodes: List[str] = None):
+        self.broker = broker or get_broker()
+        self.nodes = list(nodes or DISTRIBUTED_CONFIG["nodes"])
+        self.ring = ConsistentHashRing(self.nodes, DISTRIBUTED_CONFIG["virtual_nodes"])
+
+    def submit(self, solicitud: str, params: Dict = None) -> Dict:
+        """
+        Encola una generación en el nodo que corresponde a su tema
+
+        Args:
+            solicitud: La solicitud de noticia
+            params: Parámetros adicionales para handle_news_generation
+
+        Returns:
+            Dict con job_id, node, topic y status
+        """
+        topic = normalize_topic(solicitud)
+        node = self.ring.get_node(topic)
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "solicitud": solicitud,
+            "params": params or {},
+            "topic": topic,
+            "node": node,
+            # El trabajador continúa con el mismo id de correlación
+            "request_id": current_request_id()
+        }
+        self.broker.hset(_JOB_KEY.format(job_id), mapping={
+            "status": "queued",
+            "node": node,
+            "topic": topic,
+            "solicitud": solicitud,
+            "enqueued_at": time.time()
+        })
+        self.broker.expire(_JOB_KEY.format(job_id), DISTRIBUTED_CONFIG["result_ttl"])
+        self.broker.lpush(_QUEUE_KEY.format(node), json.dumps(job, ensure_ascii=False))
+        return {"job_id": job_id, "node": node, "topic": topic, "status": "queued"}
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Estado (y resultado, si terminó) de un trabajo; None si no existe"""
+        data = self.broker.hgetall(_JOB_KEY.format(job_id))
+        if not data:
+            return None
+        job = {"job_id": job_id, **{k: v for k, v in data.items() if k not in ("result", "status_code")}}
+        if "result" in data:
+            job["result"] = json.loads(data["result"])
+            job["status_code"] = int(data.get("status_code", 200))
+        return job
+
+    def queue_depths(self) -> Dict[str, int]:
+        return {node: self.broker.llen(_QUEUE_KEY.format(node)) for node in self.nodes}
+
+
+class JobWorker:
+    """
+    Proceso trabajador de un nodo: toma trabajos de su cola y guarda el resultado
+
+    Args:
+        node_id: Nodo al que atiende (debe estar en DISTRIBUTED_CONFIG["nodes"])
+        handler: Función (solicitud, **params) -> (dict, código_http)
+        broker: Broker a usar (por defecto, get_broker())
+    """
+
+    def __init__(self, node_id: str, handler: Callable, broker=None):
+        self.node_id = node_id
+        self.handler = handler
+        self.broker = broker or get_broker()
+        self._queue = _QUEUE_KEY.format(node_id)
+        self._processing = _PROCESSING_KEY.format(node_id)
+        self._stop = threading.Event()
+
+    def recover(self) -> int:
+        """Devuelve a la cola los trabajos que quedaron en proceso (el trabajador anterior murió)"""
+        recovered = 0
+        while self.broker.lmove(self._processing, self._queue, 'RIGHT', 'RIGHT') is not None:
+            recovered += 1
+        if recovered:
+            logger.warning("Trabajos recuperados de un trabajador interrumpido",
+                           extra={'node': self.node_id, 'jobs': recovered})
+        return recovered
+
+    def process_one(self, timeout: float = 5) -> bool:
+        """Procesa un trabajo si hay alguno. Retorna True si procesó uno"""
+        # El trabajo sigue en el broker (en proceso) hasta que su resultado queda guardado
+        item = self.broker.blmove(self._queue, self._processing, timeout, 'RIGHT', 'LEFT')
+        if not item:
+            return False
+        try:
+            job = json.loads(item)
+        except ValueError:
+            logger.error("Trabajo ilegible descartado", extra={'node': self.node_id})
+            self.broker.lrem(self._processing, 1, item)
+            return True
+        key = _JOB_KEY.format(job["job_id"])
+        start_request(job.get("request_id"))
+        logger.info("Trabajo iniciado", extra={'job_id': job["job_id"], 'node': self.node_id, 'topic': job["topic"]})
+        self.broker.hset(key, mapping={"status": "running", "started_at": time.time()})
+        try:
+            response, status_code = self.handler(job["solicitud"], **job["params"])
+        except Exception as e:
+            logger.exception("Error en el trabajador", extra={'job_id': job["job_id"]})
+            response, status_code = {"status": "error", "message": f"Error en el trabajador: {str(e)}"}, 500
+        self.broker.hset(key, mapping={
+            "status": "done" if status_code < 500 else "failed",
+            "result": json.dumps(response, ensure_ascii=False),
+            "status_code": status_code,
+            "finished_at": time.time()
+        })
+        self.broker.expire(key, DISTRIBUTED_CONFIG["result_ttl"])
+        self.broker.lrem(self._processing, 1, item)
+        return True
+
+    def run_forever(self):
+        logger.info("Trabajador esperando trabajos", extra={'node': self.node_id})
+        failures = 0
+        recovered = False
+        while not self._stop.is_set():
+            try:
+                if not recovered:
+                    self.recover()
+                    recovered = True
+                self.process_one()
+                failures = 0
+            except Exception:
+                # Broker caído o desconectado: se reintenta; lo que estaba en proceso se recupera al volver
+                failures += 1
+                recovered = False
+                wait = min(DISTRIBUTED_CONFIG["broker_retry_max_seconds"], 2 ** min(failures, 6) / 2)
+                logger.exception("Error del broker, reintentando", extra={'node': self.node_id,
+                                                                           'retry_in': wait})
+                self._stop.wait(wait)
+
+    def stop(self):
+        self._stop.set()
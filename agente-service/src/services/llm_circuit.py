@@ -0,0 +1,118 @@
+"""
+Circuito del proveedor LLM
+
+Cuenta los fallos del proveedor (límite de tasa, caída, timeouts) en las
+generaciones. Tras varios seguidos el circuito se abre y las peticiones van
+directamente al modo degradado, sin ocupar un worker esperando un error.
+Pasado un tiempo se deja pasar una sola generación de prueba (semiabierto):
+si termina bien el circuito se cierra; si falla, vuelve a abrirse.
+"""
+import threading
+import time
+from typing import Dict, Optional
+
+from src.config.settings import DEGRADED_CONFIG
+
+CLOSED = 'cerrado'
+OPEN = 'abierto'
+HALF_OPEN = 'semiabierto'
+
+# Errores de openai/httpx/litellm que indican que el proveedor no responde o limita
+_PROVIDER_ERRORS = frozenset({
+    'RateLimitError', 'APIConnectionError', 'APITimeoutError', 'InternalServerError',
+    'ServiceUnavailableError', 'ConnectTimeout', 'ReadTimeout', 'ConnectError'
+})
+_PROVIDER_MESSAGES = ('rate limit', 'rate_limit', 'error code: 429', 'error code: 503', 'overloaded',
+                      'insufficient_quota', 'connection error')
+
+
+def is_provider_failure(error: BaseException) -> bool:
+    """Si la excepción (o alguna de su cadena) viene del proveedor LLM y no del flujo"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if type(error).__name__ in _PROVIDER_ERRORS:
+            return True
+        message = str(error).lower()
+        if any(marker in message for marker in _PROVIDER_MESSAGES):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class CircuitBreaker:
+    """
+    Circuito con estados cerrado, abierto y semiabierto
+
+    Args:
+        failure_threshold: Fallos seguidos que abren el circuito
+        reset_seconds: Tiempo abierto antes de dejar pasar una prueba
+    """
+
+    def __init__(self, failure_threshold: int = None, reset_seconds: float = None):
+        self.failure_threshold = failure_threshold or DEGRADED_CONFIG['failure_threshold']
+        self.reset_seconds = DEGRADED_CONFIG['reset_seconds'] if reset_seconds is None else reset_seconds
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trips = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow(self) -> bool:
+        """
+        Si la siguiente generación puede usar el LLM
+
+        Con el circuito abierto y el tiempo de espera cumplido, la primera
+        petición pasa como prueba y las demás siguen en modo degradado hasta
+        que la prueba termine (o hasta otro reset_seconds si nunca informa).
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_seconds:
+                return False
+            self._state = HALF_OPEN
+            self._opened_at = time.monotonic()
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self._trips += 1
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            reopen = max(0.0, self.reset_seconds - (time.monotonic() - self._opened_at))
+            return {
+                'estado': self._state,
+                'fallos_seguidos': self._failures,
+                'aperturas': self._trips,
+                'segundos_para_prueba': round(reopen, 1) if self._state == OPEN else 0.0
+            }
+
+
+_circuit: Optional[CircuitBreaker] = None
+_circuit_lock = threading.Lock()
+
+
+def get_llm_circuit() -> CircuitBreaker:
+    """Circuito compartido por el proceso"""
+    global _circuit
+    with _circuit_lock:
+        if _circuit is None:
+            _circuit = CircuitBreaker()
+        return _circuit
@@ -0,0 +1,113 @@
+"""
+Reordenación local de artículos por relevancia
+
+Cada artículo (título + resumen) y cada consulta (la solicitud, las palabras
+clave del plan y cada interés del usuario) se convierten en un vector por
+hashing de términos y bigramas, sin vocabulario ni modelo de embeddings.
+Las similitudes coseno de todos los artículos contra todas las consultas se
+calculan en una sola multiplicación de matrices con NumPy, se combinan con
+el orden que trajo la búsqueda (calidad y número de fuentes que coinciden) y
+solo los top-K artículos pasan al prompt del Watchdog.
+"""
+import zlib
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from src.config.settings import RERANK_CONFIG, RETRIEVAL_CONFIG
+from src.utils.extractive_summary import tokenize
+from src.utils.keywords import extract_keywords
+from src.utils.memo import TTLCache
+
+# Vectores dispersos (índices, valores) por texto: los artículos se repiten entre rondas y peticiones
+_vector_cache = TTLCache(max_entries=RERANK_CONFIG['cache_entries'], ttl=RERANK_CONFIG['cache_ttl'])
+
+
+def _sparse_vector(text: str, dim: int):
+    """Índices y pesos normalizados del vector de hashing de un texto"""
+    key = (dim, text)
+    cached = _vector_cache.get(key)
+    if cached is not None:
+        return cached
+    tokens = tokenize(text)
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    weights: Dict[int, float] = {}
+    for feature in features:
+        hashed = zlib.crc32(feature.encode('utf-8'))
+        # El bit de signo reparte las colisiones entre +1 y -1, para que no sumen similitud
+        index, sign = hashed % dim, 1.0 if hashed & 0x80000000 else -1.0
+        weights[index] = weights.get(index, 0.0) + sign
+    indices = np.fromiter(weights.keys(), dtype=np.int64, count=len(weights))
+    values = np.fromiter(weights.values(), dtype=np.float32, count=len(weights))
+    # TF sublineal: un término repetido en el resumen no domina el vector
+    values = np.sign(values) * np.log1p(np.abs(values))
+    norm = np.linalg.norm(values)
+    if norm:
+        values /= norm
+    _vector_cache.set(key, (indices, values))
+    return indices, values
+
+
+def hashed_matrix(texts: Sequence[str], dim: int = None):
+    """Matriz (textos x dim) de vectores de hashing normalizados"""
+    dim = dim or RERANK_CONFIG['dim']
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        indices, values = _sparse_vector(text, dim)
+        matrix[row, indices] = values
+    return matrix
+
+
+def _article_text(article: Dict) -> str:
+    # El título resume el tema: cuenta dos veces frente al resumen
+    title = article.get('title', '') or ''
+    return f"{title}. {title}. {article.get('snippet', '') or ''}"
+
+
+def rerank_articles(articles: List[Dict], solicitud: str, plan_context: str = "",
+                    user_interests: List[str] = None, extra_context: str = "", top_k: int = None) -> List[Dict]:
+    """
+    Ordena los artículos por similitud con la solicitud, el plan y los intereses
+
+    Args:
+        articles: Artículos ya ordenados por la búsqueda (ese orden cuenta como prior)
+        solicitud: Solicitud del usuario
+        plan_context: Plan del Manager (se usan sus palabras clave)
+        user_interests: Intereses del usuario
+        extra_context: Texto adicional que cuenta como el plan (p. ej. la crítica en la reinvestigación)
+        top_k: Artículos que se conservan (por defecto, RERANK_CONFIG['top_k'])
+
+    Returns:
+        List[Dict]: Los top_k artículos, de más a menos relevante
+    """
+    if not RERANK_CONFIG['enabled']:
+        # Sin reordenación se mantiene el orden y el límite de la búsqueda
+        return list(articles)[:RETRIEVAL_CONFIG['max_articles']]
+    top_k = top_k or RERANK_CONFIG['top_k']
+    if len(articles) <= 1:
+        return list(articles)
+
+    weights = RERANK_CONFIG['weights']
+    plan_terms = ' '.join(extract_keywords(f"{extra_context}\n{plan_context}", limit=12))
+    interests = [i for i in (user_interests or []) if i and i.strip()]
+    queries = [solicitud] + ([plan_terms] if plan_terms else []) + interests
+
+    # Una sola multiplicación: similitud de cada artículo con cada consulta
+    similarity = hashed_matrix([_article_text(a) for a in articles]) @ hashed_matrix(queries).T
+    relevance = weights['solicitud'] * similarity[:, 0]
+    total_weight = weights['solicitud']
+    if plan_terms:
+        relevance += weights['plan'] * similarity[:, 1]
+        total_weight += weights['plan']
+    if interests:
+        # Basta con que el artículo encaje con uno de los intereses
+        relevance += weights['intereses'] * similarity[:, len(queries) - len(interests):].max(axis=1)
+        total_weight += weights['intereses']
+    relevance /= total_weight
+    # Las similitudes de textos cortos son bajas (0.1-0.4): se escalan al rango del prior
+    relevance = np.clip(relevance, 0, None) / (relevance.max() if relevance.max() > 0 else 1)
+
+    prior = 1.0 - np.arange(len(articles)) / len(articles)
+    score = (1 - RERANK_CONFIG['prior_weight']) * relevance + RERANK_CONFIG['prior_weight'] * prior
+    order = np.argsort(-score, kind='stable')[:top_k]
+    return [articles[i] for i in order]
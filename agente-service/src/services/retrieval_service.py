@@ -0,0 +1,367 @@
+"""
+Motor de recuperación de noticias
+
+Lanza en paralelo la consulta original y sus variantes (derivadas del plan
+o de la crítica) contra search_news, aggregate_news y el scraper, combina
+los resultados, elimina duplicados y los ordena por relevancia.
+"""
+import asyncio
+import contextvars
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from src.config.settings import RETRIEVAL_CONFIG, DEADLINE_CONFIG
+from src.utils.article_dedup import deduplicate_articles
+from src.utils.cassette import acassette_call, cassette_call
+from src.utils.deadline import Deadline, deadline_scope, time_budget
+from src.utils.keywords import extract_keywords, strip_accents
+
+# Parámetros de seguimiento que no cambian el contenido de la URL: la familia utm_* y nombres exactos
+# (un prefijo como "ref" también quitaría parámetros de contenido como "reference" o "refresh")
+_TRACKING_PREFIXES = ('utm_',)
+_TRACKING_PARAMS = frozenset({'fbclid', 'gclid', 'ocid', 'cmpid', 'ref', 'at_medium', 'at_campaign'})
+
+# URLs de respaldo que el backend devuelve cuando falla el scraping
+_FALLBACK_URL_PATTERNS = ('google.com/search', 'youtube.com/results')
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _search_executor() -> ThreadPoolExecutor:
+    """Hilos de las búsquedas síncronas, compartidos por todas las peticiones del proceso"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=RETRIEVAL_CONFIG['executor_workers'],
+                                           thread_name_prefix='retrieval')
+        return _executor
+
+
+def normalize_title(title: str) -> str:
+    """Normaliza un título para compararlo (minúsculas, sin acentos ni puntuación)"""
+    text = strip_accents((title or '').lower())
+    # Quitar sufijos de medio: "Titular - BBC News"
+    text = re.split(r'\s+[-|–]\s+', text)[0]
+    return ' '.join(re.sub(r'[^\w\s]', ' ', text).split())
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Reduce una URL a su forma canónica para detectar duplicados
+
+    Elimina esquema, "www.", fragmentos, barras finales y parámetros de seguimiento.
+    """
+    if not url:
+        return ''
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    if host.startswith('m.'):
+        host = host[2:]
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not (k.lower().startswith(_TRACKING_PREFIXES) or k.lower() in _TRACKING_PARAMS)
+    ]
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit(('', host, path, urlencode(sorted(query)), '')).lstrip('/')
+
+
+def build_query_variants(query: str, plan_context: str = "", extra_context: str = "", max_variants: int = 2) -> List[str]:
+    """
+    Genera variantes de la consulta a partir de la solicitud, el plan y la crítica
+
+    La primera variante es la solicitud reducida a sus palabras clave (las solicitudes
+    suelen venir redactadas como instrucciones), el resto añade términos del plan
+    o del reporte de errores.
+    """
+    query_terms = extract_keywords(query, limit=6)
+    variants = []
+    if query_terms:
+        core = ' '.join(query_terms)
+        if core != query.strip().lower():
+            variants.append(core)
+    else:
+        core = query
+
+    context_terms = extract_keywords(f"{extra_context}\n{plan_context}", limit=max_variants * 2, exclude=query_terms)
+    for i in range(0, len(context_terms), 2):
+        variants.append(f"{core} {' '.join(context_terms[i:i + 2])}")
+
+    unique = []
+    for variant in variants:
+        if variant not in unique:
+            unique.append(variant)
+    return unique[:max_variants]
+
+
+def is_high_quality(article: Dict) -> bool:
+    """Un artículo es de calidad si tiene título, URL real y un resumen con contenido"""
+    url = article.get('url', '') or ''
+    if not url.startswith('http') or any(p in url for p in _FALLBACK_URL_PATTERNS):
+        return False
+    return bool(article.get('title')) and len(article.get('snippet', '') or '') >= 40
+
+
+class RetrievalEngine:
+    """
+    Motor de recuperación con fan-out concurrente y fusión de resultados
+
+    Args:
+        news_api_tool: Cliente del backend de noticias (search_news, aggregate_news y sus
+            variantes asíncronas); lo crea el controller
+        scraper_tool: Cliente del scraper (search/asearch)
+        config: Sobrescribe valores de RETRIEVAL_CONFIG
+    """
+
+    def __init__(self, news_api_tool, scraper_tool, config: Dict = None):
+        self.news_api_tool = news_api_tool
+        self.scraper_tool = scraper_tool
+        self.config = {**RETRIEVAL_CONFIG, **(config or {})}
+
+    def _timeout(self) -> float:
+        """Espera máxima de una ronda de búsqueda: su timeout o su parte del plazo restante"""
+        return time_budget(self.config['timeout'], DEADLINE_CONFIG['retrieval_share'])
+
+    async def aclose(self):
+        """Cierra las conexiones asíncronas abiertas por aretrieve"""
+        await self.news_api_tool.aclose()
+
+    def _build_jobs(self, query: str, variants: List[str], user_interests: List[str], include_base: bool = True,
+                    use_async: bool = False) -> List[tuple]:
+        """Lista de (nombre, consulta, peso, callable) a ejecutar en paralelo"""
+        api, scraper = self.news_api_tool, self.scraper_tool
+        search = api.asearch_news if use_async else api.search_news
+        aggregate = api.aaggregate_news if use_async else api.aggregate_news
+        scrape = scraper.asearch if use_async else scraper.search
+
+        jobs = []
+        if include_base:
+            jobs = [
+                ('search_news', query, 1.0, lambda: search(query, user_interests)),
+                ('aggregate_news', query, 1.0, lambda: aggregate(query)),
+                ('scraper', query, 1.0, lambda: scrape(query, self.config['scraper_max_results'])),
+            ]
+        for variant in variants:
+            jobs.append(('search_news', variant, 0.6, lambda v=variant: search(v, user_interests)))
+            jobs.append(('aggregate_news', variant, 0.6, lambda v=variant: aggregate(v)))
+        return jobs
+
+    def _find_duplicate(self, merged: List[Dict], canonical: str, title: str) -> Optional[Dict]:
+        for entry in merged:
+            if canonical and entry['canonical_url'] == canonical:
+                return entry
+            if title and entry['normalized_title'] and SequenceMatcher(
+                None, entry['normalized_title'], title
+            ).ratio() >= self.config['title_similarity']:
+                return entry
+        return None
+
+    def _merge(self, merged: List[Dict], articles: List[Dict], origin: str, weight: float, exclude: set):
+        for article in articles:
+            canonical = canonicalize_url(article.get('url', ''))
+            if canonical in exclude:
+                continue
+            title = normalize_title(article.get('title', ''))
+            entry = self._find_duplicate(merged, canonical, title)
+            if entry is None:
+                merged.append({
+                    'article': dict(article),
+                    'canonical_url': canonical,
+                    'normalized_title': title,
+                    'score': 0.0,
+                    'origins': set()
+                })
+                entry = merged[-1]
+            elif len(article.get('snippet', '') or '') > len(entry['article'].get('snippet', '') or ''):
+                # Conservar la versión con el resumen más completo
+                entry['article'].update({k: v for k, v in article.items() if v})
+            if origin not in entry['origins']:
+                entry['origins'].add(origin)
+                entry['score'] += weight
+
+    @staticmethod
+    def _rank(merged: List[Dict]) -> List[Dict]:
+        def key(entry):
+            quality = 1.0 if is_high_quality(entry['article']) else 0.0
+            return (quality, entry['score'], len(entry['article'].get('snippet', '') or ''))
+        return sorted(merged, key=key, reverse=True)
+
+    def retrieve(self, query: str, plan_context: str = "", user_interests: List[str] = None,
+                 extra_context: str = "", exclude_urls: Iterable[str] = (), include_base: bool = True) -> Dict:
+        """
+        Busca en todas las fuentes a la vez y combina los resultados
+
+        Args:
+            query: Solicitud o término de búsqueda principal
+            plan_context: Plan del Manager, del que se derivan variantes de la consulta
+            user_interests: Intereses del usuario para search_news
+            extra_context: Texto adicional para derivar variantes (p. ej. el reporte del Critic)
+            exclude_urls: URLs ya usadas que no deben volver a aparecer
+            include_base: Si es False solo se lanzan las variantes (la consulta original
+                ya se buscó en otra etapa)
+
+        Returns:
+            Dict con los artículos combinados y ordenados
+        """
+        # El resultado depende de qué fuentes terminan primero: con un cassette se graba la
+        # recuperación entera, no cada búsqueda, para que la reproducción dé los mismos artículos
+        parts = self._cassette_parts(query, plan_context, user_interests, extra_context, exclude_urls, include_base)
+        return cassette_call('retrieval', parts, lambda: self._retrieve(
+            query, plan_context, user_interests, extra_context, exclude_urls, include_base
+        ), label='retrieve', isolate=True)
+
+    @staticmethod
+    def _cassette_parts(query, plan_context, user_interests, extra_context, exclude_urls, include_base) -> List:
+        return [query, plan_context, list(user_interests or []), extra_context,
+                sorted(u for u in exclude_urls if u), include_base]
+
+    def _retrieve(self, query: str, plan_context: str, user_interests: Optional[List[str]], extra_context: str,
+                  exclude_urls: Iterable[str], include_base: bool) -> Dict:
+        variants = build_query_variants(query, plan_context, extra_context, self.config['max_variants'])
+        jobs = self._build_jobs(query, variants, user_interests or [], include_base)
+        exclude = {canonicalize_url(u) for u in exclude_urls if u}
+
+        merged: List[Dict] = []
+        errors = []
+        early_stop = False
+        timeout = self._timeout()
+        # Los timeouts HTTP de las herramientas (time_budget) no pasan del final de la ronda:
+        # una búsqueda que sigue en curso al cortar libera su hilo compartido, como mucho, entonces
+        round_deadline = Deadline(timeout)
+
+        def run_job(fn):
+            with deadline_scope(round_deadline):
+                return fn()
+
+        # Cada búsqueda hereda el contexto (memo, cassette, id de petición) del llamador
+        futures = {_search_executor().submit(contextvars.copy_context().run, run_job, fn): (name, q, weight)
+                   for name, q, weight, fn in jobs}
+        try:
+            for future in as_completed(futures, timeout=timeout):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {'success': False, 'error': str(e)}
+                if self._absorb(merged, errors, result, *futures[future], exclude):
+                    early_stop = True
+                    break
+        except FuturesTimeoutError:
+            errors.append(f"Tiempo de espera agotado ({timeout:.0f}s)")
+        finally:
+            # No esperar a las fuentes lentas (p. ej. el scraper) si ya hay suficiente material;
+            # las que aún no empezaron no llegan a ocupar un hilo
+            for future in futures:
+                future.cancel()
+
+        return self._finalize(merged, errors, early_stop, ([query] if include_base else []) + variants)
+
+    async def aretrieve(self, query: str, plan_context: str = "", user_interests: List[str] = None,
+                        extra_context: str = "", exclude_urls: Iterable[str] = (), include_base: bool = True) -> Dict:
+        """
+        Versión asíncrona de retrieve: todas las peticiones se esperan en el mismo
+        event loop y las pendientes se cancelan al cortar antes
+
+        Args y Returns: igual que retrieve
+        """
+        # Misma clave que retrieve: lo grabado por el flujo síncrono sirve para el asíncrono
+        parts = self._cassette_parts(query, plan_context, user_interests, extra_context, exclude_urls, include_base)
+        return await acassette_call('retrieval', parts, lambda: self._aretrieve(
+            query, plan_context, user_interests, extra_context, exclude_urls, include_base
+        ), label='retrieve', isolate=True)
+
+    async def _aretrieve(self, query: str, plan_context: str, user_interests: Optional[List[str]],
+                         extra_context: str, exclude_urls: Iterable[str], include_base: bool) -> Dict:
+        variants = build_query_variants(query, plan_context, extra_context, self.config['max_variants'])
+        jobs = self._build_jobs(query, variants, user_interests or [], include_base, use_async=True)
+        exclude = {canonicalize_url(u) for u in exclude_urls if u}
+
+        merged: List[Dict] = []
+        errors = []
+        early_stop = False
+        tasks = {asyncio.ensure_future(fn()): (name, q, weight) for name, q, weight, fn in jobs}
+        try:
+            pending = set(tasks)
+            loop = asyncio.get_running_loop()
+            timeout = self._timeout()
+            deadline = loop.time() + timeout
+            while pending and not early_stop:
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0.0, deadline - loop.time()), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    errors.append(f"Tiempo de espera agotado ({timeout:.0f}s)")
+                    break
+                for task in done:
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        result = {'success': False, 'error': str(e)}
+                    if self._absorb(merged, errors, result, *tasks[task], exclude):
+                        early_stop = True
+                        break
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        return self._finalize(merged, errors, early_stop, ([query] if include_base else []) + variants)
+
+    def _absorb(self, merged: List[Dict], errors: List[str], result: Dict, name: str, q: str, weight: float,
+                exclude: set) -> bool:
+        """Incorpora el resultado de una fuente. Retorna True si ya hay suficientes fuentes de calidad"""
+        if not result.get('success'):
+            errors.append(f"{name} ({q}): {result.get('error', 'Error desconocido')}")
+            return False
+        self._merge(merged, result.get('articles', []), f"{name}:{q}", weight, exclude)
+        quality_count = sum(1 for entry in merged if is_high_quality(entry['article']))
+        return quality_count >= self.config['min_quality_sources']
+
+    def _finalize(self, merged: List[Dict], errors: List[str], early_stop: bool, queries: List[str]) -> Dict:
+        ranked = []
+        for entry in self._rank(merged):
+            article = dict(entry['article'])
+            article['origins'] = sorted(entry['origins'])
+            ranked.append(article)
+        # Las notas de agencia replicadas en varios medios ocupan un solo hueco
+        articles = deduplicate_articles(ranked)[:self.config['max_articles']]
+
+        return {
+            'success': bool(articles),
+            'articles': articles,
+            'count': len(articles),
+            'queries': queries,
+            'early_stop': early_stop,
+            'errors': errors,
+            'error': '; '.join(errors) if not articles else None
+        }
+
+
+def merge_article_lists(*article_lists: List[Dict], max_articles: int = None) -> List[Dict]:
+    """
+    Combina listas de artículos ya ordenadas (la primera tiene prioridad),
+    eliminando duplicados por URL canónica y por contenido
+
+    Args:
+        article_lists: Listas de artículos
+        max_articles: Límite de artículos (por defecto, el de RETRIEVAL_CONFIG)
+
+    Returns:
+        List[Dict]: Artículos combinados
+    """
+    seen = set()
+    combined = []
+    for articles in article_lists:
+        for article in articles or []:
+            canonical = canonicalize_url(article.get('url', ''))
+            if canonical and canonical in seen:
+                continue
+            seen.add(canonical)
+            combined.append(article)
+    limit = max_articles or RETRIEVAL_CONFIG['max_articles']
+    return deduplicate_articles(combined)[:limit]
@@ -0,0 +1,123 @@
+"""
+Prefiltro determinista de fiabilidad de fuentes
+
+Puntúa las fuentes de un informe con una tabla precalculada (dominio, nombre
+de fuente y tipo de medio) y decide, cuando el resultado es claro, sin gastar
+una llamada al Critic:
+- CODE02 si hay suficientes fuentes fiables distintas y la media es alta
+- CODE01 si las mejores fuentes siguen siendo poco fiables (se vuelve a buscar)
+- None si no es concluyente: decide el Critic
+"""
+import json
+from functools import lru_cache
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+from src.config.settings import SOURCE_RELIABILITY_CONFIG
+
+
+class SourceReliabilityIndex:
+    """
+    Índice en memoria de la tabla de fiabilidad
+
+    Args:
+        table: Contenido de source_reliability.json
+    """
+
+    def __init__(self, table: Dict):
+        self.default_score = float(table.get('default_score', 0.3))
+        self.domains = {d.lower(): float(s) for d, s in table.get('domains', {}).items()}
+        self.source_names = {n.lower(): float(s) for n, s in table.get('source_names', {}).items()}
+        self.media_types = {t.lower(): float(f) for t, f in table.get('media_types', {}).items()}
+        self.unreliable_patterns = tuple(table.get('unreliable_url_patterns', ()))
+
+    def _domain_score(self, host: str) -> Optional[float]:
+        # www.bbc.co.uk -> bbc.co.uk -> co.uk: el dominio más específico conocido
+        parts = host.split('.')
+        for i in range(len(parts) - 1):
+            score = self.domains.get('.'.join(parts[i:]))
+            if score is not None:
+                return score
+        return None
+
+    def _name_score(self, source: str) -> Optional[float]:
+        name = source.lower().strip()
+        if name in self.source_names:
+            return self.source_names[name]
+        # "YouTube - Canal" se puntúa como YouTube
+        prefix = name.split(' - ', 1)[0]
+        return self.source_names.get(prefix)
+
+    def source_key(self, article: Dict) -> str:
+        """Identificador de la fuente (dominio o nombre) para contar fuentes distintas"""
+        host = urlsplit(article.get('url', '') or '').netloc.lower()
+        return host[4:] if host.startswith('www.') else host or (article.get('source') or '').lower()
+
+    def score_article(self, article: Dict) -> float:
+        """Puntuación de 0.0 a 1.0 de la fuente de un artículo"""
+        url = article.get('url', '') or ''
+        if any(pattern in url for pattern in self.unreliable_patterns):
+            return 0.0
+        score = self._domain_score(urlsplit(url).netloc.lower())
+        if score is None:
+            score = self._name_score(article.get('source') or '')
+        if score is None:
+            score = self.default_score
+        return score * self.media_types.get((article.get('type') or 'article').lower(), 1.0)
+
+    def assess(self, articles: List[Dict], approve_threshold: float, config: Dict = None) -> Dict:
+        """
+        Evalúa el conjunto de fuentes de un informe
+
+        Args:
+            articles: Artículos usados en el informe
+            approve_threshold: Media mínima (0.0 - 1.0) para aprobar sin el Critic
+            config: Umbrales (por defecto, SOURCE_RELIABILITY_CONFIG)
+
+        Returns:
+            Dict con 'decision' (CODE01, CODE02 o None), 'score', 'reliable_sources',
+            'weak_sources' y 'sources' (mejor puntuación por fuente)
+        """
+        config = {**SOURCE_RELIABILITY_CONFIG, **(config or {})}
+        best: Dict[str, float] = {}
+        for article in articles:
+            key = self.source_key(article)
+            if key:
+                best[key] = max(best.get(key, 0.0), self.score_article(article))
+
+        ranked = sorted(best.values(), reverse=True)[:config['top_k']]
+        score = round(sum(ranked) / len(ranked), 3) if ranked else 0.0
+        reliable = sorted(k for k, s in best.items() if s >= config['reliable_score'])
+        weak = sorted(k for k, s in best.items() if s < config['reject_threshold'])
+
+        decision = None
+        if len(reliable) >= config['min_reliable_sources'] and score >= approve_threshold:
+            decision = 'CODE02'
+        elif not ranked or score < config['reject_threshold']:
+            decision = 'CODE01'
+
+        return {
+            'decision': decision,
+            'score': score,
+            'reliable_sources': reliable,
+            'weak_sources': weak,
+            'sources': {k: round(s, 2) for k, s in sorted(best.items(), key=lambda item: -item[1])}
+        }
+
+
+def format_reliability_findings(assessment: Dict) -> str:
+    """Hallazgos del prefiltro con el mismo formato compacto que la crítica del LLM"""
+    lines = [f"Veredicto: {assessment['decision'] or 'sin código'} (prefiltro de fuentes, media {assessment['score']})"]
+    if assessment['weak_sources']:
+        lines.append(f"1. [fuente_debil] Fuentes poco fiables: {', '.join(assessment['weak_sources'][:5])}")
+    if len(assessment['reliable_sources']) < SOURCE_RELIABILITY_CONFIG['min_reliable_sources']:
+        lines.append(f"- Recomendación: buscar al menos {SOURCE_RELIABILITY_CONFIG['min_reliable_sources']} "
+                     "fuentes periodísticas reconocidas (agencias o medios de referencia)")
+    return '\n'.join(lines)
+
+
+@lru_cache(maxsize=1)
+def get_source_reliability_index() -> SourceReliabilityIndex:
+    """Carga la tabla una sola vez por proceso"""
+    with open(SOURCE_RELIABILITY_CONFIG['table_path'], encoding='utf-8') as f:
+        return SourceReliabilityIndex(json.load(f))
@@ -0,0 +1,229 @@
+"""
+Ejecutor de grafos de etapas (DAG)
+
+Cada etapa declara qué valores del contexto necesita (inputs) y cuáles produce
+(outputs). El ejecutor lanza en paralelo todas las etapas cuyas entradas ya
+están disponibles, de modo que el solapamiento entre etapas independientes se
+obtiene cambiando la definición del grafo, no el controlador.
+"""
+import asyncio
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, Iterable, List, Optional
+
+from src.utils.deadline import DeadlineExceeded, current_deadline
+from src.utils.profiler import profiled_thread
+
+
+class StageGraphError(Exception):
+    """Error en la definición del grafo (entradas sin productor, ciclos, duplicados)"""
+
+
+class Stage:
+    """
+    Nodo del grafo
+
+    Args:
+        name: Nombre único de la etapa
+        fn: Función que recibe las entradas como argumentos con nombre y retorna un
+            dict con las salidas (o un único valor si la etapa declara una sola salida)
+        inputs: Claves del contexto que necesita
+        outputs: Claves del contexto que produce
+        condition: Función opcional sobre el contexto; si retorna False la etapa se
+            omite y sus salidas quedan en None
+    """
+
+    def __init__(self, name: str, fn: Callable, inputs: Iterable[str] = (), outputs: Iterable[str] = (),
+                 condition: Optional[Callable[[Dict], bool]] = None):
+        self.name = name
+        self.fn = fn
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.condition = condition
+
+    @property
+    def is_async(self) -> bool:
+        return asyncio.iscoroutinefunction(self.fn)
+
+    def _skipped(self, context: Dict) -> bool:
+        return self.condition is not None and not self.condition(context)
+
+    def _collect(self, result) -> Dict:
+        if len(self.outputs) == 1 and not (isinstance(result, dict) and self.outputs[0] in result):
+            return {self.outputs[0]: result}
+        result = result or {}
+        missing = [key for key in self.outputs if key not in result]
+        if missing:
+            raise StageGraphError(f"La etapa '{self.name}' no produjo: {', '.join(missing)}")
+        return {key: result[key] for key in self.outputs}
+
+    def execute(self, context: Dict) -> Dict:
+        if self._skipped(context):
+            return {key: None for key in self.outputs}
+        return self._collect(self.fn(**{key: context[key] for key in self.inputs}))
+
+    async def aexecute(self, context: Dict) -> Dict:
+        if self._skipped(context):
+            return {key: None for key in self.outputs}
+        return self._collect(await self.fn(**{key: context[key] for key in self.inputs}))
+
+
+def _execute_profiled(stage: Stage, context: Dict) -> Dict:
+    with profiled_thread():
+        return stage.execute(context)
+
+
+def _poll_interval(deadline) -> Optional[float]:
+    # Con plazo se despierta a menudo para notar cancelaciones (p. ej. desconexión del cliente)
+    return None if deadline is None else min(0.5, deadline.remaining())
+
+
+def _check_deadline(deadline, context: Dict, timings: Dict[str, float]):
+    """Como deadline.check(), pero el error lleva lo producido hasta ahora ('partial_context')"""
+    try:
+        deadline.check()
+    except DeadlineExceeded as error:
+        error.partial_context = {**context, '_timings': dict(timings)}
+        raise
+
+
+class StageGraph:
+    """
+    Grafo de etapas con ejecución concurrente de los nodos independientes
+    """
+
+    def __init__(self, stages: List[Stage], initial_keys: Iterable[str] = ()):
+        self.stages = list(stages)
+        self._validate(set(initial_keys))
+
+    def _validate(self, initial_keys: set):
+        producers: Dict[str, str] = {}
+        names = set()
+        for stage in self.stages:
+            if stage.name in names:
+                raise StageGraphError(f"Etapa duplicada: {stage.name}")
+            names.add(stage.name)
+            for key in stage.outputs:
+                if key in producers or key in initial_keys:
+                    raise StageGraphError(f"La salida '{key}' se produce más de una vez")
+                producers[key] = stage.name
+
+        available = set(initial_keys)
+        pending = list(self.stages)
+        while pending:
+            ready = [s for s in pending if all(k in available for k in s.inputs)]
+            if not ready:
+                detail = {s.name: [k for k in s.inputs if k not in available] for s in pending}
+                raise StageGraphError(f"Entradas sin productor o ciclo en el grafo: {detail}")
+            for stage in ready:
+                available.update(stage.outputs)
+                pending.remove(stage)
+
+    def run(self, context: Dict, max_workers: int = 4) -> Dict:
+        """
+        Ejecuta el grafo
+
+        Args:
+            context: Valores iniciales (deben incluir todas las entradas no producidas por etapas)
+            max_workers: Número máximo de etapas en ejecución simultánea
+
+        Returns:
+            Dict: El contexto final. En la clave '_timings' van los segundos de cada etapa
+
+        Raises:
+            DeadlineExceeded: Si el plazo de la petición (variable de contexto) se agota o se cancela
+        """
+        context = dict(context)
+        timings: Dict[str, float] = {}
+        pending = list(self.stages)
+        running = {}
+        deadline = current_deadline()
+
+        def timed(stage: Stage, snapshot: Dict):
+            started = time.perf_counter()
+            # Si la petición se está perfilando, este hilo entra en el muestreo
+            with profiled_thread():
+                outputs = stage.execute(snapshot)
+            return outputs, time.perf_counter() - started
+
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            while pending or running:
+                for stage in [s for s in pending if all(k in context for k in s.inputs)]:
+                    pending.remove(stage)
+                    # Cada etapa hereda las variables de contexto (id de petición, caches por ejecución...)
+                    ctx = contextvars.copy_context()
+                    running[executor.submit(ctx.run, timed, stage, dict(context))] = stage
+
+                if not running:
+                    missing = {s.name: [k for k in s.inputs if k not in context] for s in pending}
+                    raise StageGraphError(f"Faltan valores iniciales en el contexto: {missing}")
+                done, _ = wait(running, timeout=_poll_interval(deadline), return_when=FIRST_COMPLETED)
+                # Lo terminado se recoge antes de mirar el plazo: una etapa que acabó justo a tiempo cuenta
+                for future in done:
+                    stage = running.pop(future)
+                    outputs, elapsed = future.result()
+                    context.update(outputs)
+                    timings[stage.name] = round(elapsed, 3)
+                if deadline is not None and (pending or running):
+                    # Agotado o cancelado: no se lanzan más etapas y las pendientes se descartan
+                    _check_deadline(deadline, context, timings)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        context['_timings'] = timings
+        return context
+
+    async def arun(self, context: Dict, max_workers: int = 4) -> Dict:
+        """
+        Ejecuta el grafo dentro de un event loop
+
+        Las etapas definidas con "async def" se esperan en el propio loop; las
+        síncronas (p. ej. los kickoff de CrewAI, que bloquean) se ejecutan en un
+        pool de hilos sin bloquear el loop.
+
+        Args y Returns: igual que run
+        """
+        context = dict(context)
+        timings: Dict[str, float] = {}
+        pending = list(self.stages)
+        running = {}
+        loop = asyncio.get_running_loop()
+        deadline = current_deadline()
+
+        async def timed(stage: Stage, snapshot: Dict):
+            started = time.perf_counter()
+            if stage.is_async:
+                outputs = await stage.aexecute(snapshot)
+            else:
+                ctx = contextvars.copy_context()
+                outputs = await loop.run_in_executor(executor, ctx.run, _execute_profiled, stage, snapshot)
+            return outputs, time.perf_counter() - started
+
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            while pending or running:
+                for stage in [s for s in pending if all(k in context for k in s.inputs)]:
+                    pending.remove(stage)
+                    running[asyncio.ensure_future(timed(stage, dict(context)))] = stage
+
+                if not running:
+                    missing = {s.name: [k for k in s.inputs if k not in context] for s in pending}
+                    raise StageGraphError(f"Faltan valores iniciales en el contexto: {missing}")
+                done, _ = await asyncio.wait(running, timeout=_poll_interval(deadline),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    outputs, elapsed = future.result()
+                    context.update(outputs)
+                    timings[stage.name] = round(elapsed, 3)
+                if deadline is not None and (pending or running):
+                    _check_deadline(deadline, context, timings)
+        finally:
+            for future in running:
+                future.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        context['_timings'] = timings
+        return context
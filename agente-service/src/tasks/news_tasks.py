@@ -3,41 +3,39 @@ from src.agents.manager_agent import create_manager_agent
 from src.agents.watchdog_agent import create_watchdog_agent
 from src.agents.critic_agent import create_critic_agent
 from src.agents.writer_agent import create_writer_agent
+from src.tasks.prompt_templates import (
+    PLANNING_PROMPT,
+    INVESTIGATION_PROMPT,
+    CRITIQUE_PROMPT,
+    RECRITIQUE_PROMPT,
+    REINVESTIGATION_PROMPT,
+    WRITING_PROMPT,
+    DERIVATIVE_PROMPT,
+    FINAL_REVIEW_PROMPT,
+    HTML_REPAIR_PROMPT
+)
 
-def create_planning_task(solicitud_noticia: str):
+def create_planning_task(solicitud_noticia: str, agent=None):
     """
     Crea una tarea para que el Manager analice y planifique la noticia
     
     Args:
         solicitud_noticia: La solicitud de noticia del usuario
+        agent: Agente Manager ya configurado (si no se pasa, se crea uno)
         
     Returns:
         Task: Una tarea configurada para planificación HTN
     """
-    manager = create_manager_agent()
+    manager = agent or create_manager_agent()
     
     return Task(
-        description=f"""
-        Analiza la siguiente solicitud de noticia:
-        {solicitud_noticia}
-        
-        Realiza las siguientes acciones:
-        1. Analiza el objetivo global de la noticia solicitada
-        2. Descompón la tarea en un plan jerárquico (HTN) usando planificación de orden parcial
-        3. Identifica los subtemas y aspectos que deben investigarse
-        4. Crea un plan de acción estructurado para el investigador
-        
-        Tu salida debe incluir:
-        - Objetivo global de la noticia
-        - Plan jerárquico descompuesto en subtareas
-        - Aspectos clave a investigar
-        - Criterios de relevancia para la información
-        """,
+        description=PLANNING_PROMPT.render(solicitud=solicitud_noticia),
         agent=manager,
-        expected_output="Un plan jerárquico estructurado con el objetivo global, subtareas y criterios de investigación"
+        expected_output="Un objeto JSON con objetivo, subtareas, aspectos, criterios y consultas (máximo 150 palabras)"
     )
 
-def create_investigation_task(solicitud_noticia: str, plan_context: str = "", informacion_pre_buscada: str = ""):
+def create_investigation_task(solicitud_noticia: str, plan_context: str = "", informacion_pre_buscada: str = "", agent=None,
+                              hechos_conocidos: str = ""):
     """
     Crea una tarea para que el Watchdog investigue y recopile información
     
@@ -45,90 +43,70 @@ def create_investigation_task(solicitud_noticia: str, plan_context: str = "", in
         solicitud_noticia: La solicitud de noticia original
         plan_context: El contexto del plan generado por el Manager
         informacion_pre_buscada: Información obtenida del endpoint del backend como texto
+        agent: Agente Watchdog ya configurado (si no se pasa, se crea uno)
+        hechos_conocidos: Hechos validados en artículos anteriores sobre las mismas entidades
         
     Returns:
         Task: Una tarea configurada para investigación
     """
-    watchdog = create_watchdog_agent()
-    
-    informacion_contexto = f"""
-        
-        INFORMACIÓN RECOPILADA DEL BACKEND:
-        {informacion_pre_buscada}
-        
-        """ if informacion_pre_buscada else ""
+    watchdog = agent or create_watchdog_agent()
     
     return Task(
-        description=f"""
-        Realiza una investigación exhaustiva sobre la siguiente noticia solicitada:
-        {solicitud_noticia}
-        
-        {f"Contexto del plan: {plan_context}" if plan_context else ""}
-        {informacion_contexto}
-        
-        Realiza las siguientes acciones:
-        1. Analiza la información recopilada del backend que se te ha proporcionado
-        2. Identifica los hechos principales y la información más relevante
-        3. Filtra la información por relevancia según los criterios establecidos en el plan
-        4. Organiza la información en un informe preliminar estructurado
-        
-        Tu informe preliminar debe incluir:
-        - Hechos principales verificados basados en la información proporcionada
-        - Fuentes utilizadas (extraídas de la información del backend)
-        - Contexto relevante
-        - Información adicional importante
-        - Nota sobre la calidad y confiabilidad de las fuentes
-        """,
+        description=INVESTIGATION_PROMPT.render(
+            solicitud=solicitud_noticia,
+            plan=plan_context,
+            hechos=hechos_conocidos,
+            informacion=informacion_pre_buscada
+        ),
         agent=watchdog,
         expected_output="Un informe preliminar estructurado con información relevante, fuentes y evaluación de calidad"
     )
 
-def create_critique_task(informe_preliminar: str, solicitud_noticia: str):
+def create_critique_task(informe_preliminar: str, solicitud_noticia: str, agent=None):
     """
     Crea una tarea para que el Critic analice y valide la información
     
     Args:
         informe_preliminar: El informe generado por el Watchdog
         solicitud_noticia: La solicitud original para contexto
+        agent: Agente Critic ya configurado (si no se pasa, se crea uno)
         
     Returns:
         Task: Una tarea configurada para análisis crítico
     """
-    critic = create_critic_agent()
+    critic = agent or create_critic_agent()
     
     return Task(
-        description=f"""
-        Analiza el siguiente informe preliminar del investigador:
-        {informe_preliminar}
-        
-        Contexto de la solicitud original: {solicitud_noticia}
-        
-        Ejecuta una vigilancia exhaustiva de ejecución y evalúa:
+        description=CRITIQUE_PROMPT.render(solicitud=solicitud_noticia, informe=informe_preliminar),
+        agent=critic,
+        expected_output="Un objeto JSON con codigo (CODE01 o CODE02), problemas y recomendaciones (máximo 120 palabras)"
+    )
+
+def create_recritique_task(cambios: str, problemas_abiertos: list, solicitud_noticia: str, agent=None):
+    """
+    Crea una tarea para que el Critic revise solo los cambios del informe frente a sus problemas abiertos
+    
+    Args:
+        cambios: Frases quitadas y añadidas respecto de la versión ya criticada
+        problemas_abiertos: Problemas de la crítica anterior (dicts con tipo y detalle)
+        solicitud_noticia: La solicitud original para contexto
+        agent: Agente Critic ya configurado (si no se pasa, se crea uno)
         
-        1. DETECCIÓN DE PROBLEMAS (CODE01):
-           - ¿Existen sesgos en la información presentada?
-           - ¿Hay falacias lógicas en el razonamiento?
-           - ¿Se detectan datos falsos o no verificados?
-           - ¿La calidad de las fuentes cumple con el umbral requerido?
-           
-        2. Si DETECTAS PROBLEMAS (CODE01):
-           - Genera un reporte detallado de errores identificados
-           - Especifica qué tipo de problemas se encontraron (sesgos, falacias, datos falsos, baja calidad)
-           - Indica qué correcciones o fuentes adicionales se requieren
-           - Proporciona recomendaciones para mejorar la búsqueda
-           
-        3. Si NO DETECTAS PROBLEMAS (CODE02):
-           - Aprueba los hechos como válidos
-           - Confirma que la información cumple con estándares de calidad
-           - Prepara los datos limpios para pasar al redactor
-           
-        Tu respuesta debe ser clara sobre si se detectaron problemas (CODE01) o si todo está aprobado (CODE02).
-        """,
+    Returns:
+        Task: Una tarea configurada para crítica incremental
+    """
+    critic = agent or create_critic_agent()
+    problemas = '\n'.join(
+        f"{i}. [{problema['tipo']}] {problema['detalle']}" for i, problema in enumerate(problemas_abiertos, 1)
+    )
+    
+    return Task(
+        description=RECRITIQUE_PROMPT.render(solicitud=solicitud_noticia, problemas=problemas, cambios=cambios),
         agent=critic,
-        expected_output="Un análisis crítico con código CODE01 (problemas detectados) o CODE02 (aprobado), incluyendo detalles del análisis"
+        expected_output="Un objeto JSON con el estado (resuelto o no) de cada problema abierto y los problemas nuevos (máximo 120 palabras)"
     )
 
-def create_reinvestigation_task(solicitud_noticia: str, reporte_error: str, plan_context: str = "", informacion_pre_buscada: str = ""):
+def create_reinvestigation_task(solicitud_noticia: str, reporte_error: str, plan_context: str = "", informacion_pre_buscada: str = "", agent=None):
     """
     Crea una tarea para que el Watchdog replanifique y analice información adicional
     
@@ -137,122 +115,70 @@ def create_reinvestigation_task(solicitud_noticia: str, reporte_error: str, plan
         reporte_error: El reporte de errores del Critic
         plan_context: El contexto del plan original
         informacion_pre_buscada: Información adicional obtenida del endpoint del backend como texto
+        agent: Agente Watchdog ya configurado (si no se pasa, se crea uno)
         
     Returns:
         Task: Una tarea configurada para reinvestigación con backtracking
     """
-    watchdog = create_watchdog_agent()
-    
-    informacion_contexto = f"""
-        
-        INFORMACIÓN ADICIONAL RECOPILADA DEL BACKEND:
-        {informacion_pre_buscada}
-        
-        """ if informacion_pre_buscada else ""
+    watchdog = agent or create_watchdog_agent()
     
     return Task(
-        description=f"""
-        Se detectaron problemas en el informe preliminar. Debes replanificar el análisis (backtracking).
-        
-        Solicitud original: {solicitud_noticia}
-        {f"Plan original: {plan_context}" if plan_context else ""}
-        
-        Reporte de errores del Analista de Sesgos:
-        {reporte_error}
-        {informacion_contexto}
-        
-        Realiza las siguientes acciones:
-        1. Analiza el reporte de errores detalladamente
-        2. Replanifica la estrategia de análisis (backtracking)
-        3. Analiza la información adicional proporcionada del backend
-        4. Enfócate en corregir los problemas específicos identificados en el reporte
-        5. Identifica nueva información que aborde las deficiencias
-        6. Verifica la calidad de las fuentes antes de incluirlas
-        
-        Genera un nuevo informe preliminar corregido que:
-        - Aborde todos los problemas identificados en el reporte de errores
-        - Incluya información de las fuentes adicionales proporcionadas
-        - Demuestre mejor calidad y veracidad
-        - Cumpla con los estándares requeridos
-        """,
+        description=REINVESTIGATION_PROMPT.render(
+            solicitud=solicitud_noticia,
+            plan=plan_context,
+            reporte=reporte_error,
+            informacion=informacion_pre_buscada
+        ),
         agent=watchdog,
         expected_output="Un nuevo informe preliminar corregido que aborde los problemas identificados con información mejorada"
     )
 
-def create_writing_task(hechos_validados: str, solicitud_noticia: str):
+def create_writing_task(hechos_validados: str, solicitud_noticia: str, agent=None):
     """
     Crea una tarea para que el Writer redacte el artículo final
     
     Args:
         hechos_validados: Los hechos aprobados por el Critic
         solicitud_noticia: La solicitud original para contexto
+        agent: Agente Writer ya configurado (si no se pasa, se crea uno)
         
     Returns:
         Task: Una tarea configurada para redacción
     """
-    writer = create_writer_agent()
+    writer = agent or create_writer_agent()
     
     return Task(
-        description=f"""
-        Redacta un artículo de noticia basado en los siguientes hechos validados:
-        
-        Hechos validados y aprobados:
-        {hechos_validados}
-        
-        Solicitud original: {solicitud_noticia}
-        
-        Realiza las siguientes acciones (acción primitiva de redacción):
-        1. Estructura el artículo con formato periodístico profesional
-        2. Presenta la información de manera clara, objetiva y equilibrada
-        3. Usa un estilo periodístico estándar (quién, qué, cuándo, dónde, por qué, cómo)
-        4. Asegúrate de que el artículo sea libre de opiniones personales
-        5. Cita las fuentes de manera apropiada
-        6. Mantén un tono profesional y objetivo
-        
-        FORMATO DE SALIDA REQUERIDO - HTML:
-        Debes retornar ÚNICAMENTE el contenido en formato HTML, envuelto en un tag <article>.
-        La estructura debe ser exactamente así:
-        
-        <article>
-            <header>
-                <h1>Título llamativo pero preciso del artículo</h1>
-                <p class="entradilla">Entradilla o introducción atractiva que resuma los puntos clave</p>
-            </header>
-            
-            <section class="cuerpo">
-                <p>Primer párrafo del cuerpo del artículo...</p>
-                <p>Segundo párrafo con información relevante...</p>
-                <p>Continúa desarrollando el contenido de manera estructurada...</p>
-                <!-- Agrega más párrafos según sea necesario -->
-            </section>
-            
-            <footer>
-                <p class="conclusion">Conclusión apropiada que cierre el artículo</p>
-                <div class="fuentes">
-                    <h3>Fuentes:</h3>
-                    <ul>
-                        <li>Fuente 1</li>
-                        <li>Fuente 2</li>
-                        <!-- Lista todas las fuentes utilizadas -->
-                    </ul>
-                </div>
-            </footer>
-        </article>
-        
-        IMPORTANTE:
-        - Retorna SOLO el HTML, sin texto adicional antes o después
-        - El tag <article> debe ser el elemento raíz
-        - Usa etiquetas HTML semánticas apropiadas (header, section, footer, h1, p, ul, li)
-        - El HTML debe ser válido y bien formateado
-        - No incluyas explicaciones, comentarios fuera del HTML, o texto adicional
-        
-        El artículo debe estar listo para revisión final del Jefe de Redacción.
-        """,
+        description=WRITING_PROMPT.render(solicitud=solicitud_noticia, hechos=hechos_validados),
         agent=writer,
         expected_output="Un artículo de noticia completo en formato HTML, envuelto en un tag <article>, bien estructurado con header, cuerpo y footer, y listo para revisión final"
     )
 
-def create_final_review_task(articulo: str, solicitud_noticia: str, plan_context: str = ""):
+def create_derivative_task(hechos_validados: str, solicitud_noticia: str, instrucciones: str, idioma: str = "",
+                           titulo: str = "", agent=None):
+    """
+    Crea una tarea para que el Writer redacte una versión derivada de una noticia archivada
+
+    Args:
+        hechos_validados: El informe aprobado (CODE02) de la noticia original
+        solicitud_noticia: La solicitud original para contexto
+        instrucciones: Formato pedido (resumen, publicación para redes, artículo completo...)
+        idioma: Idioma de la salida (vacío: el de la noticia original)
+        titulo: Título de la noticia publicada
+        agent: Agente Writer ya configurado (si no se pasa, se crea uno)
+
+    Returns:
+        Task: Una tarea configurada para la versión derivada
+    """
+    writer = agent or create_writer_agent()
+
+    return Task(
+        description=DERIVATIVE_PROMPT.render(formato=instrucciones, idioma=idioma or "El de los hechos validados",
+                                             titulo=titulo, solicitud=solicitud_noticia, hechos=hechos_validados),
+        agent=writer,
+        expected_output="Solo el contenido en el formato e idioma pedidos, sin texto adicional"
+    )
+
+def create_final_review_task(articulo: str, solicitud_noticia: str, plan_context: str = "", agent=None):
     """
     Crea una tarea para que el Manager haga la revisión final y apruebe la publicación
     
@@ -260,81 +186,44 @@ def create_final_review_task(articulo: str, solicitud_noticia: str, plan_context
         articulo: El artículo redactado por el Writer
         solicitud_noticia: La solicitud original
         plan_context: El plan original para verificar cumplimiento
+        agent: Agente Manager ya configurado (si no se pasa, se crea uno)
         
     Returns:
         Task: Una tarea configurada para revisión final
     """
-    manager = create_manager_agent()
+    manager = agent or create_manager_agent()
     
     return Task(
-        description=f"""
-        Realiza la revisión final del artículo y aprueba su publicación.
-        
-        Solicitud original: {solicitud_noticia}
-        {f"Plan original: {plan_context}" if plan_context else ""}
-        
-        Artículo redactado:
-        {articulo}
-        
-        Realiza una revisión final como Jefe de Redacción:
-        1. Verifica que el artículo cumpla con el objetivo global establecido
-        2. Revisa la calidad periodística general
-        3. Confirma que la información esté completa y bien estructurada
-        4. Asegúrate de que cumpla con los estándares editoriales
-        5. Verifica el formato y presentación
-        
-        6. Si el artículo es aprobado:
-           - Aprueba la publicación
-           - Genera la noticia final lista para publicar
-           
-        7. Si requiere ajustes menores:
-           - Indica qué ajustes se necesitan
-           - Genera versión corregida
-        
-        FORMATO DE SALIDA REQUERIDO - HTML:
-        Tu salida DEBE ser ÚNICAMENTE el contenido en formato HTML, envuelto en un tag <article>.
-        
-        - Si el artículo recibido ya está en formato HTML, verifica que esté bien formateado y preserva el formato HTML.
-        - Si el artículo recibido NO está en formato HTML (por ejemplo, está en Markdown o texto plano), convierte el contenido a formato HTML.
-        
-        La estructura HTML debe ser exactamente así:
-        
-        <article>
-            <header>
-                <h1>Título llamativo pero preciso del artículo</h1>
-                <p class="entradilla">Entradilla o introducción atractiva que resuma los puntos clave</p>
-            </header>
-            
-            <section class="cuerpo">
-                <p>Primer párrafo del cuerpo del artículo...</p>
-                <p>Segundo párrafo con información relevante...</p>
-                <p>Continúa desarrollando el contenido de manera estructurada...</p>
-                ... (continúa con el contenido del artículo)
-            </section>
-            
-            <footer>
-                <p class="conclusion">Conclusión apropiada que cierre el artículo</p>
-                <div class="fuentes">
-                    <h3>Fuentes:</h3>
-                    <ul>
-                        <li>Fuente 1</li>
-                        <li>Fuente 2</li>
-                    </ul>
-                </div>
-            </footer>
-        </article>
-        
-        IMPORTANTE:
-        - Retorna SOLO el HTML, sin texto adicional antes o después
-        - El tag <article> debe ser el elemento raíz
-        - Usa etiquetas HTML semánticas apropiadas (header, section, footer, h1, p, ul, li)
-        - El HTML debe ser válido y bien formateado
-        - No incluyas explicaciones, comentarios fuera del HTML, o texto adicional
-        - NO incluyas metadatos, revisiones, o comentarios sobre el proceso de revisión en el HTML final
-        - El HTML debe contener SOLO el artículo periodístico, listo para publicar
-        
-        Tu salida debe ser la noticia final en formato HTML, aprobada y lista para publicación.
-        """,
+        description=FINAL_REVIEW_PROMPT.render(solicitud=solicitud_noticia, plan=plan_context, articulo=articulo),
         agent=manager,
         expected_output="La noticia final aprobada en formato HTML (envuelta en tag <article>), lista para publicación, sin texto adicional"
     )
+
+def create_html_repair_task(articulo_html: str, errores: list, hechos_validados: str = "", agent=None):
+    """
+    Crea una tarea breve para que el Writer repare la estructura HTML del artículo
+    
+    Solo se usa cuando el post-procesado no puede recuperar la estructura requerida
+    (header/section/footer), para evitar repetir todo el flujo.
+    
+    Args:
+        articulo_html: El HTML (o texto) del artículo tal como salió de la revisión final
+        errores: Lista de problemas de estructura detectados
+        hechos_validados: Hechos aprobados, para completar las fuentes si faltan
+        agent: Agente Writer ya configurado (si no se pasa, se crea uno)
+        
+    Returns:
+        Task: Una tarea configurada para reparar el HTML
+    """
+    writer = agent or create_writer_agent()
+    lista_errores = "\n".join(f"- {error}" for error in errores)
+    
+    return Task(
+        description=HTML_REPAIR_PROMPT.render(
+            errores=lista_errores,
+            hechos=hechos_validados,
+            articulo=articulo_html
+        ),
+        agent=writer,
+        expected_output="El mismo artículo en HTML válido, envuelto en <article>, con header, section y footer"
+    )
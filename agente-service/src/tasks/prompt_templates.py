@@ -0,0 +1,313 @@
+"""
+Plantillas de las descripciones de tarea, ordenadas para el cache de prefijos del proveedor
+
+Los proveedores (p. ej. OpenAI) reutilizan el cómputo de un prompt cuyo inicio
+es idéntico, byte a byte, a uno reciente. Por eso cada plantilla empieza con
+las instrucciones estáticas (iguales en todas las peticiones) y deja al final
+el contenido variable: solicitud, plan, informes, artículos...
+
+Las instrucciones se normalizan una sola vez al importar el módulo; por
+petición solo se concatenan las secciones variables.
+"""
+import textwrap
+from typing import Sequence, Tuple
+
+# Marca fija entre la parte estática y la variable (también forma parte del prefijo)
+_VARIABLE_MARKER = "--- DATOS DE ESTA SOLICITUD ---"
+
+
+class PromptTemplate:
+    """
+    Plantilla con prefijo estático y secciones variables al final
+
+    Args:
+        instructions: Instrucciones estáticas (se les quita la sangría común)
+        sections: Pares (clave, encabezado) en el orden en que se añaden; las
+            secciones sin valor se omiten
+    """
+
+    def __init__(self, instructions: str, sections: Sequence[Tuple[str, str]]):
+        self.prefix = f"{textwrap.dedent(instructions).strip()}\n\n{_VARIABLE_MARKER}"
+        self.sections = tuple(sections)
+
+    def render(self, **values) -> str:
+        parts = [self.prefix]
+        for key, header in self.sections:
+            value = values.get(key)
+            if value:
+                parts.append(f"{header}:\n{value}")
+        return '\n\n'.join(parts)
+
+
+_ARTICLE_HTML_FORMAT = """<article>
+        <header>
+            <h1>Título llamativo pero preciso del artículo</h1>
+            <p class="entradilla">Entradilla o introducción atractiva que resuma los puntos clave</p>
+        </header>
+
+        <section class="cuerpo">
+            <p>Primer párrafo del cuerpo del artículo...</p>
+            <p>Segundo párrafo con información relevante...</p>
+            <p>Continúa desarrollando el contenido de manera estructurada...</p>
+            <!-- Agrega más párrafos según sea necesario -->
+        </section>
+
+        <footer>
+            <p class="conclusion">Conclusión apropiada que cierre el artículo</p>
+            <div class="fuentes">
+                <h3>Fuentes:</h3>
+                <ul>
+                    <li>Fuente 1</li>
+                    <li>Fuente 2</li>
+                    <!-- Lista todas las fuentes utilizadas -->
+                </ul>
+            </div>
+        </footer>
+    </article>"""
+
+_HTML_RULES = """IMPORTANTE:
+    - Retorna SOLO el HTML, sin texto adicional antes o después
+    - El tag <article> debe ser el elemento raíz
+    - Usa etiquetas HTML semánticas apropiadas (header, section, footer, h1, p, ul, li)
+    - El HTML debe ser válido y bien formateado
+    - No incluyas explicaciones, comentarios fuera del HTML, o texto adicional"""
+
+
+PLANNING_PROMPT = PromptTemplate("""
+    Analiza la solicitud de noticia que aparece al final.
+
+    Realiza las siguientes acciones:
+    1. Analiza el objetivo global de la noticia solicitada
+    2. Descompón la tarea en un plan jerárquico (HTN) usando planificación de orden parcial
+    3. Identifica los subtemas y aspectos que deben investigarse
+    4. Crea un plan de acción estructurado para el investigador
+
+    FORMATO DE SALIDA (compacto, se reutiliza en todas las etapas siguientes):
+    Responde ÚNICAMENTE con un objeto JSON, sin texto adicional:
+    {
+        "objetivo": "una frase con el objetivo global",
+        "subtareas": ["máximo 5 subtareas, cada una de menos de 12 palabras"],
+        "aspectos": ["máximo 5 aspectos clave a investigar"],
+        "criterios": ["máximo 4 criterios de relevancia"],
+        "consultas": ["máximo 3 consultas de búsqueda cortas"]
+    }
+    No superes las 150 palabras en total.
+""", [
+    ('solicitud', 'Solicitud de noticia'),
+])
+
+
+INVESTIGATION_PROMPT = PromptTemplate("""
+    Realiza una investigación exhaustiva sobre la noticia solicitada que aparece al final,
+    usando el contexto del plan y la información recopilada del backend que la acompañan.
+
+    Realiza las siguientes acciones:
+    1. Analiza la información recopilada del backend que se te ha proporcionado
+    2. Identifica los hechos principales y la información más relevante
+    3. Filtra la información por relevancia según los criterios establecidos en el plan
+    4. Organiza la información en un informe preliminar estructurado
+
+    Tu informe preliminar debe incluir:
+    - Hechos principales verificados basados en la información proporcionada
+    - Fuentes utilizadas (extraídas de la información del backend)
+    - Contexto relevante
+    - Información adicional importante
+    - Nota sobre la calidad y confiabilidad de las fuentes
+
+    Si se incluyen hechos ya validados en artículos anteriores, úsalos como antecedentes sin
+    volver a investigarlos (cita su fuente) y dedica la investigación a lo nuevo; si la
+    información recopilada los contradice o actualiza, prevalece la información reciente.
+""", [
+    ('solicitud', 'Noticia solicitada'),
+    ('plan', 'Contexto del plan'),
+    ('hechos', 'HECHOS YA VALIDADOS EN ARTÍCULOS ANTERIORES'),
+    ('informacion', 'INFORMACIÓN RECOPILADA DEL BACKEND'),
+])
+
+
+CRITIQUE_PROMPT = PromptTemplate("""
+    Analiza el informe preliminar del investigador que aparece al final, teniendo en
+    cuenta la solicitud original.
+
+    Ejecuta una vigilancia exhaustiva de ejecución y evalúa:
+
+    1. DETECCIÓN DE PROBLEMAS (CODE01):
+       - ¿Existen sesgos en la información presentada?
+       - ¿Hay falacias lógicas en el razonamiento?
+       - ¿Se detectan datos falsos o no verificados?
+       - ¿La calidad de las fuentes cumple con el umbral requerido?
+
+    2. Si DETECTAS PROBLEMAS (CODE01):
+       - Genera un reporte detallado de errores identificados
+       - Especifica qué tipo de problemas se encontraron (sesgos, falacias, datos falsos, baja calidad)
+       - Indica qué correcciones o fuentes adicionales se requieren
+       - Proporciona recomendaciones para mejorar la búsqueda
+
+    3. Si NO DETECTAS PROBLEMAS (CODE02):
+       - Aprueba los hechos como válidos
+       - Confirma que la información cumple con estándares de calidad
+       - Prepara los datos limpios para pasar al redactor
+
+    FORMATO DE SALIDA (compacto):
+    Responde ÚNICAMENTE con un objeto JSON, sin texto adicional:
+    {
+        "codigo": "CODE01" o "CODE02",
+        "problemas": [{"tipo": "sesgo|falacia|dato_no_verificado|fuente_debil|otro", "detalle": "una frase"}],
+        "recomendaciones": ["máximo 3 acciones concretas, por ejemplo fuentes o búsquedas adicionales"]
+    }
+    Si el código es CODE02, "problemas" debe ser una lista vacía. No superes las 120 palabras.
+""", [
+    ('solicitud', 'Contexto de la solicitud original'),
+    ('informe', 'Informe preliminar del investigador'),
+])
+
+
+
+RECRITIQUE_PROMPT = PromptTemplate("""
+    Ya revisaste una versión anterior de este informe y encontraste los problemas
+    numerados que aparecen al final. El investigador lo corrigió: solo se muestran las
+    frases quitadas ("- ") y añadidas ("+ ").
+
+    Para cada problema abierto decide, únicamente con los cambios, si quedó resuelto.
+    Revisa también las frases añadidas: si introducen sesgos, falacias, datos no
+    verificados o fuentes débiles, infórmalos como problemas nuevos.
+
+    FORMATO DE SALIDA (compacto):
+    Responde ÚNICAMENTE con un objeto JSON, sin texto adicional:
+    {
+        "estado": [{"id": 1, "resuelto": true o false}],
+        "nuevos_problemas": [{"tipo": "sesgo|falacia|dato_no_verificado|fuente_debil|otro", "detalle": "una frase"}],
+        "recomendaciones": ["máximo 3 acciones concretas para lo que siga sin resolver"]
+    }
+    Incluye en "estado" todos los problemas abiertos. No superes las 120 palabras.
+""", [
+    ('solicitud', 'Contexto de la solicitud original'),
+    ('problemas', 'Problemas abiertos de la crítica anterior'),
+    ('cambios', 'Cambios en el informe'),
+])
+
+REINVESTIGATION_PROMPT = PromptTemplate("""
+    Se detectaron problemas en el informe preliminar. Debes replanificar el análisis (backtracking)
+    a partir del reporte de errores y la información adicional que aparecen al final.
+
+    Realiza las siguientes acciones:
+    1. Analiza el reporte de errores detalladamente
+    2. Replanifica la estrategia de análisis (backtracking)
+    3. Analiza la información adicional proporcionada del backend
+    4. Enfócate en corregir los problemas específicos identificados en el reporte
+    5. Identifica nueva información que aborde las deficiencias
+    6. Verifica la calidad de las fuentes antes de incluirlas
+
+    Genera un nuevo informe preliminar corregido que:
+    - Aborde todos los problemas identificados en el reporte de errores
+    - Incluya información de las fuentes adicionales proporcionadas
+    - Demuestre mejor calidad y veracidad
+    - Cumpla con los estándares requeridos
+""", [
+    ('solicitud', 'Solicitud original'),
+    ('plan', 'Plan original'),
+    ('reporte', 'Reporte de errores del Analista de Sesgos'),
+    ('informacion', 'INFORMACIÓN ADICIONAL RECOPILADA DEL BACKEND'),
+])
+
+
+WRITING_PROMPT = PromptTemplate(f"""
+    Redacta un artículo de noticia basado en los hechos validados que aparecen al final.
+
+    Realiza las siguientes acciones (acción primitiva de redacción):
+    1. Estructura el artículo con formato periodístico profesional
+    2. Presenta la información de manera clara, objetiva y equilibrada
+    3. Usa un estilo periodístico estándar (quién, qué, cuándo, dónde, por qué, cómo)
+    4. Asegúrate de que el artículo sea libre de opiniones personales
+    5. Cita las fuentes de manera apropiada
+    6. Mantén un tono profesional y objetivo
+
+    FORMATO DE SALIDA REQUERIDO - HTML:
+    Debes retornar ÚNICAMENTE el contenido en formato HTML, envuelto en un tag <article>.
+    La estructura debe ser exactamente así:
+    {_ARTICLE_HTML_FORMAT}
+
+    {_HTML_RULES}
+
+    El artículo debe estar listo para revisión final del Jefe de Redacción.
+""", [
+    ('solicitud', 'Solicitud original'),
+    ('hechos', 'Hechos validados y aprobados'),
+])
+
+
+DERIVATIVE_PROMPT = PromptTemplate(f"""
+    Redacta una versión derivada de una noticia ya publicada, a partir de sus hechos validados.
+
+    Reglas:
+    1. Usa SOLO los hechos validados que aparecen al final; no añadas datos nuevos
+    2. Respeta el formato y el idioma indicados al final
+    3. Mantén un tono profesional, objetivo y libre de opiniones
+    4. Retorna SOLO el contenido pedido, sin explicaciones ni bloques de código
+
+    Si el formato pedido es el artículo completo, la estructura debe ser exactamente así:
+    {_ARTICLE_HTML_FORMAT}
+""", [
+    ('formato', 'Formato pedido'),
+    ('idioma', 'Idioma de la salida'),
+    ('titulo', 'Título de la noticia publicada'),
+    ('solicitud', 'Solicitud original'),
+    ('hechos', 'Hechos validados y aprobados'),
+])
+
+
+FINAL_REVIEW_PROMPT = PromptTemplate(f"""
+    Realiza la revisión final del artículo que aparece al final y aprueba su publicación.
+
+    Realiza una revisión final como Jefe de Redacción:
+    1. Verifica que el artículo cumpla con el objetivo global establecido
+    2. Revisa la calidad periodística general
+    3. Confirma que la información esté completa y bien estructurada
+    4. Asegúrate de que cumpla con los estándares editoriales
+    5. Verifica el formato y presentación
+
+    6. Si el artículo es aprobado:
+       - Aprueba la publicación
+       - Genera la noticia final lista para publicar
+
+    7. Si requiere ajustes menores:
+       - Indica qué ajustes se necesitan
+       - Genera versión corregida
+
+    FORMATO DE SALIDA REQUERIDO - HTML:
+    Tu salida DEBE ser ÚNICAMENTE el contenido en formato HTML, envuelto en un tag <article>.
+
+    - Si el artículo recibido ya está en formato HTML, verifica que esté bien formateado y preserva el formato HTML.
+    - Si el artículo recibido NO está en formato HTML (por ejemplo, está en Markdown o texto plano), convierte el contenido a formato HTML.
+
+    La estructura HTML debe ser exactamente así:
+    {_ARTICLE_HTML_FORMAT}
+
+    {_HTML_RULES}
+    - NO incluyas metadatos, revisiones, o comentarios sobre el proceso de revisión en el HTML final
+    - El HTML debe contener SOLO el artículo periodístico, listo para publicar
+
+    Tu salida debe ser la noticia final en formato HTML, aprobada y lista para publicación.
+""", [
+    ('solicitud', 'Solicitud original'),
+    ('plan', 'Plan original'),
+    ('articulo', 'Artículo redactado'),
+])
+
+
+HTML_REPAIR_PROMPT = PromptTemplate("""
+    El artículo que aparece al final no cumple la estructura HTML requerida.
+
+    Corrige ÚNICAMENTE la estructura, sin reescribir el contenido. La salida debe ser:
+    <article>
+        <header><h1>...</h1><p class="entradilla">...</p></header>
+        <section class="cuerpo"><p>...</p></section>
+        <footer><p class="conclusion">...</p><div class="fuentes"><h3>Fuentes:</h3><ul><li>...</li></ul></div></footer>
+    </article>
+
+    Retorna SOLO el HTML, sin bloques de código ni texto adicional.
+""", [
+    ('errores', 'Problemas detectados'),
+    ('hechos', 'Hechos validados (úsalos solo para completar las fuentes)'),
+    ('articulo', 'Artículo recibido'),
+])
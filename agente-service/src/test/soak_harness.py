@@ -0,0 +1,335 @@
+"""
+Prueba de resistencia (soak) de handle_news_generation
+
+Uso (desde agente-service):
+    python -m src.test.soak_harness --requests 2000 --report soak.json
+    python -m src.test.soak_harness --requests 500 --async --rss-budget-kb 2
+    python -m src.test.soak_harness --requests 200 --max-error-rate 0
+
+Ejecuta miles de generaciones seguidas contra dobles locales: el modelo falso
+de LLM_PROVIDER=fake y un servidor HTTP en 127.0.0.1 que responde como el
+backend de noticias y el scraper. No sale a la red ni gasta tokens, así que lo
+que crece entre peticiones es del propio servicio: caches sin límite,
+conexiones que no se cierran, hilos que no terminan.
+
+Cada --sample-every peticiones se mide:
+- RSS del proceso (VmRSS de /proc, o ru_maxrss si no hay /proc)
+- memoria trazada por tracemalloc y las líneas que más han crecido desde la línea base
+- hilos vivos, sockets y descriptores abiertos
+
+Tras el calentamiento (caches llenándose, clientes creándose) se toma la línea
+base y el crecimiento por petición es la pendiente por mínimos cuadrados de
+cada serie. Si alguna supera su presupuesto el proceso termina con código 1.
+También si la proporción de respuestas distintas de 200 supera --max-error-rate:
+una generación que falla pronto no crece y daría la prueba por buena.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+_TOPICS = ['energía solar', 'vacunas', 'inflación', 'inteligencia artificial', 'sequía',
+           'transporte público', 'ciberseguridad', 'elecciones', 'vivienda', 'pesca artesanal']
+
+
+def _fake_articles(query: str, count: int = 5) -> List[Dict]:
+    """Artículos deterministas por consulta, con el tema en título y resumen"""
+    slug = '-'.join(query.lower().split())[:60]
+    return [{
+        'title': f'{query.capitalize()}: novedades del informe número {i}',
+        'url': f'https://medio{i}.example/{slug}/{i}',
+        'snippet': (f'El informe sobre {query} publicado esta semana recoge datos nuevos. '
+                    f'Los expertos consultados sobre {query} coinciden en la tendencia del último año.'),
+        'source': f'Medio {i}',
+        'type': 'article'
+    } for i in range(count)]
+
+
+class _FakeBackendHandler(BaseHTTPRequestHandler):
+    """Responde como el backend de noticias (/api/news/*) y como el scraper (GET con ?q=)"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def _send_json(self, data, status: int = 200):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/api/news/health':
+            self._send_json({'status': 'ok', 'message': 'soak'})
+            return
+        query = (parse_qs(url.query).get('q') or ['noticias'])[0]
+        self._send_json({'results': _fake_articles(query, 3)})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        if self.path == '/api/news/extract':
+            self._send_json({'status': 'success', 'data': {
+                'url': payload.get('url', ''),
+                'content': 'Contenido completo del artículo de prueba. ' * 20,
+                'contentLength': 860
+            }})
+            return
+        articles = _fake_articles(payload.get('query') or 'noticias')
+        self._send_json({'status': 'success', 'data': {'articles': articles, 'count': len(articles)}})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_backend():
+    """Arranca el backend falso en un puerto libre y devuelve el servidor"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _FakeBackendHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='soak-backend', daemon=True).start()
+    return server
+
+
+def _configure_environment(port: int, data_dir: str):
+    """
+    Variables de entorno de los dobles locales
+
+    Se fijan antes de importar src: las herramientas y settings leen el entorno al
+    importarse. Lo que ya esté definido en el entorno se respeta.
+    """
+    defaults = {
+        'LLM_PROVIDER': 'fake',
+        'BACKEND_URL': f'http://127.0.0.1:{port}',
+        'SCRAPER_URL': f'http://127.0.0.1:{port}/api/search',
+        'ARCHIVE_DB': os.path.join(data_dir, 'articles.sqlite3'),
+        'FACT_STORE_DB': os.path.join(data_dir, 'facts.sqlite3'),
+        'SHARED_CACHE_PATH': os.path.join(data_dir, 'shared_cache.sqlite3'),
+        'PROFILE_DIR': os.path.join(data_dir, 'profiles'),
+        'LOG_LEVEL': 'ERROR'
+    }
+    for name, value in defaults.items():
+        os.environ.setdefault(name, value)
+
+
+# --- Medidas del proceso ---
+
+def rss_kb() -> float:
+    """Memoria residente actual en KB (pico si el sistema no expone /proc)"""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return float(line.split()[1])
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS lo da en bytes, Linux en KB
+    return peak / 1024 if sys.platform == 'darwin' else float(peak)
+
+
+def open_descriptors() -> Dict[str, int]:
+    """Descriptores abiertos y cuántos de ellos son sockets (None sin /proc)"""
+    try:
+        names = os.listdir('/proc/self/fd')
+    except OSError:
+        return {'fds': None, 'sockets': None}
+    sockets = 0
+    for name in names:
+        try:
+            if os.readlink(f'/proc/self/fd/{name}').startswith('socket:'):
+                sockets += 1
+        except OSError:
+            continue
+    return {'fds': len(names), 'sockets': sockets}
+
+
+def growth_sites(snapshot, baseline, top_n: int) -> List[Dict]:
+    """Líneas con más memoria nueva respecto de la línea base (sin contar este módulo ni tracemalloc)"""
+    own = (tracemalloc.Filter(False, __file__), tracemalloc.Filter(False, tracemalloc.__file__))
+    stats = snapshot.filter_traces(own).compare_to(baseline.filter_traces(own), 'lineno')
+    return [{
+        'linea': f'{stat.traceback[0].filename}:{stat.traceback[0].lineno}',
+        'crecimiento_kb': round(stat.size_diff / 1024, 1),
+        'bloques_nuevos': stat.count_diff
+    } for stat in stats[:top_n] if stat.size_diff > 0]
+
+
+def sample(requests_done: int, started: float) -> Dict:
+    gc.collect()
+    traced, _ = tracemalloc.get_traced_memory()
+    return {
+        'peticiones': requests_done,
+        'segundos': round(time.monotonic() - started, 2),
+        'rss_kb': rss_kb(),
+        'trazada_kb': round(traced / 1024, 1),
+        'hilos': threading.active_count(),
+        **open_descriptors()
+    }
+
+
+def slope(points: List[tuple]) -> float:
+    """Pendiente por mínimos cuadrados de (x, y); 0 con menos de dos puntos"""
+    points = [(x, y) for x, y in points if y is not None]
+    if len(points) < 2:
+        return 0.0
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    var_x = sum((x - mean_x) ** 2 for x, _ in points)
+    if not var_x:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+
+
+# --- Ejecución ---
+
+def _solicitud(index: int) -> str:
+    # Cada solicitud es distinta: con la misma los caches de etapas y herramientas responderían sin trabajar
+    return f'Noticia sobre {_TOPICS[index % len(_TOPICS)]} en la región {index}'
+
+
+def _run_requests(handler, start: int, count: int, use_async: bool, args, errors: Dict[int, int]):
+    """Ejecuta count generaciones y cuenta las respuestas por código de estado"""
+    for index in range(start, start + count):
+        kwargs = {'max_iterations': args.max_iterations, 'tier': args.tier,
+                  'user_interests': [_TOPICS[(index + 3) % len(_TOPICS)]]}
+        if use_async:
+            _, status = asyncio.run(handler(_solicitud(index), **kwargs))
+        else:
+            _, status = handler(_solicitud(index), **kwargs)
+        errors[status] = errors.get(status, 0) + 1
+
+
+def run_soak(args) -> Dict:
+    """
+    Ejecuta la prueba y devuelve el informe
+
+    Returns:
+        Dict: muestras, crecimiento por petición de cada serie, presupuestos superados
+            y las líneas que más memoria trazada han ganado
+    """
+    server = start_fake_backend()
+    data_dir = tempfile.mkdtemp(prefix='soak-')
+    _configure_environment(server.server_address[1], data_dir)
+
+    from src.controllers.news_controller import handle_news_generation, handle_news_generation_async
+    from src.utils.logger import setup_logging
+    from src.config.settings import LOGGING_CONFIG
+    setup_logging(LOGGING_CONFIG['level'], LOGGING_CONFIG['json'])
+    handler = handle_news_generation_async if args.use_async else handle_news_generation
+
+    statuses: Dict[int, int] = {}
+    tracemalloc.start(args.trace_frames)
+    started = time.monotonic()
+    try:
+        _run_requests(handler, 0, args.warmup, args.use_async, args, statuses)
+        gc.collect()
+        baseline = tracemalloc.take_snapshot()
+        samples = [sample(0, started)]
+        done = 0
+        while done < args.requests:
+            batch = min(args.sample_every, args.requests - done)
+            _run_requests(handler, args.warmup + done, batch, args.use_async, args, statuses)
+            done += batch
+            samples.append(sample(done, started))
+            if args.verbose:
+                print(json.dumps(samples[-1], ensure_ascii=False), flush=True)
+        sites = growth_sites(tracemalloc.take_snapshot(), baseline, args.top)
+    finally:
+        tracemalloc.stop()
+        server.shutdown()
+
+    growth = {
+        'rss_kb': slope([(s['peticiones'], s['rss_kb']) for s in samples]),
+        'trazada_kb': slope([(s['peticiones'], s['trazada_kb']) for s in samples]),
+        'hilos': slope([(s['peticiones'], s['hilos']) for s in samples]),
+        'sockets': slope([(s['peticiones'], s['sockets']) for s in samples]),
+        'fds': slope([(s['peticiones'], s['fds']) for s in samples])
+    }
+    budgets = {
+        'rss_kb': args.rss_budget_kb,
+        'trazada_kb': args.traced_budget_kb,
+        'hilos': args.thread_budget,
+        'sockets': args.socket_budget,
+        'fds': args.socket_budget
+    }
+    exceeded = [{'serie': name, 'por_peticion': round(growth[name], 4), 'presupuesto': budget}
+                for name, budget in budgets.items() if growth[name] > budget]
+    total = sum(statuses.values())
+    error_rate = sum(count for status, count in statuses.items() if status != 200) / total if total else 0.0
+    return {
+        'peticiones': args.requests,
+        'calentamiento': args.warmup,
+        'modo': 'async' if args.use_async else 'sync',
+        'respuestas': {str(status): count for status, count in sorted(statuses.items())},
+        'tasa_error': round(error_rate, 4),
+        'tasa_error_maxima': args.max_error_rate,
+        'crecimiento_por_peticion': {name: round(value, 4) for name, value in growth.items()},
+        'presupuestos': budgets,
+        'superados': exceeded,
+        'lineas_que_crecen': sites,
+        'muestras': samples
+    }
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Prueba de resistencia de handle_news_generation')
+    parser.add_argument('--requests', type=int, default=2000, help='Generaciones medidas')
+    parser.add_argument('--warmup', type=int, default=50, help='Generaciones previas a la línea base')
+    parser.add_argument('--sample-every', type=int, default=100, help='Generaciones entre dos muestras')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='Usar handle_news_generation_async')
+    parser.add_argument('--max-iterations', type=int, default=3)
+    parser.add_argument('--tier', default='standard')
+    parser.add_argument('--rss-budget-kb', type=float, default=4.0, help='Crecimiento de RSS permitido por petición')
+    parser.add_argument('--traced-budget-kb', type=float, default=2.0,
+                        help='Crecimiento de memoria trazada permitido por petición')
+    parser.add_argument('--thread-budget', type=float, default=0.001, help='Hilos nuevos permitidos por petición')
+    parser.add_argument('--socket-budget', type=float, default=0.001,
+                        help='Sockets (y descriptores) nuevos permitidos por petición')
+    parser.add_argument('--max-error-rate', type=float, default=0.01,
+                        help='Proporción máxima de respuestas distintas de 200')
+    parser.add_argument('--trace-frames', type=int, default=5, help='Profundidad de pila de tracemalloc')
+    parser.add_argument('--top', type=int, default=15, help='Líneas que más crecen en el informe')
+    parser.add_argument('--report', help='Archivo JSON donde guardar el informe completo')
+    parser.add_argument('--verbose', action='store_true', help='Imprimir cada muestra')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = _parse_args(argv)
+    report = run_soak(args)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+
+    print(f"🔁 {report['peticiones']} generaciones ({report['modo']}), respuestas: {report['respuestas']}")
+    for name, value in report['crecimiento_por_peticion'].items():
+        print(f"   {name}: {value:+.4f} por petición (presupuesto {report['presupuestos'][name]})")
+    for site in report['lineas_que_crecen'][:5]:
+        print(f"   +{site['crecimiento_kb']} KB  {site['linea']}")
+    failed = False
+    if report['tasa_error'] > report['tasa_error_maxima']:
+        print(f"❌ Tasa de error {report['tasa_error']:.2%} (máximo {report['tasa_error_maxima']:.2%})")
+        failed = True
+    if report['superados']:
+        print(f"❌ Presupuesto superado: {', '.join(e['serie'] for e in report['superados'])}")
+        failed = True
+    if failed:
+        return 1
+    print("✅ Sin errores ni crecimiento por encima del presupuesto")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Tests del control de admisión por cliente"""
+import threading
+import time
+
+import pytest
+
+from src.services.admission import AdmissionController, AdmissionRejected, TokenBucket, client_identity
+
+IDENTITY_CONFIG = {'api_keys': {'clave-secreta': 'redaccion'}, 'trust_client_id': False}
+
+
+def _controller(**config):
+    return AdmissionController({'max_concurrent': 1, 'per_client_concurrency': 1, 'rate_per_minute': 600,
+                                'burst': 5, 'max_queue_per_client': 10, 'max_wait_seconds': 2, **config})
+
+
+def test_identidad_solo_con_claves_configuradas():
+    assert client_identity('clave-secreta', None, '10.0.0.1', IDENTITY_CONFIG) == 'client:redaccion'
+    assert client_identity('otra', None, '10.0.0.1', IDENTITY_CONFIG) == 'ip:10.0.0.1'
+    # X-Client-ID lo pone cualquiera: solo cuenta detrás de un proxy de confianza
+    assert client_identity(None, 'redaccion', '10.0.0.1', IDENTITY_CONFIG) == 'ip:10.0.0.1'
+    assert client_identity(None, 'redaccion', '10.0.0.1',
+                           {**IDENTITY_CONFIG, 'trust_client_id': True}) == 'client:redaccion'
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=1.0, capacity=2)
+    assert bucket.take() == 0.0
+    assert bucket.take() == 0.0
+    assert 0 < bucket.take() <= 1.0
+
+
+def test_limite_de_tasa():
+    admission = _controller(burst=1, rate_per_minute=1)
+    admission.acquire('ip:a')
+    admission.release('ip:a')
+    with pytest.raises(AdmissionRejected) as error:
+        admission.acquire('ip:a')
+    assert error.value.reason == 'rate_limit'
+    assert error.value.retry_after >= 1
+
+
+def test_charge_gasta_cuota_sin_ocupar_hueco():
+    admission = _controller(burst=2, rate_per_minute=1)
+    admission.charge('ip:a', degraded=True)
+    assert admission.load() == 0
+    admission.charge('ip:a')
+    with pytest.raises(AdmissionRejected):
+        admission.charge('ip:a')
+    assert admission.stats()['clients']['ip:a']['degraded'] == 1
+
+
+def test_acquire_sin_cobrar_no_gasta_tokens():
+    admission = _controller(burst=1, rate_per_minute=1)
+    admission.charge('ip:a')
+    for _ in range(3):
+        admission.acquire('ip:a', charge=False)
+        admission.release('ip:a')
+
+
+def test_espera_agotada():
+    admission = _controller()
+    admission.acquire('ip:a')
+    with pytest.raises(AdmissionRejected) as error:
+        admission.acquire('ip:b', timeout=0.05)
+    assert error.value.reason == 'wait_timeout'
+    admission.release('ip:a')
+
+
+def test_cola_justa_entre_clientes():
+    admission = _controller(per_client_concurrency=1)
+    admission.acquire('ip:ocupado')
+    order = []
+
+    def request(client):
+        admission.acquire(client)
+        order.append(client)
+        admission.release(client)
+
+    # El cliente a encola tres peticiones antes de que llegue b: b no espera a las tres
+    threads = [threading.Thread(target=request, args=(client,)) for client in ('ip:a', 'ip:a', 'ip:a', 'ip:b')]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.02)
+    admission.release('ip:ocupado')
+    for thread in threads:
+        thread.join(2)
+    assert order.index('ip:b') <= 1
+
+
+def test_olvida_clientes_inactivos():
+    admission = _controller(max_clients=3, client_idle_seconds=0)
+    for i in range(6):
+        admission.acquire(f'ip:{i}')
+        admission.release(f'ip:{i}')
+    assert len(admission.stats()['clients']) <= 3
@@ -0,0 +1,59 @@
+"""Tests del archivo de artículos"""
+import gzip
+import time
+
+from src.services.article_archive import ArticleArchive
+
+HTML = ('<article><header><h1>Avances de la IA en &quot;medicina&quot;</h1></header>'
+        '<section class="cuerpo"><p>Cuerpo.</p></section></article>')
+
+
+def _archive(tmp_path) -> ArticleArchive:
+    return ArticleArchive(str(tmp_path / 'articles.sqlite3'), codec='gzip')
+
+
+def test_guarda_y_recupera(tmp_path):
+    archive = _archive(tmp_path)
+    article_id = archive.save(HTML, 'Avances de la inteligencia artificial en medicina', 'Informe CODE02',
+                              {'fuentes': ['https://a.example']})
+    article = archive.get(article_id)
+    assert article['html'] == HTML
+    assert article['informe'] == 'Informe CODE02'
+    assert article['title'] == 'Avances de la IA en "medicina"'
+    assert article['metadata'] == {'fuentes': ['https://a.example']}
+    assert archive.get('no-existe') is None
+
+
+def test_el_html_comprimido_se_sirve_tal_cual(tmp_path):
+    archive = _archive(tmp_path)
+    article = archive.get_compressed(archive.save(HTML, 'IA en medicina'))
+    assert article['codec'] == 'gzip'
+    assert gzip.decompress(article['html']).decode('utf-8') == HTML
+    assert article['size'] == len(HTML.encode('utf-8')) and article['etag']
+
+
+def test_busqueda_por_terminos_del_tema(tmp_path):
+    archive = _archive(tmp_path)
+    medicina = archive.save(HTML, 'Avances de la inteligencia artificial en medicina')
+    time.sleep(0.01)
+    archive.save(HTML, 'La sequía en el sur')
+    found = archive.list(topic='inteligencia artificial')
+    assert [a['id'] for a in found] == [medicina]
+    assert 'html' not in found[0]
+    assert len(archive.list()) == 2
+    assert archive.list(date='1999-01-01') == []
+
+
+def test_derivados_por_formato_e_idioma(tmp_path):
+    archive = _archive(tmp_path)
+    article_id = archive.save(HTML, 'IA en medicina', 'Informe')
+    assert archive.get_derivative(article_id, 'resumen') is None
+    archive.save_derivative(article_id, 'resumen', '', 'Resumen breve')
+    archive.save_derivative(article_id, 'resumen', 'inglés', 'Short summary')
+    assert archive.get_derivative(article_id, 'resumen') == 'Resumen breve'
+    assert archive.get_derivative(article_id, 'resumen', 'inglés') == 'Short summary'
+
+
+def test_sobrevive_a_reabrir_la_base(tmp_path):
+    article_id = _archive(tmp_path).save(HTML, 'IA en medicina')
+    assert _archive(tmp_path).list(topic='medicina')[0]['id'] == article_id
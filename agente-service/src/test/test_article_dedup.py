@@ -0,0 +1,46 @@
+"""Tests de la deduplicación de artículos con MinHash + LSH"""
+from src.utils.article_dedup import (
+    NUM_PERM, cluster_articles, deduplicate_articles, estimate_similarity, minhash_signature, shingles
+)
+
+_BODY = ('El Banco Central subió la tasa de interés en medio punto porcentual este martes para contener '
+         'la inflación, que acumula tres meses al alza según el último informe del organismo.')
+
+
+def _article(title, snippet, source, url):
+    return {'title': title, 'snippet': snippet, 'source': source, 'url': url}
+
+
+def test_minhash_de_textos_iguales_y_distintos():
+    signature = minhash_signature(_BODY)
+    assert len(signature) == NUM_PERM
+    assert estimate_similarity(signature, minhash_signature(_BODY)) == 1.0
+    other = minhash_signature('La selección de fútbol ganó el partido del domingo con dos goles en el final.')
+    assert estimate_similarity(signature, other) < 0.2
+
+
+def test_shingles_de_texto_corto_y_vacio():
+    assert shingles('OMS') == {'oms'}
+    assert shingles('  ') == set()
+
+
+def test_agrupa_copias_de_agencia_y_conserva_el_primero():
+    articles = [
+        _article('Sube la tasa de interés', _BODY, 'Agencia', 'https://a.example/1'),
+        _article('Sube la tasa de interés', _BODY + ' Más detalles pronto.', 'Diario', 'https://b.example/2'),
+        _article('Resultados de la liga', 'El equipo local ganó por dos goles a uno en un partido muy disputado.',
+                 'Deportes', 'https://c.example/3'),
+    ]
+    assert cluster_articles(articles) == [[0, 1], [2]]
+
+    result = deduplicate_articles(articles)
+    assert [a['url'] for a in result] == ['https://a.example/1', 'https://c.example/3']
+    assert result[0]['sources'] == ['Agencia', 'Diario']
+    assert result[0]['duplicate_urls'] == ['https://b.example/2']
+    assert 'sources' not in result[1]
+
+
+def test_articulos_sin_texto_no_se_agrupan():
+    articles = [_article('', '', 'A', 'https://a.example/1'), _article('', '', 'B', 'https://b.example/2')]
+    assert cluster_articles(articles) == [[0], [1]]
+    assert len(deduplicate_articles(articles)) == 2
@@ -0,0 +1,57 @@
+"""Tests de la lectura acotada de respuestas JSON"""
+import asyncio
+import json
+
+import pytest
+
+from src.utils.bounded_json import PayloadTooLarge, aparse_bounded, parse_bounded, prune
+
+KEEP = frozenset({'data', 'articles', 'title', 'content'})
+
+
+def _chunks(value, size=7):
+    raw = json.dumps(value).encode('utf-8')
+    return [raw[i:i + size] for i in range(0, len(raw), size)]
+
+
+def test_conserva_solo_las_claves_de_la_lista_blanca():
+    body = {'data': {'articles': [{'title': 'T', 'html': '<p>x</p>', 'extra': {'a': 1}}]}, 'debug': [1, 2]}
+    assert parse_bounded(_chunks(body), KEEP, max_bytes=10_000, max_chars=100) == {'data': {'articles': [{'title': 'T'}]}}
+
+
+def test_recorta_los_textos_por_palabras():
+    body = {'title': 'uno dos tres cuatro', 'content': 'a' * 50}
+    result = parse_bounded(_chunks(body), KEEP, max_bytes=10_000, max_chars=10, long_fields={'content': 40})
+    assert result['title'] == 'uno dos…'
+    assert len(result['content']) <= 41
+
+
+def test_falla_si_supera_el_maximo_de_bytes():
+    with pytest.raises(PayloadTooLarge):
+        parse_bounded(_chunks({'content': 'x' * 500}), KEEP, max_bytes=100, max_chars=10)
+
+
+def test_content_length_declarado_falla_sin_leer():
+    def never():
+        raise AssertionError('no debería leer el cuerpo')
+        yield b''
+
+    with pytest.raises(PayloadTooLarge):
+        parse_bounded(never(), KEEP, max_bytes=100, max_chars=10, headers={'content-length': '5000'})
+
+
+def test_json_invalido():
+    with pytest.raises(ValueError):
+        parse_bounded([b'{"title": '], KEEP, max_bytes=100, max_chars=10)
+
+
+def test_version_asincrona():
+    async def chunks():
+        for chunk in _chunks({'title': 'Hola', 'otro': 1}):
+            yield chunk
+
+    assert asyncio.run(aparse_bounded(chunks(), KEEP, max_bytes=1000, max_chars=10)) == {'title': 'Hola'}
+
+
+def test_prune_a_cualquier_profundidad():
+    assert prune([{'title': 'x', 'n': {'title': 'y'}}], KEEP, 10) == [{'title': 'x'}]
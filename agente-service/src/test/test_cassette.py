@@ -0,0 +1,60 @@
+"""Tests de la grabación y reproducción de cassettes"""
+import pytest
+
+from src.utils.cassette import (
+    RECORD, REPLAY, CassetteMiss, CassetteNotFound, cassette_call, cassette_path, cassette_scope,
+    new_cassette_name, request_cassette
+)
+
+
+def _record(directory, name, calls):
+    request_cassette(RECORD, name)
+    with cassette_scope(str(directory)):
+        return [cassette_call('llm', [prompt], lambda prompt=prompt: f"respuesta a {prompt}") for prompt in calls]
+
+
+def test_graba_y_reproduce_sin_llamar(tmp_path):
+    name = new_cassette_name()
+    assert _record(tmp_path, name, ['a', 'b', 'a']) == ['respuesta a a', 'respuesta a b', 'respuesta a a']
+
+    def never():
+        raise AssertionError('en reproducción no se llama')
+
+    request_cassette(REPLAY, name, 0)
+    with cassette_scope(str(tmp_path)):
+        assert cassette_call('llm', ['b'], never) == 'respuesta a b'
+        assert cassette_call('llm', ['a'], never) == 'respuesta a a'
+        assert cassette_call('llm', ['a'], never) == 'respuesta a a'
+        with pytest.raises(CassetteMiss):
+            cassette_call('llm', ['a'], never)
+    request_cassette(None)
+
+
+def test_cassette_inexistente(tmp_path):
+    request_cassette(REPLAY, 'no-existe', 0)
+    with pytest.raises(CassetteNotFound):
+        with cassette_scope(str(tmp_path)):
+            pass
+    request_cassette(None)
+
+
+def test_sin_cassette_se_llama_directamente(tmp_path):
+    request_cassette(None)
+    with cassette_scope(str(tmp_path)) as cassette:
+        assert cassette is None
+        assert cassette_call('llm', ['x'], lambda: 1) == 1
+
+
+def test_isolate_graba_solo_el_resultado(tmp_path):
+    name = new_cassette_name()
+    request_cassette(RECORD, name)
+    with cassette_scope(str(tmp_path)) as cassette:
+        cassette_call('retrieval', ['q'], lambda: cassette_call('http', ['u'], lambda: 'dentro'), isolate=True)
+    request_cassette(None)
+    assert [i['kind'] for i in cassette.interactions] == ['retrieval']
+
+
+def test_nombres_unicos_y_rutas_saneadas(tmp_path):
+    assert new_cassette_name() != new_cassette_name()
+    path = cassette_path(str(tmp_path), '../../etc/passwd')
+    assert path.startswith(str(tmp_path)) and '/' not in path[len(str(tmp_path)) + 1:]
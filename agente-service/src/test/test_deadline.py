@@ -0,0 +1,72 @@
+"""Tests del plazo de la petición"""
+import contextvars
+import socket
+import threading
+import time
+
+import pytest
+
+from src.utils.deadline import (
+    Deadline, DeadlineExceeded, current_deadline, deadline_scope, time_budget, watch_disconnect
+)
+
+
+def test_time_budget_sin_plazo_usa_el_timeout_propio():
+    assert time_budget(30) == 30
+
+
+def test_time_budget_reparte_el_tiempo_restante():
+    with deadline_scope(Deadline(10)):
+        assert 4 < time_budget(30, share=0.5) <= 5
+        assert time_budget(3) == 3
+    with deadline_scope(Deadline(0)):
+        assert time_budget(30) == 1.0
+
+
+def test_el_plazo_viaja_al_hilo_que_copia_el_contexto():
+    seen = []
+    with deadline_scope(Deadline(5)) as deadline:
+        thread = threading.Thread(target=contextvars.copy_context().run,
+                                  args=(lambda: seen.append(current_deadline()),))
+        thread.start()
+        thread.join()
+    assert seen == [deadline] and current_deadline() is None
+
+
+def test_cancelar_agota_el_plazo():
+    deadline = Deadline(60)
+    deadline.check()
+    deadline.cancel("El cliente cerró la conexión")
+    assert deadline.expired and deadline.remaining() == 0
+    with pytest.raises(DeadlineExceeded, match="cerró la conexión"):
+        deadline.check()
+
+
+def test_degradaciones_sin_repetir():
+    deadline = Deadline(60)
+    deadline.degrade("Sin revisión final")
+    deadline.degrade("Sin revisión final")
+    assert deadline.degradations == ["Sin revisión final"]
+
+
+def test_desconexion_del_cliente_cancela():
+    server, client = socket.socketpair()
+    deadline = Deadline(60)
+    with watch_disconnect(server, deadline, interval=0.01):
+        client.close()
+        for _ in range(100):
+            if deadline.cancelled:
+                break
+            time.sleep(0.01)
+    server.close()
+    assert deadline.cancelled
+
+
+def test_cliente_conectado_no_cancela():
+    server, client = socket.socketpair()
+    deadline = Deadline(60)
+    with watch_disconnect(server, deadline, interval=0.01):
+        time.sleep(0.05)
+    server.close()
+    client.close()
+    assert not deadline.cancelled
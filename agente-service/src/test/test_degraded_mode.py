@@ -0,0 +1,78 @@
+"""Tests del modo degradado: circuito del proveedor y noticia extractiva"""
+from src.services.degraded_builder import build_degraded_article
+from src.services.llm_circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, is_provider_failure
+
+ARTICLES = [
+    {'title': 'La sequía reduce las reservas de agua del embalse',
+     'url': 'https://a.example/sequia', 'source': 'a',
+     'snippet': 'La sequía ha reducido las reservas de agua del embalse al treinta por ciento. '
+                'Los agricultores de la cuenca piden ayudas por la sequía prolongada.'},
+    {'title': 'Restricciones de agua por la sequía en la comarca',
+     'url': 'https://b.example/restricciones', 'source': 'b',
+     'snippet': 'El ayuntamiento anuncia restricciones nocturnas de agua por la sequía. '
+                'Las restricciones se mantendrán hasta que vuelvan las lluvias.'},
+    {'title': 'Resultados de la liga de baloncesto', 'url': 'https://c.example/liga', 'source': 'c',
+     'snippet': 'El equipo local ganó el partido de anoche por diez puntos de diferencia.'},
+]
+
+
+def test_noticia_extractiva_cita_sus_fuentes():
+    built = build_degraded_article('sequía y reservas de agua', ARTICLES)
+    assert built['html']['valid']
+    html = built['html']['html']
+    assert '<article>' in html and 'https://a.example/sequia' in html
+    # El artículo sin términos de la solicitud no aporta frases ni se cita
+    assert 'baloncesto' not in html
+    assert {fuente['url'] for fuente in built['fuentes']} <= {'https://a.example/sequia',
+                                                              'https://b.example/restricciones'}
+
+
+def test_sin_material_no_hay_noticia():
+    built = build_degraded_article('sequía y reservas de agua', ARTICLES[2:])
+    assert built['html'] is None and built['fuentes'] == []
+
+
+def test_el_texto_de_las_fuentes_se_escapa():
+    articles = [{**ARTICLES[0], 'snippet': ARTICLES[0]['snippet'] + ' <script>alert(1)</script> sequía '
+                                                                   'en el embalse sin control alguno.'},
+                ARTICLES[1]]
+    built = build_degraded_article('sequía y reservas de agua', articles, {'max_sentences': 10})
+    assert '<script>' not in built['html']['html']
+
+
+def test_fallos_del_proveedor():
+    class RateLimitError(Exception):
+        pass
+
+    assert is_provider_failure(RateLimitError('slow down'))
+    assert is_provider_failure(RuntimeError('Error code: 503 - overloaded'))
+    try:
+        try:
+            raise RateLimitError('429')
+        except RateLimitError as e:
+            raise ValueError('la tarea falló') from e
+    except ValueError as wrapped:
+        assert is_provider_failure(wrapped)
+    assert not is_provider_failure(KeyError('informe'))
+
+
+def test_circuito_abre_y_prueba_tras_la_espera():
+    circuit = CircuitBreaker(failure_threshold=2, reset_seconds=0)
+    circuit.record_failure()
+    assert circuit.state == CLOSED and circuit.allow()
+    circuit.record_failure()
+    assert circuit.state == OPEN
+    # Cumplida la espera pasa una sola prueba; si falla, vuelve a abrirse
+    assert circuit.allow() and circuit.state == HALF_OPEN
+    circuit.record_failure()
+    assert circuit.state == OPEN and circuit.stats()['aperturas'] == 2
+    assert circuit.allow()
+    circuit.record_success()
+    assert circuit.state == CLOSED and circuit.stats()['fallos_seguidos'] == 0
+
+
+def test_circuito_abierto_no_deja_pasar():
+    circuit = CircuitBreaker(failure_threshold=1, reset_seconds=60)
+    circuit.record_failure()
+    assert not circuit.allow()
+    assert circuit.stats()['segundos_para_prueba'] > 0
@@ -0,0 +1,52 @@
+"""Tests del event loop compartido"""
+import asyncio
+import threading
+from contextvars import ContextVar
+
+import pytest
+
+from src.utils.event_loop import SharedEventLoop
+
+_request_id: ContextVar = ContextVar('request_id', default=None)
+
+
+def test_la_corrutina_ve_el_contexto_del_hilo_que_la_entrega():
+    loop = SharedEventLoop()
+
+    async def read():
+        await asyncio.sleep(0)
+        return _request_id.get(), threading.current_thread().name
+
+    _request_id.set('peticion-1')
+    assert loop.run(read()) == ('peticion-1', 'shared-event-loop')
+
+
+def test_las_peticiones_comparten_el_loop():
+    loop = SharedEventLoop(executor_workers=2)
+    loops = []
+    barrier = asyncio.Event()
+
+    async def request(release):
+        loops.append(asyncio.get_running_loop())
+        if release:
+            barrier.set()
+        # La primera petición solo termina si la segunda corre a la vez en el mismo loop
+        await asyncio.wait_for(barrier.wait(), 2)
+        return await asyncio.to_thread(threading.current_thread)
+
+    first = threading.Thread(target=loop.run, args=(request(False),))
+    first.start()
+    worker = loop.run(request(True))
+    first.join(2)
+    assert loops[0] is loops[1]
+    assert worker.name.startswith('shared-loop')
+
+
+def test_propaga_las_excepciones():
+    loop = SharedEventLoop()
+
+    async def fail():
+        raise ValueError('sin fuentes')
+
+    with pytest.raises(ValueError):
+        loop.run(fail())
@@ -0,0 +1,41 @@
+"""Tests de la extracción de hechos y del almacén de hechos validados"""
+from src.services.fact_store import FactStore, extract_entities, extract_facts
+
+ARTICLES = [
+    {'url': 'https://a.example/modelo', 'title': 'OpenAI lanza un nuevo modelo', 'snippet': 'GPT llega a más países',
+     'source': 'Medio A'},
+    {'url': 'https://b.example/despidos', 'title': 'OpenAI despedirá empleados',
+     'snippet': 'Los despidos afectan a 200 empleados de su sede en San Francisco', 'source': 'Medio B'},
+]
+REPORT = "## Hechos principales:\n- OpenAI despedirá a 200 empleados en su sede de San Francisco este mes."
+
+
+def test_entidad_de_una_palabra_al_inicio_de_la_frase():
+    assert extract_entities('OpenAI despedirá a 200 empleados') == ['OpenAI']
+
+
+def test_mayuscula_inicial_no_es_una_entidad():
+    assert extract_entities('Ayer la OMS aprobó una guía') == ['OMS']
+    assert extract_entities('Según Reuters, Tesla subió') == ['Reuters', 'Tesla']
+
+
+def test_solo_respaldan_el_hecho_los_articulos_que_hablan_de_lo_afirmado():
+    facts = extract_facts(REPORT, ARTICLES)
+    assert len(facts) == 1
+    assert facts[0]['entity'] == 'OpenAI'
+    # El artículo que solo nombra a OpenAI no respalda los despidos
+    assert facts[0]['sources'] == ['https://b.example/despidos']
+
+
+def test_sin_fuente_que_lo_respalde_no_hay_hecho():
+    assert extract_facts(REPORT, ARTICLES[:1]) == []
+
+
+def test_guarda_confirma_y_recupera(tmp_path):
+    store = FactStore(str(tmp_path / 'facts.sqlite3'))
+    facts = extract_facts(REPORT, ARTICLES)
+    assert store.add_facts(facts) == 1
+    assert store.add_facts(facts) == 0
+    found = store.lookup('Noticia sobre los despidos en OpenAI')
+    assert [f['fact'] for f in found] == [facts[0]['fact']]
+    assert found[0]['confirmations'] == 2
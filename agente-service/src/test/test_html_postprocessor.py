@@ -0,0 +1,63 @@
+"""Tests del post-procesado del HTML de la noticia"""
+from src.utils.html_postprocessor import ArticleHTMLStream, postprocess_article_html
+
+ARTICLE = ('<article><header><h1>Titular</h1><p class="entradilla">Entradilla</p></header>'
+           '<section class="cuerpo"><p>Primer párrafo.</p><p>Segundo párrafo.</p></section>'
+           '<footer><p class="conclusion">Conclusión</p><div class="fuentes"><h3>Fuentes:</h3>'
+           '<ul><li><a href="https://a.example">A</a></li></ul></div></footer></article>')
+
+
+def test_articulo_valido_sin_cambios():
+    result = postprocess_article_html(ARTICLE)
+    assert result['valid'] and not result['needs_repair']
+    assert result['html'] == ARTICLE and result['fixes'] == []
+
+
+def test_quita_el_bloque_markdown_y_los_comentarios_del_modelo():
+    result = postprocess_article_html(f"Aquí tienes la noticia:\n```html\n{ARTICLE}\n```\nEspero que te sirva.")
+    assert result['valid'] and result['html'] == ARTICLE
+    assert 'Texto antes de <article> eliminado' in result['fixes']
+    assert 'Texto después de </article> eliminado' in result['fixes']
+
+
+def test_sanea_scripts_eventos_y_urls_peligrosas():
+    dirty = ARTICLE.replace('<p>Primer párrafo.</p>',
+                            '<p onclick="x()">Primer párrafo.<script>alert(1)</script></p>'
+                            '<a href="javascript:alert(1)">enlace</a>')
+    html = postprocess_article_html(dirty)['html']
+    assert 'script' not in html and 'onclick' not in html and 'javascript:' not in html
+    assert 'Primer párrafo.' in html and 'enlace' in html
+
+
+def test_corrige_lo_que_puede_sin_el_modelo():
+    truncated = ARTICLE.replace('<section class="cuerpo">', '<section>').replace('</article>', '')
+    result = postprocess_article_html(truncated)
+    assert result['valid'] and result['html'].endswith('</article>')
+    assert 'Clase "cuerpo" añadida a <section>' in result['fixes']
+    assert 'Cierre </article> añadido' in result['fixes']
+
+
+def test_sin_raiz_article_envuelve_el_contenido():
+    result = postprocess_article_html(ARTICLE[len('<article>'):])
+    assert result['valid'] and result['html'].startswith('<article>')
+    assert 'Raíz <article> añadida' in result['fixes']
+
+
+def test_estructura_incompleta_pide_reparacion():
+    result = postprocess_article_html('<article><header><h1>Titular</h1></header></article>')
+    assert result['needs_repair']
+    assert 'Falta <footer> con las fuentes' in result['errors']
+    assert postprocess_article_html('Sin HTML')['errors'] == ['No se encontró contenido HTML del artículo']
+
+
+def test_procesado_por_fragmentos():
+    stream = ArticleHTMLStream()
+    # "<article" y el titular llegan partidos entre fragmentos
+    cut = ARTICLE.index('<section')
+    for chunk in ('```html\n<arti', ARTICLE[5:20], ARTICLE[20:cut]):
+        stream.feed(chunk)
+    assert stream.started and not stream.complete
+    assert stream.missing_sections() == ['section', 'footer']
+    stream.feed(ARTICLE[cut:])
+    assert stream.complete
+    assert stream.close()['html'] == ARTICLE
@@ -0,0 +1,99 @@
+"""Tests de la cola de trabajos distribuida"""
+import threading
+
+from src.services.job_queue import ConsistentHashRing, InMemoryBroker, JobQueue, JobWorker
+
+
+def test_anillo_estable_al_anadir_un_nodo():
+    ring = ConsistentHashRing(['a', 'b', 'c'])
+    topics = [f'tema {i}' for i in range(300)]
+    before = {topic: ring.get_node(topic) for topic in topics}
+    ring.add_node('d')
+    moved = [topic for topic in topics if ring.get_node(topic) != before[topic]]
+    # Solo se mueven los temas que pasan al nodo nuevo
+    assert all(ring.get_node(topic) == 'd' for topic in moved)
+    assert len(moved) < len(topics) / 2
+
+
+def test_mismo_tema_mismo_nodo():
+    queue = JobQueue(InMemoryBroker(), ['a', 'b', 'c'])
+    first = queue.submit('Escribe una noticia sobre la IA en medicina')
+    second = queue.submit('Noticia: medicina e IA')
+    assert first['node'] == second['node']
+
+
+def test_el_trabajador_guarda_el_resultado():
+    broker = InMemoryBroker()
+    queue = JobQueue(broker, ['a'])
+    job = queue.submit('Noticia sobre vacunas', {'tier': 'economy'})
+    calls = []
+    worker = JobWorker('a', lambda solicitud, **params: calls.append(params) or ({'noticia': solicitud}, 200), broker)
+    assert worker.process_one(timeout=0.1)
+    assert calls == [{'tier': 'economy'}]
+    result = queue.get(job['job_id'])
+    assert result['status'] == 'done'
+    assert result['result'] == {'noticia': 'Noticia sobre vacunas'}
+    assert broker.llen('jobs:a:processing') == 0
+    assert not worker.process_one(timeout=0.01)
+
+
+def test_recupera_los_trabajos_de_un_trabajador_interrumpido():
+    broker = InMemoryBroker()
+    queue = JobQueue(broker, ['a'])
+    job = queue.submit('Noticia sobre sequía')
+
+    def crash(solicitud, **params):
+        raise SystemExit('el proceso muere a mitad')
+
+    try:
+        JobWorker('a', crash, broker).process_one(timeout=0.1)
+    except SystemExit:
+        pass
+    assert broker.llen('jobs:a') == 0 and broker.llen('jobs:a:processing') == 1
+
+    worker = JobWorker('a', lambda solicitud, **params: ({'ok': True}, 200), broker)
+    assert worker.recover() == 1
+    assert worker.process_one(timeout=0.1)
+    assert queue.get(job['job_id'])['status'] == 'done'
+
+
+def test_error_del_handler_marca_el_trabajo_fallido():
+    broker = InMemoryBroker()
+    queue = JobQueue(broker, ['a'])
+    job = queue.submit('Noticia sobre pesca')
+
+    def fail(solicitud, **params):
+        raise RuntimeError('sin LLM')
+
+    JobWorker('a', fail, broker).process_one(timeout=0.1)
+    result = queue.get(job['job_id'])
+    assert result['status'] == 'failed' and result['status_code'] == 500
+
+
+def test_run_forever_sobrevive_a_errores_del_broker(monkeypatch):
+    monkeypatch.setitem(__import__('src.config.settings', fromlist=['x']).DISTRIBUTED_CONFIG,
+                        'broker_retry_max_seconds', 0.01)
+    broker = InMemoryBroker()
+    queue = JobQueue(broker, ['a'])
+    job = queue.submit('Noticia sobre vivienda')
+    failures = {'left': 2}
+    blmove = broker.blmove
+
+    def flaky(*args, **kwargs):
+        if failures['left']:
+            failures['left'] -= 1
+            raise ConnectionError('broker caído')
+        return blmove(*args, **kwargs)
+
+    broker.blmove = flaky
+    worker = JobWorker('a', lambda solicitud, **params: ({'ok': True}, 200), broker)
+    thread = threading.Thread(target=worker.run_forever, daemon=True)
+    thread.start()
+    for _ in range(200):
+        if (queue.get(job['job_id']) or {}).get('status') == 'done':
+            break
+        threading.Event().wait(0.01)
+    worker.stop()
+    thread.join(7)
+    assert queue.get(job['job_id'])['status'] == 'done'
+    assert failures['left'] == 0
@@ -0,0 +1,66 @@
+"""Tests de la memoización de herramientas"""
+import asyncio
+import time
+
+from src.utils.memo import TTLCache, memoize, normalize_text, run_scope
+
+
+def _counted(cache: TTLCache, name: str = 'buscar', cacheable=lambda result: True):
+    calls = []
+
+    @memoize(cache, lambda query: normalize_text(query), cacheable, name=name)
+    def search(query):
+        calls.append(query)
+        return {'success': True, 'query': query}
+
+    return search, calls
+
+
+def test_claves_normalizadas():
+    search, calls = _counted(TTLCache())
+    search('IA  médica')
+    search('ia médica ')
+    assert len(calls) == 1
+
+
+def test_lru_y_caducidad():
+    cache = TTLCache(max_entries=2, ttl=0.05)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None and cache.get('a') == 1
+    time.sleep(0.06)
+    assert cache.get('a') is None
+    assert cache.stats()['hits'] == 2
+
+
+def test_el_memo_de_la_ejecucion_sobrevive_a_la_caducidad():
+    search, calls = _counted(TTLCache(ttl=0))
+    with run_scope():
+        search('sequía')
+        search('sequía')
+    assert len(calls) == 1
+    search('sequía')
+    assert len(calls) == 2
+
+
+def test_no_guarda_resultados_no_cacheables():
+    search, calls = _counted(TTLCache(), cacheable=lambda result: False)
+    search('sequía')
+    search('sequía')
+    assert len(calls) == 2
+
+
+def test_variantes_sincrona_y_asincrona_comparten_entradas():
+    cache = TTLCache()
+    search, calls = _counted(cache, name='search_news')
+
+    @memoize(cache, lambda query: normalize_text(query), name='search_news')
+    async def asearch(query):
+        calls.append(query)
+        return {'success': True}
+
+    search('sequía')
+    assert asyncio.run(asearch('Sequía')) == {'success': True, 'query': 'sequía'}
+    assert len(calls) == 1
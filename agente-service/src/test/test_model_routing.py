@@ -0,0 +1,25 @@
+"""Tests de la elección de perfil y del presupuesto de salida por etapa"""
+from src.config.settings import MODEL_PROFILES, STAGE_OUTPUT_BUDGETS, select_model_profile, stage_max_tokens
+
+
+def test_perfil_por_nivel():
+    assert select_model_profile('writing', 'economy') == 'fast'
+    assert select_model_profile('writing', 'premium') == 'quality'
+    assert select_model_profile('etapa-nueva', 'standard') == 'balanced'
+
+
+def test_recorte_por_plazo():
+    assert select_model_profile('writing', 'premium', remaining_seconds=15) == 'fast'
+    assert select_model_profile('writing', 'premium', remaining_seconds=600) == 'quality'
+
+
+def test_el_perfil_rapido_no_corta_el_articulo():
+    # economy y el recorte por plazo usan "fast": el HTML completo conserva el presupuesto de su etapa
+    for stage in ('writing', 'final_review', 'repair', 'derivative'):
+        profile = select_model_profile(stage, 'economy', remaining_seconds=5)
+        assert stage_max_tokens(stage, profile) == STAGE_OUTPUT_BUDGETS[stage]['max_tokens']
+        assert stage_max_tokens(stage, profile) > MODEL_PROFILES['fast']['max_tokens']
+
+
+def test_sin_presupuesto_usa_el_del_perfil():
+    assert stage_max_tokens('etapa-nueva', 'balanced') == MODEL_PROFILES['balanced']['max_tokens']
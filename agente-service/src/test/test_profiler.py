@@ -0,0 +1,38 @@
+"""Tests del perfilado bajo demanda"""
+import time
+import tracemalloc
+
+from src.utils.profiler import list_profiles, profile_block
+
+
+def _busy(seconds: float):
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        sum(range(1000))
+
+
+def test_guarda_el_perfil_de_la_peticion(tmp_path):
+    with profile_block('generacion', str(tmp_path), interval=0.001, request_id='peticion/1'):
+        _busy(0.05)
+    profiles = list_profiles(str(tmp_path))
+    assert len(profiles) == 1
+    assert profiles[0]['name'] == 'generacion' and profiles[0]['samples'] > 0
+    assert '/' not in profiles[0]['id'] and 'peticion_1' in profiles[0]['id']
+    assert not tracemalloc.is_tracing()
+
+
+def test_mismo_request_id_no_pisa_el_perfil(tmp_path):
+    for _ in range(2):
+        with profile_block('generacion', str(tmp_path), interval=0.001, request_id='repetido'):
+            pass
+    assert len(list_profiles(str(tmp_path))) == 2
+
+
+def test_no_detiene_tracemalloc_ajeno(tmp_path):
+    tracemalloc.start()
+    try:
+        with profile_block('generacion', str(tmp_path), interval=0.001):
+            pass
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
@@ -0,0 +1,38 @@
+"""Tests de la reordenación de artículos por relevancia"""
+from src.config.settings import RERANK_CONFIG
+from src.services.relevance_ranker import hashed_matrix, rerank_articles
+
+
+def _article(title, snippet=''):
+    return {'title': title, 'snippet': snippet, 'url': f'https://example.org/{hash(title)}'}
+
+
+ARTICLES = [
+    _article('Resultados de la liga de fútbol', 'El equipo local ganó el domingo'),
+    _article('Receta de tortilla de patatas', 'Huevos, patatas y cebolla'),
+    _article('La inteligencia artificial llega a los hospitales',
+             'Los médicos usan inteligencia artificial para diagnosticar tumores'),
+]
+
+
+def test_vectores_normalizados():
+    matrix = hashed_matrix(['inteligencia artificial en medicina', ''])
+    assert matrix.shape[0] == 2
+    assert abs(float((matrix[0] @ matrix[0].T).sum()) - 1.0) < 1e-6
+
+
+def test_el_mas_relevante_sube_aunque_la_busqueda_lo_dejara_ultimo():
+    ranked = rerank_articles(ARTICLES, 'inteligencia artificial en medicina', top_k=3)
+    assert ranked[0] is ARTICLES[2]
+    assert len(ranked) == 3
+
+
+def test_los_intereses_desempatan():
+    ranked = rerank_articles(ARTICLES[:2], 'noticias del fin de semana', user_interests=['fútbol'], top_k=2)
+    assert ranked[0] is ARTICLES[0]
+
+
+def test_respeta_top_k_y_listas_cortas():
+    assert len(rerank_articles(ARTICLES, 'medicina', top_k=1)) == 1
+    assert rerank_articles(ARTICLES[:1], 'medicina') == ARTICLES[:1]
+    assert len(rerank_articles(ARTICLES, 'medicina')) == min(len(ARTICLES), RERANK_CONFIG['top_k'])
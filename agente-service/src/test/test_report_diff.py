@@ -0,0 +1,21 @@
+"""Tests de las diferencias frase a frase entre versiones del informe"""
+from src.utils.report_diff import diff_report, split_sentences
+
+
+def test_split_sentences():
+    text = 'Primera frase.  Segunda   frase!\n\n- Viñeta sin punto\nÚltima? sí'
+    assert split_sentences(text) == ['Primera frase.', 'Segunda frase!', '- Viñeta sin punto', 'Última?', 'sí']
+
+
+def test_sin_cambios():
+    assert diff_report('Uno. Dos.', 'Uno.\nDos.') == ''
+
+
+def test_lista_frases_quitadas_y_anadidas():
+    old = 'La inflación subió. El dato es de mayo. Fuente: INE.'
+    new = 'La inflación subió. El dato es de junio. Fuente: INE. Se añadió contexto.'
+    assert diff_report(old, new).splitlines() == [
+        '- El dato es de mayo.',
+        '+ El dato es de junio.',
+        '+ Se añadió contexto.',
+    ]
@@ -0,0 +1,84 @@
+"""Tests del motor de recuperación"""
+import threading
+import time
+
+from src.services.retrieval_service import RetrievalEngine, canonicalize_url, merge_article_lists
+from src.utils.deadline import current_deadline
+
+
+TITLES = ['Los embalses bajan al treinta por ciento', 'El campo pide ayudas urgentes',
+          'Cortes de agua nocturnos en la comarca', 'Temporada de incendios adelantada',
+          'Hoteles del litoral reducen el consumo', 'Ganaderos venden reses por falta de pasto',
+          'Sube el precio de la fruta de temporada', 'Acuíferos sobreexplotados en el sur',
+          'Meteorología no prevé lluvias hasta octubre', 'Regantes aceptan recortes del trasvase']
+
+
+def _article(i: int, source: str = 'medio') -> dict:
+    return {'title': TITLES[i], 'url': f'https://{source}.example/n/{i}',
+            'snippet': f'{TITLES[i]}. Crónica número {i} de {source} sobre la sequía con datos propios '
+                       f'y declaraciones recogidas esta semana.',
+            'source': source}
+
+
+class FakeNewsAPI:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.interests = []
+        self.budgets = []
+
+    def search_news(self, query, user_interests):
+        self.interests.append(user_interests)
+        return {'success': True, 'articles': [_article(i, 'api') for i in range(3)]}
+
+    def aggregate_news(self, query):
+        # Las herramientas piden su timeout HTTP con time_budget: se ve el plazo de la ronda
+        self.budgets.append(current_deadline().remaining())
+        time.sleep(self.delay)
+        return {'success': True, 'articles': [_article(i + 3, 'agregador') for i in range(3)]}
+
+
+class FakeScraper:
+    def __init__(self, release: threading.Event = None):
+        self.release = release
+
+    def search(self, query, max_results):
+        if self.release is not None:
+            self.release.wait(5)
+        return {'success': True, 'articles': [_article(9, 'scraper')]}
+
+
+def test_url_canonica_solo_quita_parametros_de_seguimiento():
+    url = 'https://www.medio.example/noticia/?utm_source=x&ref=home&reference=42&fbclid=abc#top'
+    assert canonicalize_url(url) == 'medio.example/noticia?reference=42'
+    assert canonicalize_url('http://m.medio.example/a?refresh=1') == 'medio.example/a?refresh=1'
+
+
+def test_combina_fuentes_y_pasa_los_intereses():
+    api = FakeNewsAPI()
+    engine = RetrievalEngine(api, FakeScraper(), {'min_quality_sources': 100, 'timeout': 5})
+    result = engine.retrieve('sequía', user_interests=['clima'])
+    assert result['success'] and result['count'] == 7
+    assert api.interests and all(interests == ['clima'] for interests in api.interests)
+    assert all(0 < budget <= 5 for budget in api.budgets)
+
+
+def test_no_espera_a_la_fuente_lenta_con_material_suficiente():
+    release = threading.Event()
+    engine = RetrievalEngine(FakeNewsAPI(), FakeScraper(release), {'min_quality_sources': 3, 'timeout': 5})
+    started = time.monotonic()
+    result = engine.retrieve('sequía')
+    release.set()
+    assert result['early_stop'] and time.monotonic() - started < 2
+
+
+def test_tiempo_agotado():
+    engine = RetrievalEngine(FakeNewsAPI(delay=1.5), FakeScraper(), {'min_quality_sources': 100, 'timeout': 1})
+    result = engine.retrieve('sequía')
+    assert any('Tiempo de espera agotado' in error for error in result['errors'])
+
+
+def test_merge_article_lists_prioriza_la_primera_lista():
+    first = [_article(1, 'a')]
+    second = [{**_article(1, 'a'), 'url': 'https://a.example/n/1/?utm_medium=x'}, _article(2, 'b')]
+    merged = merge_article_lists(first, second, max_articles=5)
+    assert [a['url'] for a in merged] == ['https://a.example/n/1', 'https://b.example/n/2']
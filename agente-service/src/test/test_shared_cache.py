@@ -0,0 +1,80 @@
+"""Tests del cache compartido en sqlite"""
+import asyncio
+
+from src.utils.shared_cache import SharedCache, ashared_call, cache_key, shared_call
+
+
+def test_guarda_y_lee_valores(tmp_path):
+    cache = SharedCache(str(tmp_path / 'cache.sqlite3'))
+    cache.set('llm:a', {'texto': 'ñandú'})
+    assert cache.get('llm:a') == {'texto': 'ñandú'}
+    assert cache.get('llm:b', 'nada') == 'nada'
+    assert cache.stats()['entries'] == 1
+
+
+def test_entrada_caducada_es_un_fallo(tmp_path):
+    cache = SharedCache(str(tmp_path / 'cache.sqlite3'))
+    cache.set('llm:a', 1, ttl=-1)
+    assert cache.get('llm:a', 'nada') == 'nada'
+
+
+def test_valor_corrupto_es_un_fallo(tmp_path):
+    cache = SharedCache(str(tmp_path / 'cache.sqlite3'))
+    cache.set('llm:a', 1)
+    cache._connection().execute("UPDATE cache SET value = '{roto' WHERE key = 'llm:a'")
+    assert cache.get('llm:a', 'nada') == 'nada'
+    assert cache.errors == 1
+
+
+def test_directorio_imposible_desactiva_el_cache(tmp_path):
+    blocker = tmp_path / 'archivo'
+    blocker.write_text('')
+    cache = SharedCache(str(blocker / 'sub' / 'cache.sqlite3'))
+    assert not cache.enabled
+    calls = []
+    assert shared_call(cache, 'llm', ['x'], lambda: calls.append(1) or 'ok') == 'ok'
+    assert shared_call(cache, 'llm', ['x'], lambda: calls.append(1) or 'ok') == 'ok'
+    assert len(calls) == 2
+
+
+def test_shared_call_no_guarda_lo_no_cacheable(tmp_path):
+    cache = SharedCache(str(tmp_path / 'cache.sqlite3'))
+    calls = []
+
+    def fn():
+        calls.append(1)
+        return {'success': len(calls) > 1}
+
+    succeeded = lambda result: result['success']
+    assert shared_call(cache, 'http', ['GET', '/x'], fn, succeeded) == {'success': False}
+    assert shared_call(cache, 'http', ['GET', '/x'], fn, succeeded) == {'success': True}
+    assert shared_call(cache, 'http', ['GET', '/x'], fn, succeeded) == {'success': True}
+    assert len(calls) == 2
+
+
+def test_ashared_call(tmp_path):
+    cache = SharedCache(str(tmp_path / 'cache.sqlite3'))
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        return 'ok'
+
+    assert asyncio.run(ashared_call(cache, 'llm', ['p'], fn)) == 'ok'
+    assert asyncio.run(ashared_call(cache, 'llm', ['p'], fn)) == 'ok'
+    assert len(calls) == 1
+
+
+def test_evicta_los_menos_usados_al_superar_el_maximo(tmp_path):
+    cache = SharedCache(str(tmp_path / 'cache.sqlite3'), max_bytes=2000, evict_every=1)
+    for i in range(20):
+        cache.set(f'llm:{i}', 'x' * 150)
+    stats = cache.stats()
+    assert stats['bytes'] <= 2000 * 0.9
+    assert stats['evicted'] > 0
+    assert cache.get('llm:19') == 'x' * 150
+
+
+def test_cache_key_estable():
+    assert cache_key('llm', {'b': 1, 'a': 2}) == cache_key('llm', {'a': 2, 'b': 1})
+    assert cache_key('llm', ['x']) != cache_key('http', ['x'])
@@ -0,0 +1,84 @@
+"""Tests del ejecutor de grafos de etapas"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.services.stage_graph import Stage, StageGraph, StageGraphError
+from src.utils.deadline import Deadline, DeadlineExceeded, deadline_scope
+
+
+def _diamond(started: dict):
+    def branch(name):
+        def fn(x):
+            started[name] = time.monotonic()
+            time.sleep(0.1)
+            return x + 1
+        return fn
+
+    return StageGraph([
+        Stage('a', branch('a'), ['x'], ['a']),
+        Stage('b', branch('b'), ['x'], ['b']),
+        Stage('suma', lambda a, b: {'total': a + b}, ['a', 'b'], ['total']),
+    ], initial_keys=['x'])
+
+
+def test_etapas_independientes_en_paralelo():
+    started = {}
+    result = _diamond(started).run({'x': 1})
+    assert result['total'] == 4
+    assert abs(started['a'] - started['b']) < 0.05
+    assert set(result['_timings']) == {'a', 'b', 'suma'}
+
+
+def test_validacion_del_grafo():
+    with pytest.raises(StageGraphError):
+        StageGraph([Stage('a', lambda y: y, ['y'], ['z'])], initial_keys=['x'])
+    with pytest.raises(StageGraphError):
+        StageGraph([Stage('a', lambda x: x, ['x'], ['z']), Stage('a', lambda x: x, ['x'], ['w'])],
+                   initial_keys=['x'])
+    with pytest.raises(StageGraphError):
+        StageGraph([Stage('a', lambda x: x, ['x'], ['x'])], initial_keys=['x'])
+
+
+def test_condicion_omite_la_etapa():
+    graph = StageGraph([
+        Stage('decide', lambda x: x > 5, ['x'], ['ok']),
+        Stage('usa', lambda ok: 'hecho', ['ok'], ['salida'], condition=lambda context: context['ok']),
+    ], initial_keys=['x'])
+    assert graph.run({'x': 1})['salida'] is None
+    assert graph.run({'x': 10})['salida'] == 'hecho'
+
+
+def test_salida_que_falta():
+    graph = StageGraph([Stage('a', lambda x: {'otra': 1}, ['x'], ['y', 'z'])], initial_keys=['x'])
+    with pytest.raises(StageGraphError):
+        graph.run({'x': 1})
+
+
+def test_plazo_agotado_conserva_lo_producido():
+    release = threading.Event()
+    graph = StageGraph([
+        Stage('rapida', lambda x: x, ['x'], ['y']),
+        Stage('lenta', lambda y: release.wait(2), ['y'], ['z']),
+    ], initial_keys=['x'])
+    try:
+        with deadline_scope(Deadline(0.3)), pytest.raises(DeadlineExceeded) as error:
+            graph.run({'x': 1})
+    finally:
+        release.set()
+    assert error.value.partial_context['y'] == 1
+    assert 'rapida' in error.value.partial_context['_timings']
+
+
+def test_arun_mezcla_etapas_sincronas_y_asincronas():
+    async def fetch(x):
+        await asyncio.sleep(0.01)
+        return x * 10
+
+    graph = StageGraph([
+        Stage('fetch', fetch, ['x'], ['y']),
+        Stage('doble', lambda y: y * 2, ['y'], ['z']),
+    ], initial_keys=['x'])
+    assert asyncio.run(graph.arun({'x': 2}))['z'] == 40
@@ -0,0 +1,94 @@
+"""Tests de los lectores de la salida compacta del plan y del Critic"""
+from src.utils.structured_output import (
+    compact_plan, extract_json_object, format_critique_findings, parse_critique, parse_recritique
+)
+
+OPEN_ISSUES = [
+    {'tipo': 'fuente', 'detalle': 'Falta la fuente del dato de inflación'},
+    {'tipo': 'fecha', 'detalle': 'La fecha del anuncio no coincide'},
+]
+
+
+def test_extract_json_object_ignora_texto_y_bloques_de_codigo():
+    text = 'Final Answer:\n```json\n{"codigo": "CODE02", "nota": "usa {llaves}"}\n```'
+    assert extract_json_object(text) == {'codigo': 'CODE02', 'nota': 'usa {llaves}'}
+
+
+def test_extract_json_object_sin_objeto_valido():
+    assert extract_json_object('{no es json} ni esto') is None
+    assert extract_json_object('') is None
+
+
+def test_parse_critique_lee_codigo_y_problemas_del_json():
+    critique = parse_critique(
+        '{"codigo": "code01", "problemas": [{"tipo": "fuente", "detalle": " sin fuente "}, "fecha errónea"],'
+        ' "recomendaciones": ["citar la fuente"]}'
+    )
+    assert critique['codigo'] == 'CODE01'
+    assert critique['problemas'] == [{'tipo': 'fuente', 'detalle': 'sin fuente'},
+                                     {'tipo': 'otro', 'detalle': 'fecha errónea'}]
+    assert critique['recomendaciones'] == ['citar la fuente']
+
+
+def test_parse_critique_sin_json_usa_el_ultimo_codigo():
+    critique = parse_critique('Al principio parecía CODE02, pero faltan fuentes. Veredicto: CODE01')
+    assert critique['codigo'] == 'CODE01'
+    assert critique['problemas'] == []
+
+
+def test_parse_critique_sin_codigo_no_decide():
+    assert parse_critique('El informe está bien escrito')['codigo'] is None
+
+
+def test_parse_recritique_aprueba_solo_si_todo_se_resuelve():
+    critique = parse_recritique(
+        '{"estado": [{"id": 1, "resuelto": true}, {"id": 2, "resuelto": "true"}], "nuevos_problemas": []}',
+        OPEN_ISSUES
+    )
+    assert critique['codigo'] == 'CODE02'
+    assert critique['problemas'] == []
+    assert critique['resueltos'] == OPEN_ISSUES
+
+
+def test_parse_recritique_mantiene_abiertos_y_suma_nuevos():
+    critique = parse_recritique(
+        '{"codigo": "CODE02", "estado": [{"id": 1, "resuelto": true}, {"id": "x", "resuelto": true}],'
+        ' "nuevos_problemas": [{"tipo": "tono", "detalle": "Titular sensacionalista"}]}',
+        OPEN_ISSUES
+    )
+    # El código no lo decide el modelo
+    assert critique['codigo'] == 'CODE01'
+    assert critique['problemas'] == [OPEN_ISSUES[1], {'tipo': 'tono', 'detalle': 'Titular sensacionalista'}]
+    assert critique['resueltos'] == [OPEN_ISSUES[0]]
+
+
+def test_parse_recritique_sin_json_ni_codigo_no_aprueba():
+    critique = parse_recritique('Revisé los cambios y parecen razonables.', OPEN_ISSUES)
+    assert critique['codigo'] == 'CODE01'
+    assert critique['problemas'] == OPEN_ISSUES
+    assert critique['resueltos'] == []
+
+
+def test_parse_recritique_sin_json_con_codigo_explicito():
+    critique = parse_recritique('Todos los problemas quedaron resueltos. CODE02', OPEN_ISSUES)
+    assert critique['codigo'] == 'CODE02'
+    assert critique['problemas'] == []
+
+
+def test_format_critique_findings():
+    text = format_critique_findings({'codigo': None, 'problemas': OPEN_ISSUES[:1], 'recomendaciones': ['revisar']})
+    assert text.splitlines() == [
+        'Veredicto: sin código',
+        '1. [fuente] Falta la fuente del dato de inflación',
+        '- Recomendación: revisar',
+    ]
+
+
+def test_compact_plan_en_vinetas_y_acotado():
+    plan = '{"objetivo": "Informar", "subtareas": ["buscar datos", "contrastar"], "criterios": "fuentes oficiales"}'
+    assert compact_plan(plan).splitlines() == [
+        'Objetivo: Informar',
+        'Subtareas: buscar datos; contrastar',
+        'Criterios: fuentes oficiales',
+    ]
+    assert compact_plan('palabra ' * 100, max_chars=30).endswith('…')
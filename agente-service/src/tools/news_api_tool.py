@@ -1,65 +1,158 @@
 """
 Herramientas para que el agente investigador pueda usar los servicios de noticias del backend
 """
+import httpx
 import requests
 from typing import List, Dict, Optional
 import os
+from urllib.parse import urlsplit, urlunsplit
+from src.utils.article_dedup import deduplicate_articles
+from src.utils.bounded_json import PayloadTooLarge, parse_bounded, aparse_bounded
+from src.utils.cassette import cassette_call, acassette_call
+from src.utils.deadline import time_budget
+from src.utils.memo import TTLCache, memoize, normalize_text
+from src.utils.shared_cache import get_shared_cache, shared_call, ashared_call
 
 # URL del backend (debe estar configurada en las variables de entorno)
 BACKEND_URL = os.getenv('BACKEND_URL', 'http://localhost:3001')
 
+# Límites de lectura de las respuestas: se descarta todo lo que el flujo no usa
+MAX_RESPONSE_BYTES = int(os.getenv('TOOL_MAX_RESPONSE_BYTES', 5 * 1024 * 1024))
+MAX_FIELD_CHARS = int(os.getenv('TOOL_MAX_FIELD_CHARS', 2000))
+MAX_CONTENT_CHARS = int(os.getenv('TOOL_MAX_CONTENT_CHARS', 20000))
+_RESPONSE_FIELDS = frozenset({
+    'status', 'message', 'data', 'articles', 'count',
+    'title', 'url', 'snippet', 'source', 'sources', 'type',
+    'content', 'contentLength'
+})
+_LONG_FIELDS = {'content': MAX_CONTENT_CHARS}
+
+# Cache de proceso de las llamadas al backend (debajo del memo de cada ejecución y encima
+# del cache compartido entre workers)
+TOOL_CACHE = TTLCache(
+    max_entries=int(os.getenv('TOOL_CACHE_MAX_ENTRIES', 512)),
+    ttl=int(os.getenv('TOOL_CACHE_TTL', 600))
+)
+# Validez en el cache compartido entre workers (src.utils.shared_cache)
+HTTP_CACHE_TTL = int(os.getenv('TOOL_CACHE_TTL', 600))
+HEALTH_CACHE_TTL = int(os.getenv('HEALTH_CACHE_TTL', 10))
+
+
+def _succeeded(result: Dict) -> bool:
+    # Los errores no se comparten: el siguiente worker vuelve a intentarlo
+    return bool(result.get('success'))
+
+
+def _url_key(url: str) -> str:
+    parts = urlsplit((url or '').strip())
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip('/'), parts.query, ''))
+
+
+def _request_key(tool: 'NewsAPITool', path: str, payload: Dict, parse=None):
+    """Clave del memo: la misma consulta con otras mayúsculas o espacios es la misma llamada"""
+    interests = tuple(sorted({normalize_text(i) for i in payload.get('userInterests') or []}))
+    return tool.base_url, path, normalize_text(payload.get('query')), interests, _url_key(payload.get('url'))
+
+
 class NewsAPITool:
     """
     Herramienta para interactuar con la API de noticias del backend
+
+    Los métodos síncronos usan requests; las variantes con prefijo "a" (asearch_news,
+    aaggregate_news...) usan httpx y pueden esperarse desde un event loop.
     """
     
     def __init__(self, base_url: str = None):
         self.base_url = base_url or BACKEND_URL
+        self._async_client = None
     
-    def search_news(self, query: str, user_interests: List[str] = None) -> Dict:
-        """
-        Busca noticias en múltiples fuentes (Google News, BBC, CNN, El País, YouTube)
-        
-        Args:
-            query: Término de búsqueda
-            user_interests: Lista opcional de intereses del usuario para filtrar
-            
-        Returns:
-            Dict con los artículos encontrados
-        """
-        try:
-            url = f"{self.base_url}/api/news/search"
-            payload = {
-                "query": query,
-                "userInterests": user_interests or []
+    @staticmethod
+    def _articles_result(data: Dict) -> Dict:
+        """Convierte la respuesta de /search o /aggregate al formato de la herramienta"""
+        if data.get('status') == 'success':
+            return {
+                'success': True,
+                'articles': data.get('data', {}).get('articles', []),
+                'count': data.get('data', {}).get('count', 0)
             }
-            
-            response = requests.post(url, json=payload, timeout=30)
-            response.raise_for_status()
-            
-            data = response.json()
-            if data.get('status') == 'success':
-                return {
-                    'success': True,
-                    'articles': data.get('data', {}).get('articles', []),
-                    'count': data.get('data', {}).get('count', 0)
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': data.get('message', 'Error desconocido')
-                }
+        return {
+            'success': False,
+            'error': data.get('message', 'Error desconocido')
+        }
+    
+    @staticmethod
+    def _extract_result(data: Dict) -> Dict:
+        """Convierte la respuesta de /extract al formato de la herramienta"""
+        if data.get('status') == 'success':
+            return {
+                'success': True,
+                'url': data.get('data', {}).get('url', ''),
+                'content': data.get('data', {}).get('content', ''),
+                'contentLength': data.get('data', {}).get('contentLength', 0)
+            }
+        return {
+            'success': False,
+            'error': data.get('message', 'Error desconocido')
+        }
+    
+    @staticmethod
+    def _health_result(data: Dict) -> Dict:
+        return {
+            'success': True,
+            'status': data.get('status'),
+            'message': data.get('message', '')
+        }
+    
+    @memoize(TOOL_CACHE, _request_key, _succeeded, name='backend')
+    def _post(self, path: str, payload: Dict, parse) -> Dict:
+        # Los workers del host comparten los resultados; con un cassette activo el resultado
+        # se graba o se sirve sin salir a la red
+        parts = ['POST', f"{self.base_url}{path}", payload]
+        return shared_call(get_shared_cache(), 'http', parts,
+                           lambda: cassette_call('http', parts, lambda: self._send(path, payload, parse), label=path),
+                           _succeeded, HTTP_CACHE_TTL)
+    
+    def _send(self, path: str, payload: Dict, parse) -> Dict:
+        try:
+            # El cuerpo se lee por fragmentos, acotado y podado a los campos que se usan
+            with requests.post(f"{self.base_url}{path}", json=payload, timeout=time_budget(30), stream=True) as response:
+                response.raise_for_status()
+                data = parse_bounded(response.iter_content(64 * 1024), _RESPONSE_FIELDS, MAX_RESPONSE_BYTES,
+                                     MAX_FIELD_CHARS, _LONG_FIELDS, response.headers)
+            return parse(data)
         except requests.exceptions.RequestException as e:
             return {
                 'success': False,
                 'error': f'Error de conexión: {str(e)}'
             }
+        except PayloadTooLarge as e:
+            return {
+                'success': False,
+                'error': f'Respuesta demasiado grande: {str(e)}'
+            }
         except Exception as e:
             return {
                 'success': False,
                 'error': f'Error inesperado: {str(e)}'
             }
     
+    def search_news(self, query: str, user_interests: List[str] = None) -> Dict:
+        """
+        Busca noticias en múltiples fuentes (Google News, BBC, CNN, El País, YouTube)
+        
+        Args:
+            query: Término de búsqueda
+            user_interests: Lista opcional de intereses del usuario para filtrar
+            
+        Returns:
+            Dict con los artículos encontrados
+        """
+        payload = {
+            "query": query,
+            "userInterests": user_interests or []
+        }
+        return self._post("/api/news/search", payload, self._articles_result)
+    
     def aggregate_news(self, query: str) -> Dict:
         """
         Obtiene noticias agregadas de múltiples fuentes (método simplificado)
@@ -70,35 +163,7 @@ class NewsAPITool:
         Returns:
             Dict con los artículos agregados
         """
-        try:
-            url = f"{self.base_url}/api/news/aggregate"
-            payload = {"query": query}
-            
-            response = requests.post(url, json=payload, timeout=30)
-            response.raise_for_status()
-            
-            data = response.json()
-            if data.get('status') == 'success':
-                return {
-                    'success': True,
-                    'articles': data.get('data', {}).get('articles', []),
-                    'count': data.get('data', {}).get('count', 0)
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': data.get('message', 'Error desconocido')
-                }
-        except requests.exceptions.RequestException as e:
-            return {
-                'success': False,
-                'error': f'Error de conexión: {str(e)}'
-            }
-        except Exception as e:
-            return {
-                'success': False,
-                'error': f'Error inesperado: {str(e)}'
-            }
+        return self._post("/api/news/aggregate", {"query": query}, self._articles_result)
     
     def extract_article_content(self, url: str) -> Dict:
         """
@@ -110,55 +175,108 @@ class NewsAPITool:
         Returns:
             Dict con el contenido extraído
         """
-        try:
-            api_url = f"{self.base_url}/api/news/extract"
-            payload = {"url": url}
-            
-            response = requests.post(api_url, json=payload, timeout=30)
-            response.raise_for_status()
-            
-            data = response.json()
-            if data.get('status') == 'success':
-                return {
-                    'success': True,
-                    'url': data.get('data', {}).get('url', ''),
-                    'content': data.get('data', {}).get('content', ''),
-                    'contentLength': data.get('data', {}).get('contentLength', 0)
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': data.get('message', 'Error desconocido')
-                }
-        except requests.exceptions.RequestException as e:
-            return {
-                'success': False,
-                'error': f'Error de conexión: {str(e)}'
-            }
-        except Exception as e:
-            return {
-                'success': False,
-                'error': f'Error inesperado: {str(e)}'
-            }
+        return self._post("/api/news/extract", {"url": url}, self._extract_result)
     
     def check_health(self) -> Dict:
         """
         Verifica el estado del servicio de noticias
         
+        El resultado (también si falla) se comparte unos segundos entre los workers,
+        para que las sondas de todos ellos no lleguen a la vez al backend.
+        
         Returns:
             Dict con el estado del servicio
         """
+        return shared_call(get_shared_cache(), 'health', [f"{self.base_url}/api/news/health"],
+                           self._fetch_health, ttl=HEALTH_CACHE_TTL)
+    
+    def _fetch_health(self) -> Dict:
         try:
             url = f"{self.base_url}/api/news/health"
             response = requests.get(url, timeout=5)
             response.raise_for_status()
-            
-            data = response.json()
+            return self._health_result(response.json())
+        except Exception as e:
             return {
-                'success': True,
-                'status': data.get('status'),
-                'message': data.get('message', '')
+                'success': False,
+                'error': f'Servicio no disponible: {str(e)}'
+            }
+    
+    # --- Variantes asíncronas (httpx) ---
+    
+    def _get_async_client(self) -> httpx.AsyncClient:
+        # Un cliente por instancia para reutilizar conexiones entre llamadas
+        if self._async_client is None or self._async_client.is_closed:
+            self._async_client = httpx.AsyncClient(base_url=self.base_url, timeout=30)
+        return self._async_client
+    
+    async def aclose(self):
+        """Cierra el cliente asíncrono (y sus conexiones) si se creó"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+    
+    @memoize(TOOL_CACHE, _request_key, _succeeded, name='backend')
+    async def _apost(self, path: str, payload: Dict, parse) -> Dict:
+        # Misma clave que _post (en el cache compartido y en el cassette): lo obtenido por
+        # el flujo síncrono sirve para el asíncrono
+        parts = ['POST', f"{self.base_url}{path}", payload]
+        return await ashared_call(
+            get_shared_cache(), 'http', parts,
+            lambda: acassette_call('http', parts, lambda: self._asend(path, payload, parse), label=path),
+            _succeeded, HTTP_CACHE_TTL
+        )
+    
+    async def _asend(self, path: str, payload: Dict, parse) -> Dict:
+        try:
+            client = self._get_async_client()
+            async with client.stream('POST', path, json=payload, timeout=time_budget(30)) as response:
+                response.raise_for_status()
+                data = await aparse_bounded(response.aiter_bytes(), _RESPONSE_FIELDS, MAX_RESPONSE_BYTES,
+                                            MAX_FIELD_CHARS, _LONG_FIELDS, response.headers)
+            return parse(data)
+        except httpx.HTTPError as e:
+            return {
+                'success': False,
+                'error': f'Error de conexión: {str(e)}'
+            }
+        except PayloadTooLarge as e:
+            return {
+                'success': False,
+                'error': f'Respuesta demasiado grande: {str(e)}'
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Error inesperado: {str(e)}'
             }
+    
+    async def asearch_news(self, query: str, user_interests: List[str] = None) -> Dict:
+        """Versión asíncrona de search_news"""
+        payload = {
+            "query": query,
+            "userInterests": user_interests or []
+        }
+        return await self._apost("/api/news/search", payload, self._articles_result)
+    
+    async def aaggregate_news(self, query: str) -> Dict:
+        """Versión asíncrona de aggregate_news"""
+        return await self._apost("/api/news/aggregate", {"query": query}, self._articles_result)
+    
+    async def aextract_article_content(self, url: str) -> Dict:
+        """Versión asíncrona de extract_article_content"""
+        return await self._apost("/api/news/extract", {"url": url}, self._extract_result)
+    
+    async def acheck_health(self) -> Dict:
+        """Versión asíncrona de check_health"""
+        return await ashared_call(get_shared_cache(), 'health', [f"{self.base_url}/api/news/health"],
+                                  self._afetch_health, ttl=HEALTH_CACHE_TTL)
+    
+    async def _afetch_health(self) -> Dict:
+        try:
+            response = await self._get_async_client().get("/api/news/health", timeout=5)
+            response.raise_for_status()
+            return self._health_result(response.json())
         except Exception as e:
             return {
                 'success': False,
@@ -170,6 +288,14 @@ class NewsAPITool:
 news_api_tool = NewsAPITool()
 
 # Funciones wrapper para usar con CrewAI
+def _interests_list(user_interests) -> List[str]:
+    if isinstance(user_interests, str) and user_interests.strip():
+        return [i.strip() for i in user_interests.split(',') if i.strip()]
+    if isinstance(user_interests, list):
+        return user_interests
+    return []
+
+
 def search_news_tool(query: str, user_interests: str = "") -> str:
     """
     Busca noticias en múltiples fuentes (Google News, BBC, CNN, El País, YouTube).
@@ -186,26 +312,23 @@ def search_news_tool(query: str, user_interests: str = "") -> str:
         fuente, URL, resumen y tipo (artículo o video). Si no se encuentran noticias,
         retorna un mensaje informativo.
     """
-    # Convertir user_interests si es string
-    if isinstance(user_interests, str) and user_interests.strip():
-        interests_list = [i.strip() for i in user_interests.split(',') if i.strip()]
-    elif isinstance(user_interests, list):
-        interests_list = user_interests
-    else:
-        interests_list = []
-    
-    result = news_api_tool.search_news(query, interests_list)
+    result = news_api_tool.search_news(query, _interests_list(user_interests))
     
     if result['success']:
         articles = result.get('articles', [])
         if not articles:
             return f"No se encontraron noticias para la consulta: {query}"
         
-        formatted_result = f"✅ Se encontraron {result['count']} artículos sobre '{query}':\n\n"
+        # Agrupar copias de la misma nota para no repetirlas en el prompt
+        articles = deduplicate_articles(articles)
+        formatted_result = f"✅ Se encontraron {len(articles)} artículos distintos sobre '{query}':\n\n"
         
         for i, article in enumerate(articles, 1):
             formatted_result += f"{i}. {article.get('title', 'Sin título')}\n"
-            formatted_result += f"   Fuente: {article.get('source', 'Desconocida')}\n"
+            if article.get('sources'):
+                formatted_result += f"   Fuentes: {', '.join(article['sources'])}\n"
+            else:
+                formatted_result += f"   Fuente: {article.get('source', 'Desconocida')}\n"
             formatted_result += f"   URL: {article.get('url', 'N/A')}\n"
             snippet = article.get('snippet', '')
             if snippet:
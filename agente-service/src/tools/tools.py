@@ -1,10 +1,85 @@
-
+import os
+import httpx
 import requests
-from typing import Optional
+from typing import Dict, List, Optional
+from src.utils.bounded_json import PayloadTooLarge, parse_bounded, aparse_bounded
+from src.utils.cassette import cassette_call, acassette_call
+from src.utils.deadline import time_budget
+from src.utils.memo import TTLCache, memoize, normalize_text
+from src.utils.shared_cache import get_shared_cache, shared_call, ashared_call
+
+# URL del scraper externo (configurable por variable de entorno)
+SCRAPER_URL = os.getenv('SCRAPER_URL', 'https://scraper.rendoaltar.dev/api/search')
+
+# Límites de lectura de las respuestas del scraper (pueden ser de varios MB)
+MAX_RESPONSE_BYTES = int(os.getenv('TOOL_MAX_RESPONSE_BYTES', 5 * 1024 * 1024))
+MAX_FIELD_CHARS = int(os.getenv('TOOL_MAX_FIELD_CHARS', 2000))
+# Validez de los resultados en el cache compartido entre workers (src.utils.shared_cache)
+SCRAPER_CACHE_TTL = int(os.getenv('TOOL_CACHE_TTL', 600))
+# Cache de proceso de las búsquedas (debajo del memo de cada ejecución, ver src.utils.memo)
+SCRAPER_CACHE = TTLCache(
+    max_entries=int(os.getenv('TOOL_CACHE_MAX_ENTRIES', 512)),
+    ttl=SCRAPER_CACHE_TTL
+)
+# Solo los campos que lee _normalize_scraper_results
+_SCRAPER_FIELDS = frozenset({
+    'results', 'articles', 'data', 'items',
+    'title', 'url', 'link', 'snippet', 'description', 'content', 'source', 'type'
+})
+
+
+def _read_scraper_response(response):
+    return parse_bounded(response.iter_content(64 * 1024), _SCRAPER_FIELDS, MAX_RESPONSE_BYTES,
+                         MAX_FIELD_CHARS, headers=response.headers)
+
+
+async def _aread_scraper_response(response):
+    return await aparse_bounded(response.aiter_bytes(), _SCRAPER_FIELDS, MAX_RESPONSE_BYTES,
+                                MAX_FIELD_CHARS, headers=response.headers)
+
+
+def _succeeded(result: Dict) -> bool:
+    # Los errores no se comparten: el siguiente worker vuelve a intentarlo
+    return bool(result.get('success'))
+
+
+def _search_key(tool: 'NewsSearchTool', query: str, max_results: Optional[int] = 3):
+    return tool.base_url, normalize_text(query), max_results or tool.default_max_results
+
+
+def _normalize_scraper_results(data) -> List[Dict]:
+    """
+    Normaliza la respuesta del scraper al formato de artículo del backend
+    (title, url, snippet, source, type)
+    """
+    if isinstance(data, dict):
+        for key in ('results', 'articles', 'data', 'items'):
+            if key in data:
+                return _normalize_scraper_results(data[key])
+        return []
+    if not isinstance(data, list):
+        return []
+
+    articles = []
+    for item in data:
+        if not isinstance(item, dict):
+            continue
+        url = item.get('url') or item.get('link') or ''
+        if not url:
+            continue
+        articles.append({
+            'title': item.get('title', '') or '',
+            'url': url,
+            'snippet': item.get('snippet') or item.get('description') or item.get('content') or '',
+            'source': item.get('source') or 'Scraper',
+            'type': item.get('type', 'article')
+        })
+    return articles
+
 
 class NewsSearchTool:
-    def __init__(self):
-        self.base_url = "https://scraper.rendoaltar.dev/api/search"
+    def __init__(self, base_url: str = None):
+        self.base_url = base_url or SCRAPER_URL
         self.default_max_results = 3
 
     def _run(self, query: str, max_results: Optional[int] = 3) -> str:
@@ -17,6 +92,117 @@ class NewsSearchTool:
             "q": query,
             "max_results": max_results
         }
-        response = requests.get(self.base_url, params=params, timeout=120)  # Hasta 2 min de espera
-        response.raise_for_status()
-        return str(response.json())
+        # Hasta 2 min de espera (o el plazo restante)
+        with requests.get(self.base_url, params=params, timeout=time_budget(120), stream=True) as response:
+            response.raise_for_status()
+            return str(_read_scraper_response(response))
+
+    @staticmethod
+    def _search_result(data) -> Dict:
+        articles = _normalize_scraper_results(data)
+        return {
+            'success': True,
+            'articles': articles,
+            'count': len(articles)
+        }
+
+    @memoize(SCRAPER_CACHE, _search_key, _succeeded, name='scraper')
+    def search(self, query: str, max_results: Optional[int] = 3) -> Dict:
+        """
+        Igual que _run, pero retorna los artículos normalizados en el mismo
+        formato que NewsAPITool para poder combinarlos con otras fuentes
+
+        Args:
+            query: Término de búsqueda
+            max_results: Número máximo de resultados
+
+        Returns:
+            Dict con los artículos encontrados
+        """
+        if max_results is None:
+            max_results = self.default_max_results
+        # Los workers del host comparten los resultados; con un cassette activo el resultado
+        # se graba o se sirve sin salir a la red
+        parts = ['GET', self.base_url, query, max_results]
+        return shared_call(get_shared_cache(), 'http', parts,
+                           lambda: cassette_call('http', parts, lambda: self._search(query, max_results),
+                                                 label='scraper'),
+                           _succeeded, SCRAPER_CACHE_TTL)
+
+    def _search(self, query: str, max_results: int) -> Dict:
+        try:
+            params = {
+                "q": query,
+                "max_results": max_results
+            }
+            with requests.get(self.base_url, params=params, timeout=time_budget(120), stream=True) as response:
+                response.raise_for_status()
+                return self._search_result(_read_scraper_response(response))
+        except requests.exceptions.RequestException as e:
+            return {
+                'success': False,
+                'error': f'Error de conexión: {str(e)}'
+            }
+        except PayloadTooLarge as e:
+            return {
+                'success': False,
+                'error': f'Respuesta demasiado grande: {str(e)}'
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Error inesperado: {str(e)}'
+            }
+
+    async def _arun(self, query: str, max_results: Optional[int] = 3) -> str:
+        """
+        Versión asíncrona de _run: la espera (hasta 2 minutos) no ocupa un hilo
+        """
+        if max_results is None:
+            max_results = self.default_max_results
+        params = {
+            "q": query,
+            "max_results": max_results
+        }
+        async with httpx.AsyncClient(timeout=time_budget(120)) as client:
+            async with client.stream('GET', self.base_url, params=params) as response:
+                response.raise_for_status()
+                return str(await _aread_scraper_response(response))
+
+    @memoize(SCRAPER_CACHE, _search_key, _succeeded, name='scraper')
+    async def asearch(self, query: str, max_results: Optional[int] = 3) -> Dict:
+        """Versión asíncrona de search"""
+        if max_results is None:
+            max_results = self.default_max_results
+        parts = ['GET', self.base_url, query, max_results]
+        return await ashared_call(
+            get_shared_cache(), 'http', parts,
+            lambda: acassette_call('http', parts, lambda: self._asearch(query, max_results), label='scraper'),
+            _succeeded, SCRAPER_CACHE_TTL
+        )
+
+    async def _asearch(self, query: str, max_results: int) -> Dict:
+        try:
+            params = {
+                "q": query,
+                "max_results": max_results
+            }
+            async with httpx.AsyncClient(timeout=time_budget(120)) as client:
+                async with client.stream('GET', self.base_url, params=params) as response:
+                    response.raise_for_status()
+                    return self._search_result(await _aread_scraper_response(response))
+        except httpx.HTTPError as e:
+            return {
+                'success': False,
+                'error': f'Error de conexión: {str(e)}'
+            }
+        except PayloadTooLarge as e:
+            return {
+                'success': False,
+                'error': f'Respuesta demasiado grande: {str(e)}'
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Error inesperado: {str(e)}'
+            }
@@ -0,0 +1,161 @@
+"""
+Detección de artículos casi duplicados con MinHash
+
+Las agencias (EFE, Reuters, AP...) distribuyen la misma nota a varios medios,
+así que Google News, BBC, CNN y El País devuelven a menudo la misma historia.
+Este módulo agrupa esas copias y conserva un representante por grupo.
+"""
+import hashlib
+import re
+import struct
+import unicodedata
+from typing import Dict, List
+
+# Número de permutaciones de la firma y bandas para LSH (NUM_PERM = BANDS * ROWS)
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+# Similitud de Jaccard estimada a partir de la cual dos artículos son la misma historia
+DEFAULT_THRESHOLD = 0.5
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def _permutations(num_perm: int):
+    """Coeficientes (a, b) deterministas para las funciones hash h(x) = (a*x + b) mod p"""
+    coefficients = []
+    for i in range(num_perm):
+        digest = hashlib.blake2b(f"minhash-{i}".encode(), digest_size=16).digest()
+        a, b = struct.unpack('<QQ', digest)
+        coefficients.append((a % (_MERSENNE_PRIME - 1) + 1, b % _MERSENNE_PRIME))
+    return coefficients
+
+
+_PERMUTATIONS = _permutations(NUM_PERM)
+
+
+def _normalize(text: str) -> List[str]:
+    text = unicodedata.normalize('NFD', (text or '').lower())
+    text = ''.join(c for c in text if unicodedata.category(c) != 'Mn')
+    return re.findall(r'\w+', text)
+
+
+def shingles(text: str, size: int = 3) -> set:
+    """
+    Conjunto de shingles (n-gramas de palabras) de un texto
+
+    Los textos muy cortos (solo título) usan n-gramas de caracteres para
+    que la firma no quede vacía.
+    """
+    tokens = _normalize(text)
+    if len(tokens) >= size * 2:
+        return {' '.join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+    joined = ' '.join(tokens)
+    if len(joined) <= 5:
+        return {joined} if joined else set()
+    return {joined[i:i + 5] for i in range(len(joined) - 4)}
+
+
+def minhash_signature(text: str) -> List[int]:
+    """Calcula la firma MinHash de un texto"""
+    hashes = [
+        struct.unpack('<I', hashlib.blake2b(s.encode(), digest_size=4).digest())[0]
+        for s in shingles(text)
+    ]
+    if not hashes:
+        return [_MAX_HASH] * NUM_PERM
+    return [
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def estimate_similarity(sig_a: List[int], sig_b: List[int]) -> float:
+    """Similitud de Jaccard estimada entre dos firmas"""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+def article_text(article: Dict) -> str:
+    """Texto usado para la firma: título más contenido extraído o resumen"""
+    body = article.get('content') or article.get('snippet') or ''
+    return f"{article.get('title', '')} {body[:2000]}"
+
+
+def cluster_articles(articles: List[Dict], threshold: float = DEFAULT_THRESHOLD) -> List[List[int]]:
+    """
+    Agrupa los artículos casi duplicados
+
+    Usa LSH por bandas para encontrar candidatos y confirma cada par con la
+    similitud estimada de la firma completa.
+
+    Args:
+        articles: Lista de artículos (title, snippet/content, url, source)
+        threshold: Similitud mínima para considerar dos artículos duplicados
+
+    Returns:
+        List[List[int]]: Grupos de índices, en el orden original de la lista
+    """
+    # Sin texto no hay firma que comparar: cada uno de esos artículos queda en su propio grupo
+    signatures = [minhash_signature(text) if shingles(text) else None for text in map(article_text, articles)]
+    parent = list(range(len(articles)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for band in range(BANDS):
+        buckets: Dict[tuple, List[int]] = {}
+        start = band * ROWS
+        for i, signature in enumerate(signatures):
+            if signature is None:
+                continue
+            buckets.setdefault(tuple(signature[start:start + ROWS]), []).append(i)
+        for members in buckets.values():
+            first = members[0]
+            for other in members[1:]:
+                root_a, root_b = find(first), find(other)
+                if root_a != root_b and estimate_similarity(signatures[first], signatures[other]) >= threshold:
+                    # El índice menor queda como raíz para respetar el orden de llegada
+                    parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    clusters: Dict[int, List[int]] = {}
+    for i in range(len(articles)):
+        clusters.setdefault(find(i), []).append(i)
+    return sorted(clusters.values(), key=lambda members: members[0])
+
+
+def deduplicate_articles(articles: List[Dict], threshold: float = DEFAULT_THRESHOLD) -> List[Dict]:
+    """
+    Conserva un representante por grupo de artículos casi duplicados
+
+    El representante es el primero del grupo (la lista suele venir ordenada por
+    relevancia) y recibe la lista de fuentes y URLs de todas sus copias en
+    'sources' y 'duplicate_urls'.
+
+    Args:
+        articles: Lista de artículos
+        threshold: Similitud mínima para considerar dos artículos duplicados
+
+    Returns:
+        List[Dict]: Artículos sin duplicados
+    """
+    if not articles or len(articles) < 2:
+        return list(articles or [])
+
+    result = []
+    for members in cluster_articles(articles, threshold):
+        representative = dict(articles[members[0]])
+        if len(members) > 1:
+            sources = []
+            for i in members:
+                source = articles[i].get('source') or 'Desconocida'
+                if source not in sources:
+                    sources.append(source)
+            representative['sources'] = sources
+            representative['duplicate_urls'] = [articles[i].get('url', '') for i in members[1:]]
+        result.append(representative)
+    return result
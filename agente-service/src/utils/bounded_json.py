@@ -0,0 +1,189 @@
+"""
+Lectura acotada de respuestas JSON grandes
+
+El scraper y el endpoint de extracción pueden devolver megabytes. En lugar de
+response.json() (cuerpo completo + dict completo + str del dict) se lee el
+cuerpo por fragmentos con un máximo de bytes y se construye solo lo que usa
+el flujo: las claves de una lista blanca, con los textos recortados.
+
+Si ijson está instalado el JSON se analiza a medida que llega y las ramas
+descartadas nunca se construyen; si no, se decodifica el cuerpo (ya acotado)
+con json y se poda el resultado.
+"""
+import io
+import json
+from typing import AsyncIterable, Dict, FrozenSet, Iterable
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+class PayloadTooLarge(ValueError):
+    """La respuesta supera el máximo de bytes permitido"""
+
+
+def _check_declared_length(headers, max_bytes: int):
+    declared = headers.get('content-length') if headers is not None else None
+    if declared and declared.isdigit() and int(declared) > max_bytes:
+        raise PayloadTooLarge(f"Respuesta de {int(declared)} bytes (máximo {max_bytes})")
+
+
+class _BoundedReader(io.RawIOBase):
+    """Flujo de lectura sobre fragmentos que falla al superar max_bytes"""
+
+    def __init__(self, chunks: Iterable[bytes], max_bytes: int):
+        self._chunks = iter(chunks)
+        self._buffer = b''
+        self._max_bytes = max_bytes
+        self.total = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def _next_chunk(self) -> bytes:
+        for chunk in self._chunks:
+            if chunk:
+                self.total += len(chunk)
+                if self.total > self._max_bytes:
+                    raise PayloadTooLarge(f"Respuesta de más de {self._max_bytes} bytes")
+                return chunk
+        return b''
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            parts = [self._buffer]
+            self._buffer = b''
+            chunk = self._next_chunk()
+            while chunk:
+                parts.append(chunk)
+                chunk = self._next_chunk()
+            return b''.join(parts)
+        if not self._buffer:
+            self._buffer = self._next_chunk()
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def readinto(self, b) -> int:
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+
+def _truncate(value: str, limit: int) -> str:
+    return value if len(value) <= limit else value[:limit].rsplit(' ', 1)[0] + '…'
+
+
+def prune(value, keep: FrozenSet[str], max_chars: int, long_fields: Dict[str, int] = None):
+    """
+    Deja solo las claves de la lista blanca (a cualquier profundidad) y recorta los textos
+
+    Args:
+        value: Valor JSON ya decodificado
+        keep: Claves que se conservan
+        max_chars: Máximo de caracteres de un texto
+        long_fields: Máximos propios de algunas claves (p. ej. {'content': 20000})
+    """
+    long_fields = long_fields or {}
+
+    def walk(item, limit):
+        if isinstance(item, dict):
+            return {k: walk(v, long_fields.get(k, max_chars)) for k, v in item.items() if k in keep}
+        if isinstance(item, list):
+            return [walk(v, limit) for v in item]
+        if isinstance(item, str):
+            return _truncate(item, limit)
+        return item
+
+    return walk(value, max_chars)
+
+
+def _build_from_events(events, keep: FrozenSet[str], max_chars: int, long_fields: Dict[str, int]):
+    """Construye el valor podado a partir de los eventos de ijson, sin materializar lo descartado"""
+    root = None
+    stack = []          # contenedores abiertos que se conservan
+    keys = []           # clave pendiente de cada contenedor (None en las listas)
+    skip = 0            # profundidad dentro de una rama descartada
+
+    for _, event, value in events:
+        if skip:
+            if event in ('start_map', 'start_array'):
+                skip += 1
+            elif event in ('end_map', 'end_array'):
+                skip -= 1
+            continue
+        if event == 'map_key':
+            keys[-1] = value
+            continue
+        if event in ('end_map', 'end_array'):
+            stack.pop()
+            keys.pop()
+            continue
+
+        key = keys[-1] if stack and isinstance(stack[-1], dict) else None
+        if key is not None and key not in keep:
+            if event in ('start_map', 'start_array'):
+                skip = 1
+            continue
+
+        if event == 'start_map':
+            item = {}
+        elif event == 'start_array':
+            item = []
+        elif event == 'string':
+            item = _truncate(value, long_fields.get(key, max_chars))
+        else:
+            item = value
+
+        if not stack:
+            root = item
+        elif isinstance(stack[-1], list):
+            stack[-1].append(item)
+        else:
+            stack[-1][key] = item
+        if event in ('start_map', 'start_array'):
+            stack.append(item)
+            keys.append(None)
+
+    return root
+
+
+def parse_bounded(chunks: Iterable[bytes], keep: FrozenSet[str], max_bytes: int, max_chars: int,
+                  long_fields: Dict[str, int] = None, headers=None):
+    """
+    Lee y decodifica un cuerpo JSON por fragmentos, acotado y podado
+
+    Args:
+        chunks: Fragmentos del cuerpo (p. ej. response.iter_content())
+        keep: Claves que usa el flujo
+        max_bytes: Máximo de bytes del cuerpo
+        max_chars: Máximo de caracteres de un texto
+        long_fields: Máximos propios de algunas claves
+        headers: Cabeceras de la respuesta (un Content-Length mayor que max_bytes falla sin leer)
+
+    Raises:
+        PayloadTooLarge: El cuerpo supera max_bytes
+        ValueError: El cuerpo no es JSON válido
+    """
+    _check_declared_length(headers, max_bytes)
+    reader = _BoundedReader(chunks, max_bytes)
+    if ijson is not None:
+        try:
+            return _build_from_events(ijson.parse(reader, use_float=True), keep, max_chars, long_fields or {})
+        except ijson.JSONError as e:
+            raise ValueError(f"JSON inválido: {e}") from e
+    return prune(json.loads(reader.read()), keep, max_chars, long_fields)
+
+
+async def aparse_bounded(chunks: AsyncIterable[bytes], keep: FrozenSet[str], max_bytes: int, max_chars: int,
+                         long_fields: Dict[str, int] = None, headers=None):
+    """Versión asíncrona de parse_bounded: acumula el cuerpo (acotado) y lo poda"""
+    _check_declared_length(headers, max_bytes)
+    body = bytearray()
+    async for chunk in chunks:
+        body += chunk
+        if len(body) > max_bytes:
+            raise PayloadTooLarge(f"Respuesta de más de {max_bytes} bytes")
+    return parse_bounded((bytes(body),), keep, max_bytes, max_chars, long_fields)
+
@@ -0,0 +1,229 @@
+"""
+Grabación y reproducción (cassettes) de las interacciones externas de una petición
+
+En modo grabación se guardan, en un archivo JSON comprimido, la respuesta y la
+latencia de cada kickoff de CrewAI (LLM) y de cada llamada HTTP de las
+herramientas. En modo reproducción esas llamadas no salen del proceso: se
+sirven desde el cassette, con la latencia original (escalable) o sin espera,
+lo que permite repetir una petición lenta de producción sin red y de forma
+determinista para perfilarla o medir regresiones.
+
+Cada interacción se identifica por un hash de su tipo y sus entradas (prompt o
+URL y cuerpo). Las llamadas repetidas con la misma clave se sirven en el
+orden en que se grabaron, así que el orden entre etapas paralelas no importa.
+
+Una operación cuyo resultado depende del orden en que terminan sus llamadas
+internas (la recuperación, que combina fuentes y corta al tener suficientes)
+se graba entera con isolate=True: se guarda su resultado y las llamadas de
+dentro no pasan por el cassette.
+
+Los nombres de los cassettes que se graban los pone el servidor
+(new_cassette_name), nunca el cliente.
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional, Tuple
+
+RECORD = 'record'
+REPLAY = 'replay'
+
+_requested: ContextVar[Optional[Tuple[str, str, Optional[float]]]] = ContextVar('cassette_requested', default=None)
+_active_cassette: ContextVar[Optional['Cassette']] = ContextVar('cassette', default=None)
+_NAME_RE = re.compile(r'[^\w.-]')
+
+
+class CassetteMiss(Exception):
+    """En reproducción, la interacción no está en el cassette"""
+
+
+class CassetteNotFound(CassetteMiss):
+    """En reproducción, el cassette pedido no existe o no se puede leer"""
+
+
+def new_cassette_name() -> str:
+    """Nombre único para un cassette que se va a grabar (fecha y uuid)"""
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:12]}"
+
+
+def cassette_path(directory: str, name: str) -> str:
+    """Ruta del cassette (el nombre se sanea: puede venir de una cabecera)"""
+    return os.path.join(directory, f"{_NAME_RE.sub('_', name)}.json.gz")
+
+
+def _interaction_key(kind: str, key_parts) -> str:
+    raw = json.dumps([kind, key_parts], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class Cassette:
+    """
+    Interacciones grabadas de una petición
+
+    Args:
+        path: Archivo del cassette (.json.gz)
+        mode: RECORD o REPLAY
+        latency_scale: En reproducción, factor sobre la latencia grabada (0 = sin espera)
+    """
+
+    def __init__(self, path: str, mode: str, latency_scale: float = 1.0):
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.interactions = []
+        self._pending: Dict[str, deque] = defaultdict(deque)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str, latency_scale: float = 1.0) -> 'Cassette':
+        cassette = cls(path, REPLAY, latency_scale)
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                cassette.interactions = json.load(f)['interactions']
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            raise CassetteNotFound(f"No se puede leer el cassette {os.path.basename(path)}") from e
+        for interaction in cassette.interactions:
+            cassette._pending[interaction['key']].append(interaction)
+        return cassette
+
+    def save(self):
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._lock:
+            data = {'version': 1, 'created_at': time.time(), 'interactions': self.interactions}
+        with gzip.open(self.path, 'wt', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    def _record(self, kind: str, key: str, label: str, started: float, response: Any):
+        with self._lock:
+            self.interactions.append({
+                'kind': kind,
+                'key': key,
+                'label': label,
+                'latency': round(time.perf_counter() - started, 4),
+                'response': response
+            })
+
+    def _next(self, kind: str, key: str, label: str) -> Dict:
+        with self._lock:
+            pending = self._pending.get(key)
+            if not pending:
+                raise CassetteMiss(f"Sin grabación para {kind} '{label}' en {self.path}")
+            return pending.popleft()
+
+    def call(self, kind: str, key_parts, fn: Callable[[], Any], label: str = '') -> Any:
+        key = _interaction_key(kind, key_parts)
+        if self.mode == REPLAY:
+            interaction = self._next(kind, key, label)
+            if self.latency_scale:
+                time.sleep(interaction['latency'] * self.latency_scale)
+            return interaction['response']
+        started = time.perf_counter()
+        response = fn()
+        self._record(kind, key, label, started, response)
+        return response
+
+    async def acall(self, kind: str, key_parts, coro_fn: Callable[[], Any], label: str = '') -> Any:
+        key = _interaction_key(kind, key_parts)
+        if self.mode == REPLAY:
+            interaction = self._next(kind, key, label)
+            if self.latency_scale:
+                await asyncio.sleep(interaction['latency'] * self.latency_scale)
+            return interaction['response']
+        started = time.perf_counter()
+        response = await coro_fn()
+        self._record(kind, key, label, started, response)
+        return response
+
+
+def request_cassette(mode: Optional[str] = None, name: Optional[str] = None, latency_scale: Optional[float] = None):
+    """
+    Pide grabar o reproducir la petición actual (se aplica en cassette_scope)
+
+    Args:
+        mode: RECORD, REPLAY o None (ninguno)
+        name: Nombre del cassette (en grabación, uno de new_cassette_name)
+        latency_scale: Factor de latencia en reproducción (None = el configurado)
+    """
+    _requested.set((mode, name, latency_scale) if mode in (RECORD, REPLAY) and name else None)
+
+
+@contextmanager
+def cassette_scope(directory: str, default_mode: Optional[str] = None, default_name: Optional[str] = None,
+                   latency_scale: float = 1.0):
+    """
+    Activa el cassette pedido con request_cassette o, si no, el configurado por defecto
+
+    Los hilos que copian el contexto (etapas, recuperación) usan el mismo cassette.
+    Al salir, en grabación, se guarda el archivo.
+    """
+    requested = _requested.get()
+    mode, name, scale = requested or (default_mode, default_name, None)
+    if mode not in (RECORD, REPLAY) or not name or _active_cassette.get() is not None:
+        yield None
+        return
+
+    path = cassette_path(directory, name)
+    scale = latency_scale if scale is None else scale
+    cassette = Cassette.load(path, scale) if mode == REPLAY else Cassette(path, RECORD)
+    token = _active_cassette.set(cassette)
+    try:
+        yield cassette
+    finally:
+        _active_cassette.reset(token)
+        if mode == RECORD:
+            cassette.save()
+
+
+def current_cassette() -> Optional[Cassette]:
+    return _active_cassette.get()
+
+
+def _isolated(fn: Callable[[], Any]) -> Callable[[], Any]:
+    """fn ejecutada sin cassette activo (tampoco en los hilos y tareas que lance)"""
+    def run():
+        token = _active_cassette.set(None)
+        try:
+            return fn()
+        finally:
+            _active_cassette.reset(token)
+    return run
+
+
+def cassette_call(kind: str, key_parts, fn: Callable[[], Any], label: str = '', isolate: bool = False) -> Any:
+    """
+    Ejecuta fn, grabándola o sirviéndola desde el cassette activo (si lo hay)
+
+    Con isolate=True se graba solo el resultado de fn y sus llamadas internas no se graban
+    """
+    cassette = _active_cassette.get()
+    if cassette is None:
+        return fn()
+    return cassette.call(kind, key_parts, _isolated(fn) if isolate else fn, label)
+
+
+async def acassette_call(kind: str, key_parts, coro_fn: Callable[[], Any], label: str = '',
+                         isolate: bool = False) -> Any:
+    """Versión asíncrona de cassette_call (coro_fn retorna la corrutina a esperar)"""
+    cassette = _active_cassette.get()
+    if cassette is None:
+        return await coro_fn()
+    if isolate:
+        async def isolated():
+            # Las tareas creadas dentro copian este contexto, ya sin cassette
+            token = _active_cassette.set(None)
+            try:
+                return await coro_fn()
+            finally:
+                _active_cassette.reset(token)
+        return await cassette.acall(kind, key_parts, isolated, label)
+    return await cassette.acall(kind, key_parts, coro_fn, label)
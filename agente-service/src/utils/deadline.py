@@ -0,0 +1,136 @@
+"""
+Plazo (deadline) de una petición y token de cancelación
+
+El Deadline se fija al recibir la petición y viaja en una variable de contexto,
+así que lo ven todas las etapas del grafo y las herramientas que se ejecutan en
+hilos que copian el contexto. Cada espera (HTTP, recuperación, crítica) pide su
+presupuesto con time_budget() en lugar de usar un timeout fijo.
+
+La misma instancia sirve como token de cancelación: cancel() la marca como
+agotada, p. ej. cuando el cliente se desconecta.
+"""
+import select
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+
+_current_deadline: ContextVar[Optional['Deadline']] = ContextVar('deadline', default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Se agotó el plazo de la petición o se canceló"""
+
+
+class Deadline:
+    """
+    Plazo absoluto de una petición
+
+    Args:
+        seconds: Segundos disponibles desde ahora
+    """
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.cancel_reason: Optional[str] = None
+        self.degradations: List[str] = []
+        self._cancelled = threading.Event()
+
+    def remaining(self) -> float:
+        if self._cancelled.is_set():
+            return 0.0
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def cancel(self, reason: str = "Petición cancelada"):
+        self.cancel_reason = reason
+        self._cancelled.set()
+
+    def check(self):
+        """Lanza DeadlineExceeded si el plazo se agotó o la petición se canceló"""
+        if self._cancelled.is_set():
+            raise DeadlineExceeded(self.cancel_reason)
+        if self.expired:
+            raise DeadlineExceeded(f"Se agotó el plazo de {self.seconds:.0f}s")
+
+    def degrade(self, reason: str):
+        """Registra una degradación aplicada para respetar el plazo"""
+        if reason not in self.degradations:
+            self.degradations.append(reason)
+
+
+@contextmanager
+def deadline_scope(deadline: Deadline):
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+
+def time_budget(cap: float, share: float = 1.0, floor: float = 1.0) -> float:
+    """
+    Segundos que puede esperar una operación
+
+    Args:
+        cap: Máximo propio de la operación (su timeout habitual)
+        share: Fracción del tiempo restante que puede consumir
+        floor: Mínimo, para no lanzar peticiones con timeout 0
+
+    Returns:
+        float: min(cap, restante * share), o cap si no hay plazo en el contexto
+    """
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return cap
+    return max(floor, min(cap, deadline.remaining() * share))
+
+
+def _peer_closed(sock: socket.socket) -> bool:
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+        if not readable:
+            return False
+        # Legible pero sin datos: el cliente cerró la conexión
+        return sock.recv(1, socket.MSG_PEEK) == b''
+    except (OSError, ValueError):
+        return True
+
+
+@contextmanager
+def watch_disconnect(sock: Optional[socket.socket], deadline: Deadline, interval: float = 0.5):
+    """
+    Cancela el deadline si el cliente cierra la conexión mientras dura el bloque
+
+    Sin socket (servidor que no lo expone) no hace nada.
+    """
+    if sock is None:
+        yield
+        return
+    finished = threading.Event()
+
+    def watch():
+        while not finished.wait(interval):
+            if _peer_closed(sock):
+                deadline.cancel("El cliente cerró la conexión")
+                return
+
+    threading.Thread(target=watch, name='disconnect-watcher', daemon=True).start()
+    try:
+        yield
+    finally:
+        finished.set()
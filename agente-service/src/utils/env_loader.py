@@ -1,5 +1,10 @@
 import os
-from dotenv import load_dotenv, find_dotenv
+
+try:
+    from dotenv import load_dotenv, find_dotenv
+except ImportError:
+    # Sin python-dotenv solo cuentan las variables ya definidas en el entorno
+    load_dotenv = find_dotenv = None
 
 # these expect to find a .env file at the directory above the lesson.
 # the format for that file is (without the comment)
@@ -7,6 +12,8 @@ from dotenv import load_dotenv, find_dotenv
 
 def load_env():
     """Carga las variables de entorno desde el archivo .env"""
+    if load_dotenv is None:
+        return
     _ = load_dotenv(find_dotenv())
 
 def get_openai_api_key():
@@ -0,0 +1,68 @@
+"""
+Event loop compartido para el controlador asíncrono
+
+Flask ejecuta cada vista `async def` con asgiref (async_to_sync), que crea un
+event loop por petición y lo cierra al terminar: las esperas de dos peticiones
+nunca se solapan en el mismo loop y cada una arranca su propio executor.
+SharedEventLoop mantiene un único loop en un hilo propio; la vista, síncrona,
+le entrega la corrutina y espera el resultado.
+
+La corrutina corre con una copia del contexto del hilo que la entrega, así que
+ve el id de petición, el perfilado y el cassette fijados en before_request. Lo
+que cambie en esas variables no vuelve al hilo de la petición.
+"""
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Coroutine, Optional
+
+
+class SharedEventLoop:
+    """
+    Loop de asyncio en un hilo daemon, compartido por todas las peticiones
+
+    Args:
+        executor_workers: Hilos del executor por defecto del loop (asyncio.to_thread),
+            compartido por todas las peticiones; None usa el tamaño por defecto de asyncio
+    """
+
+    def __init__(self, executor_workers: int = None):
+        self._loop = asyncio.new_event_loop()
+        if executor_workers:
+            self._loop.set_default_executor(ThreadPoolExecutor(max_workers=executor_workers,
+                                                               thread_name_prefix='shared-loop'))
+        self._thread = threading.Thread(target=self._loop.run_forever, name='shared-event-loop', daemon=True)
+        self._thread.start()
+
+    def run(self, coro: Coroutine) -> Any:
+        """Ejecuta la corrutina en el loop compartido y bloquea el hilo llamante hasta su resultado"""
+        result = Future()
+
+        def transfer(task: asyncio.Task):
+            if task.cancelled():
+                result.cancel()
+            elif task.exception() is not None:
+                result.set_exception(task.exception())
+            else:
+                result.set_result(task.result())
+
+        def start():
+            # La tarea copia el contexto actual, que aquí es el del hilo que la entregó
+            asyncio.ensure_future(coro).add_done_callback(transfer)
+
+        self._loop.call_soon_threadsafe(start, context=contextvars.copy_context())
+        return result.result()
+
+
+_shared_loop: Optional[SharedEventLoop] = None
+_shared_loop_lock = threading.Lock()
+
+
+def get_shared_event_loop(executor_workers: int = None) -> SharedEventLoop:
+    """Loop compartido por el proceso (executor_workers solo cuenta en la primera llamada)"""
+    global _shared_loop
+    with _shared_loop_lock:
+        if _shared_loop is None:
+            _shared_loop = SharedEventLoop(executor_workers)
+        return _shared_loop
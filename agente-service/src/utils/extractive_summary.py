@@ -0,0 +1,134 @@
+"""
+Resumen extractivo local (TF-IDF + TextRank con NumPy)
+
+Elige las frases más representativas de un conjunto de textos sin llamar a
+ningún modelo: cada frase es un vector TF-IDF, la similitud coseno entre
+frases forma un grafo y la centralidad de cada frase en ese grafo (PageRank
+por iteración de potencias) decide cuáles se conservan. Con una consulta,
+la puntuación se mezcla con la similitud de cada frase a la consulta.
+
+Se usa en el modo degradado, cuando no hay capacidad de LLM: el coste es de
+milisegundos para las decenas de frases de una búsqueda.
+"""
+import re
+import unicodedata
+from typing import List, Sequence
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r'\w+')
+# Palabras vacías frecuentes (español e inglés); el resto de términos cuenta en el TF-IDF
+_STOPWORDS = frozenset({
+    'a', 'al', 'ante', 'bajo', 'con', 'contra', 'de', 'del', 'desde', 'durante', 'en', 'entre',
+    'hacia', 'hasta', 'para', 'por', 'segun', 'sin', 'sobre', 'tras', 'el', 'la', 'los', 'las',
+    'un', 'una', 'unos', 'unas', 'lo', 'y', 'e', 'o', 'u', 'que', 'se', 'su', 'sus', 'es', 'son',
+    'como', 'mas', 'muy', 'ya', 'este', 'esta', 'estos', 'estas', 'ese', 'esa', 'le', 'les', 'no',
+    'si', 'ha', 'han', 'fue', 'ser', 'the', 'of', 'and', 'in', 'on', 'for', 'to', 'is', 'are'
+})
+
+
+def tokenize(text: str) -> List[str]:
+    """Términos de una frase: minúsculas, sin acentos ni palabras vacías"""
+    text = ''.join(c for c in unicodedata.normalize('NFD', (text or '').lower())
+                   if unicodedata.category(c) != 'Mn')
+    return [t for t in _TOKEN_RE.findall(text) if len(t) > 2 and not t.isdigit() and t not in _STOPWORDS]
+
+
+def tfidf_matrix(documents: Sequence[str], query: str = None):
+    """
+    Vectores TF-IDF normalizados (una fila por documento)
+
+    Args:
+        documents: Frases o textos
+        query: Si se pasa, se retorna también su vector en el mismo espacio
+
+    Returns:
+        tuple: (matriz documentos x términos, vector de la consulta o None)
+    """
+    tokenized = [tokenize(doc) for doc in documents]
+    vocabulary = {term: i for i, term in enumerate(sorted({t for tokens in tokenized for t in tokens}))}
+    matrix = np.zeros((len(documents), len(vocabulary)))
+    for row, tokens in enumerate(tokenized):
+        for term in tokens:
+            matrix[row, vocabulary[term]] += 1
+    # idf suavizado: los términos presentes en todas las frases no desaparecen del todo
+    idf = np.log((1 + len(documents)) / (1 + np.count_nonzero(matrix, axis=0))) + 1
+    matrix *= idf
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.where(norms == 0, 1, norms)
+
+    query_vector = None
+    if query is not None:
+        query_vector = np.zeros(len(vocabulary))
+        for term in tokenize(query):
+            if term in vocabulary:
+                query_vector[vocabulary[term]] += 1
+        query_vector *= idf
+        norm = np.linalg.norm(query_vector)
+        if norm:
+            query_vector /= norm
+    return matrix, query_vector
+
+
+def textrank(matrix, damping: float = 0.85, iterations: int = 50, tolerance: float = 1e-6):
+    """
+    Centralidad de cada fila en el grafo de similitud coseno (PageRank)
+
+    Args:
+        matrix: Vectores normalizados (tfidf_matrix)
+        damping: Factor de amortiguación de PageRank
+        iterations: Máximo de iteraciones de potencias
+        tolerance: Corte cuando la puntuación deja de cambiar
+
+    Returns:
+        np.ndarray: Puntuación de cada fila (suma 1)
+    """
+    n = matrix.shape[0]
+    if n == 0:
+        return np.zeros(0)
+    similarity = matrix @ matrix.T
+    np.fill_diagonal(similarity, 0)
+    out_weight = similarity.sum(axis=1, keepdims=True)
+    # Una frase sin parecido con ninguna reparte su peso por igual
+    transition = np.where(out_weight > 0, similarity / np.where(out_weight == 0, 1, out_weight), 1.0 / n)
+    scores = np.full(n, 1.0 / n)
+    for _ in range(iterations):
+        updated = (1 - damping) / n + damping * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < tolerance:
+            return updated
+        scores = updated
+    return scores
+
+
+def rank_sentences(sentences: Sequence[str], query: str = None, query_weight: float = 0.5,
+                   redundancy: float = 0.8) -> List[int]:
+    """
+    Índices de las frases ordenadas de más a menos representativa
+
+    Se descartan las casi repetidas (la misma frase copiada por varios medios).
+
+    Args:
+        sentences: Frases candidatas
+        query: Solicitud del usuario; las frases relacionadas suben
+        query_weight: Peso de la similitud con la consulta frente a TextRank (0 a 1)
+        redundancy: Similitud coseno a partir de la cual una frase repite a otra ya elegida
+
+    Returns:
+        List[int]: Índices en orden de puntuación
+    """
+    if not sentences:
+        return []
+    matrix, query_vector = tfidf_matrix(sentences, query)
+    scores = textrank(matrix)
+    scores = scores / (scores.max() or 1)
+    if query_vector is not None and query_vector.any():
+        scores = (1 - query_weight) * scores + query_weight * (matrix @ query_vector)
+
+    chosen: List[int] = []
+    for index in np.argsort(-scores, kind='stable'):
+        if not matrix[index].any():
+            continue
+        if chosen and (matrix[chosen] @ matrix[index]).max() >= redundancy:
+            continue
+        chosen.append(int(index))
+    return chosen
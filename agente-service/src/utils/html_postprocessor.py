@@ -0,0 +1,255 @@
+"""
+Post-procesado incremental del HTML final de la noticia
+
+Extrae el <article> de la salida del modelo (aunque venga envuelto en bloques
+```html o con comentarios antes/después), lo sanea, valida la estructura
+header/section/footer a medida que llegan los fragmentos y corrige lo que se
+puede corregir sin volver a llamar al modelo.
+"""
+import html
+import re
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+
+# Etiquetas que se eliminan junto con su contenido
+_DROP_WITH_CONTENT = {'script', 'style', 'iframe', 'object', 'embed', 'noscript', 'template'}
+# Etiquetas que se eliminan conservando su contenido
+_UNWRAP = {'html', 'head', 'body', 'form', 'input', 'button', 'textarea', 'select', 'link', 'meta', 'base'}
+_VOID = {'br', 'hr', 'img', 'wbr', 'source', 'col', 'area', 'track'}
+_URL_ATTRS = {'href', 'src'}
+# Etiquetas de bloque que cierran implícitamente un <p> abierto (como hace el navegador)
+_CLOSES_P = {'p', 'div', 'ul', 'ol', 'h1', 'h2', 'h3', 'h4', 'header', 'section', 'footer', 'blockquote', 'figure'}
+
+_FENCE_RE = re.compile(r'```[a-zA-Z]*')
+_START_RE = re.compile(r'<article[\s>]', re.IGNORECASE)
+_FALLBACK_START_RE = re.compile(r'<(header|h1|section)[\s>]', re.IGNORECASE)
+
+
+class _SanitizingParser(HTMLParser):
+    """Parser incremental que reconstruye el HTML saneado y registra la estructura"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.parts: List[str] = []
+        self.stack: List[str] = []
+        self.drop_depth = 0
+        self.closed = False
+        self.seen = {'header': False, 'h1': False, 'section': False, 'section_p': False, 'footer': False}
+        self.fixes: List[str] = []
+        self.section_without_class = False
+        self.trailing_text = False
+
+    def _clean_attrs(self, tag: str, attrs) -> str:
+        cleaned = []
+        for name, value in attrs:
+            name = name.lower()
+            if name.startswith('on'):
+                continue
+            if name in _URL_ATTRS and value and value.strip().lower().startswith(('javascript:', 'data:', 'vbscript:')):
+                continue
+            cleaned.append((name, value))
+        if tag == 'section' and not any(n == 'class' for n, _ in cleaned):
+            cleaned.append(('class', 'cuerpo'))
+            self.section_without_class = True
+        return ''.join(
+            f' {n}' if v is None else f' {n}="{html.escape(v, quote=True)}"'
+            for n, v in cleaned
+        )
+
+    def handle_starttag(self, tag, attrs):
+        if self.closed:
+            return
+        if self.drop_depth or tag in _DROP_WITH_CONTENT:
+            if tag not in _VOID:
+                self.drop_depth += 1
+            return
+        if tag in _UNWRAP:
+            return
+        if tag == 'article' and self.stack:
+            # <article> anidado: se ignora la etiqueta y se conserva el contenido
+            return
+        if tag in _CLOSES_P and self.stack and self.stack[-1] == 'p':
+            self.stack.pop()
+            self.parts.append('</p>')
+        if tag == 'h1' and 'header' in self.stack:
+            self.seen['h1'] = True
+        if tag == 'p' and 'section' in self.stack:
+            self.seen['section_p'] = True
+        if tag in self.seen:
+            self.seen[tag] = True
+        self.parts.append(f'<{tag}{self._clean_attrs(tag, attrs)}>')
+        if tag not in _VOID:
+            self.stack.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        if self.closed or self.drop_depth or tag in _DROP_WITH_CONTENT or tag in _UNWRAP:
+            return
+        self.parts.append(f'<{tag}{self._clean_attrs(tag, attrs)} />')
+
+    def handle_endtag(self, tag):
+        if self.closed:
+            return
+        if self.drop_depth:
+            if tag not in _VOID:
+                self.drop_depth -= 1
+            return
+        if tag in _UNWRAP or tag in _VOID or tag not in self.stack:
+            return
+        # Cerrar las etiquetas que quedaron abiertas dentro de la actual
+        while self.stack:
+            open_tag = self.stack.pop()
+            self.parts.append(f'</{open_tag}>')
+            if open_tag == tag:
+                break
+            self.fixes.append(f'Etiqueta <{open_tag}> sin cerrar')
+        if not self.stack:
+            self.closed = True
+
+    def handle_data(self, data):
+        if self.closed and _FENCE_RE.sub('', data).strip():
+            self.trailing_text = True
+        if not self.closed and not self.drop_depth and self.stack:
+            self.parts.append(data)
+
+    def handle_entityref(self, name):
+        self.handle_data(f'&{name};')
+
+    def handle_charref(self, name):
+        self.handle_data(f'&#{name};')
+
+    def handle_comment(self, data):
+        # Los comentarios HTML no forman parte de la noticia publicada
+        return
+
+
+class ArticleHTMLStream:
+    """
+    Procesador incremental del HTML de la noticia
+
+    Se alimenta con fragmentos (tokens o trozos de respuesta) mediante feed()
+    y se finaliza con close(), que retorna el resultado de la validación.
+    """
+
+    def __init__(self):
+        self._parser: Optional[_SanitizingParser] = None
+        self._pending = ''
+        self._raw: List[str] = []
+        self.fixes: List[str] = []
+
+    @property
+    def started(self) -> bool:
+        return self._parser is not None
+
+    @property
+    def complete(self) -> bool:
+        """True cuando ya se recibió el cierre de </article>"""
+        return self._parser is not None and self._parser.closed
+
+    def missing_sections(self) -> List[str]:
+        """Partes obligatorias que aún no han aparecido en lo recibido hasta ahora"""
+        if self._parser is None:
+            return ['article', 'header', 'h1', 'section', 'footer']
+        seen = self._parser.seen
+        return [name for name in ('header', 'h1', 'section', 'footer') if not seen[name]]
+
+    def feed(self, chunk: str):
+        """Procesa un nuevo fragmento de la salida del modelo"""
+        if not chunk:
+            return
+        if self.complete:
+            if _FENCE_RE.sub('', chunk).strip():
+                self._parser.trailing_text = True
+            return
+        self._raw.append(chunk)
+        if self._parser is not None:
+            self._parser.feed(chunk)
+            return
+
+        # Todavía no llegó <article>: descartar lo anterior (```html, comentarios del modelo)
+        self._pending += chunk
+        match = _START_RE.search(self._pending)
+        if match:
+            if _FENCE_RE.sub('', self._pending[:match.start()]).strip():
+                self.fixes.append('Texto antes de <article> eliminado')
+            elif '```' in self._pending[:match.start()]:
+                self.fixes.append('Bloque de código markdown eliminado')
+            self._parser = _SanitizingParser()
+            self._parser.feed(self._pending[match.start():])
+            self._pending = ''
+        else:
+            # Conservar solo la cola por si "<article" llega partido entre fragmentos
+            self._pending = self._pending[-4096:]
+
+    def _recover_without_root(self) -> bool:
+        """Si el modelo omitió <article>, envolver el primer bloque estructural"""
+        text = _FENCE_RE.sub('', ''.join(self._raw))
+        match = _FALLBACK_START_RE.search(text)
+        if not match:
+            return False
+        self._parser = _SanitizingParser()
+        self._parser.feed('<article>' + text[match.start():])
+        self.fixes.append('Raíz <article> añadida')
+        return True
+
+    def close(self) -> Dict:
+        """
+        Finaliza el procesado y valida la estructura
+
+        Returns:
+            Dict con el HTML saneado, las correcciones aplicadas, los errores que no se
+            pudieron corregir y si hace falta una reparación con el modelo
+        """
+        if self._parser is None and not self._recover_without_root():
+            return {
+                'html': '',
+                'valid': False,
+                'needs_repair': True,
+                'fixes': self.fixes,
+                'errors': ['No se encontró contenido HTML del artículo']
+            }
+
+        parser = self._parser
+        parser.close()
+        if not parser.closed:
+            if parser.stack != ['article']:
+                self.fixes.append('Etiquetas sin cerrar al final del artículo')
+            else:
+                self.fixes.append('Cierre </article> añadido')
+            while parser.stack:
+                parser.parts.append(f'</{parser.stack.pop()}>')
+            parser.closed = True
+        if parser.section_without_class:
+            self.fixes.append('Clase "cuerpo" añadida a <section>')
+        if parser.trailing_text:
+            self.fixes.append('Texto después de </article> eliminado')
+
+        errors = []
+        if not parser.seen['header'] or not parser.seen['h1']:
+            errors.append('Falta <header> con <h1>')
+        if not parser.seen['section'] or not parser.seen['section_p']:
+            errors.append('Falta <section class="cuerpo"> con párrafos')
+        if not parser.seen['footer']:
+            errors.append('Falta <footer> con las fuentes')
+
+        return {
+            'html': ''.join(parser.parts).strip(),
+            'valid': not errors,
+            'needs_repair': bool(errors),
+            'fixes': self.fixes + parser.fixes,
+            'errors': errors
+        }
+
+
+def postprocess_article_html(text: str) -> Dict:
+    """
+    Extrae, sanea y valida el HTML de una salida completa del modelo
+
+    Args:
+        text: Salida del modelo (puede incluir bloques markdown o comentarios)
+
+    Returns:
+        Dict: Resultado de ArticleHTMLStream.close()
+    """
+    stream = ArticleHTMLStream()
+    stream.feed(text or '')
+    return stream.close()
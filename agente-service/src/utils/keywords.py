@@ -0,0 +1,62 @@
+"""
+Palabras clave y tema de una solicitud
+
+Helpers de texto compartidos por la recuperación, la cola de trabajos, el
+archivo de artículos, el almacén de hechos y la reordenación por relevancia.
+"""
+import re
+import unicodedata
+from collections import Counter
+from typing import Iterable, List
+
+# Palabras vacías e instrucciones típicas de una solicitud ("escribe una noticia sobre...")
+_STOPWORDS = {
+    'a', 'al', 'ante', 'bajo', 'con', 'contra', 'de', 'del', 'desde', 'durante', 'en', 'entre',
+    'hacia', 'hasta', 'mediante', 'para', 'por', 'segun', 'sin', 'sobre', 'tras', 'el', 'la',
+    'los', 'las', 'un', 'una', 'unos', 'unas', 'lo', 'y', 'e', 'o', 'u', 'que', 'se', 'su',
+    'sus', 'es', 'son', 'como', 'mas', 'muy', 'ya', 'este', 'esta', 'estos', 'estas', 'ese',
+    'esa', 'le', 'les', 'no', 'si', 'the', 'of', 'and', 'in', 'on', 'for', 'to',
+    'escribe', 'genera', 'crea', 'redacta', 'noticia', 'noticias', 'articulo', 'informe',
+    'plan', 'objetivo', 'global', 'subtarea', 'subtareas', 'aspectos', 'clave', 'criterios',
+    'relevancia', 'investigar', 'informacion', 'fuentes', 'fuente', 'debe', 'deben', 'cada',
+    'analizar', 'identificar', 'incluir', 'tarea', 'tareas', 'datos', 'codigo', 'code01', 'code02'
+}
+
+
+def strip_accents(text: str) -> str:
+    return ''.join(
+        c for c in unicodedata.normalize('NFD', text)
+        if unicodedata.category(c) != 'Mn'
+    )
+
+
+def extract_keywords(text: str, limit: int = 5, exclude: Iterable[str] = ()) -> List[str]:
+    """
+    Extrae los términos más frecuentes de un texto, sin palabras vacías
+
+    Args:
+        text: Texto del que extraer palabras clave
+        limit: Número máximo de términos
+        exclude: Términos a ignorar (por ejemplo, los de la consulta original)
+
+    Returns:
+        List[str]: Palabras clave ordenadas por frecuencia
+    """
+    excluded = {strip_accents(t.lower()) for t in exclude}
+    tokens = re.findall(r'\w+', strip_accents((text or '').lower()))
+    counts = Counter(
+        t for t in tokens
+        if len(t) > 3 and not t.isdigit() and t not in _STOPWORDS and t not in excluded
+    )
+    return [term for term, _ in counts.most_common(limit)]
+
+
+def normalize_topic(solicitud: str) -> str:
+    """
+    Reduce una solicitud a su tema: palabras clave sin acentos, ordenadas
+
+    "Escribe una noticia sobre la IA en medicina" y "Noticia: medicina e IA"
+    producen la misma clave de enrutado.
+    """
+    keywords = sorted(set(extract_keywords(solicitud, limit=8)))
+    return ' '.join(keywords) or (solicitud or '').strip().lower()
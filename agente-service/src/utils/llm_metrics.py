@@ -0,0 +1,72 @@
+"""
+Métricas de uso de tokens y del cache de prefijos del proveedor
+
+OpenAI informa en cada respuesta cuántos tokens del prompt se sirvieron desde
+su cache (usage.prompt_tokens_details.cached_tokens). El callback acumula esos
+valores por modelo; si el proveedor no los informa, la llamada se cuenta sin
+tokens en cache.
+"""
+import threading
+from typing import Dict
+
+from src.utils.logger import get_logger
+
+try:
+    from langchain_core.callbacks import BaseCallbackHandler
+except ImportError:
+    BaseCallbackHandler = object
+
+logger = get_logger(__name__)
+
+
+class PromptCacheMetrics:
+    """Contadores acumulados por modelo (seguros entre hilos)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models: Dict[str, Dict[str, int]] = {}
+
+    def record(self, model: str, prompt_tokens: int, cached_tokens: int, completion_tokens: int):
+        with self._lock:
+            stats = self._models.setdefault(model, {
+                'calls': 0, 'prompt_tokens': 0, 'cached_tokens': 0, 'completion_tokens': 0
+            })
+            stats['calls'] += 1
+            stats['prompt_tokens'] += prompt_tokens
+            stats['cached_tokens'] += cached_tokens
+            stats['completion_tokens'] += completion_tokens
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Copia de los contadores con la tasa de acierto del cache por modelo"""
+        with self._lock:
+            result = {}
+            for model, stats in self._models.items():
+                result[model] = dict(stats)
+                result[model]['cache_hit_ratio'] = round(
+                    stats['cached_tokens'] / stats['prompt_tokens'], 3) if stats['prompt_tokens'] else 0.0
+            return result
+
+
+prompt_cache_metrics = PromptCacheMetrics()
+
+
+class PromptCacheCallback(BaseCallbackHandler):
+    """Callback de LangChain que lee el uso de tokens de cada respuesta del modelo"""
+
+    def __init__(self, metrics: PromptCacheMetrics = prompt_cache_metrics):
+        super().__init__()
+        self.metrics = metrics
+
+    def on_llm_end(self, response, **kwargs):
+        llm_output = getattr(response, 'llm_output', None) or {}
+        usage = llm_output.get('token_usage') or {}
+        if not usage:
+            return
+        details = usage.get('prompt_tokens_details') or {}
+        cached = (details.get('cached_tokens') if isinstance(details, dict) else getattr(details, 'cached_tokens', 0)) or 0
+        prompt_tokens = usage.get('prompt_tokens') or 0
+        model = llm_output.get('model_name') or 'desconocido'
+        self.metrics.record(model, prompt_tokens, cached, usage.get('completion_tokens') or 0)
+        logger.info("Uso de tokens", extra={'model': model, 'prompt_tokens': prompt_tokens,
+                                            'cached_tokens': cached,
+                                            'completion_tokens': usage.get('completion_tokens') or 0})
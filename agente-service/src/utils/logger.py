@@ -0,0 +1,145 @@
+"""
+Logging estructurado, no bloqueante y con id de correlación por petición
+
+Los registros se encolan con un QueueHandler y un QueueListener los escribe
+desde su propio hilo, así el hilo que atiende la petición no espera a stdout.
+Cada registro lleva el id de la petición (variable de contexto), que se hereda
+en las etapas del grafo y en los hilos que copian el contexto.
+
+La salida detallada de CrewAI (verbose) se activa solo en las peticiones
+muestreadas o marcadas para traza, de modo que producción queda en silencio
+pero una petición concreta puede seguirse paso a paso.
+"""
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+_request_id: ContextVar[Optional[str]] = ContextVar('request_id', default=None)
+_trace_enabled: ContextVar[bool] = ContextVar('trace_enabled', default=False)
+
+_listener: Optional[QueueListener] = None
+
+# Atributos estándar de LogRecord: el resto se considera contexto adicional
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'request_id'}
+
+
+class RequestContextFilter(logging.Filter):
+    """Añade el id de la petición actual a cada registro"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # Se evalúa al emitir (en el hilo de la petición), no en el hilo del listener
+        record.request_id = _request_id.get()
+        return True
+
+
+class ContextQueueHandler(QueueHandler):
+    """
+    QueueHandler que conserva la traza de la excepción por separado
+
+    El prepare() estándar pega la traza al mensaje y borra exc_info, así que el
+    formatter del listener ya no puede sacarla a su propio campo. Aquí se formatea
+    en exc_text (que cruza la cola sin problema) y el mensaje queda limpio.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JSONFormatter(logging.Formatter):
+    """Una línea JSON por registro: ts, level, logger, request_id, message y los campos de extra"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', None),
+            'message': record.getMessage()
+        }
+        entry.update({k: v for k, v in vars(record).items() if k not in _RESERVED})
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Formato legible para desarrollo local"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s')
+
+
+def setup_logging(level: str = 'INFO', json_format: bool = True):
+    """
+    Configura el logger raíz con un handler en cola (idempotente)
+
+    Args:
+        level: Nivel mínimo (DEBUG, INFO, WARNING...)
+        json_format: True para una línea JSON por registro, False para texto
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JSONFormatter() if json_format else TextFormatter())
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = ContextQueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter())
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(level.upper())
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(name)
+
+
+def start_request(request_id: Optional[str] = None, force_trace: bool = False, sample_rate: float = 0.0) -> str:
+    """
+    Fija el id de correlación y decide si la petición se traza en detalle
+
+    Args:
+        request_id: Id recibido (p. ej. cabecera X-Request-ID); si falta se genera uno
+        force_trace: Traza la petición aunque no salga en el muestreo
+        sample_rate: Fracción de peticiones (0.0 - 1.0) con salida detallada
+
+    Returns:
+        str: El id de la petición
+    """
+    request_id = request_id or uuid.uuid4().hex
+    _request_id.set(request_id)
+    _trace_enabled.set(force_trace or random.random() < sample_rate)
+    return request_id
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+def trace_enabled() -> bool:
+    """True si la petición actual debe producir la salida detallada de CrewAI"""
+    return _trace_enabled.get()
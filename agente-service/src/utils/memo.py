@@ -0,0 +1,157 @@
+"""
+Memoización de llamadas a herramientas en dos niveles
+
+1. Memo de la ejecución: un dict ligado a la generación en curso (variable de
+   contexto). Dentro de una misma ejecución la misma llamada nunca se repite,
+   aunque la entrada del cache de proceso haya caducado.
+2. Cache del proceso: LRU con TTL compartido entre ejecuciones, para que las
+   iteraciones de crítica y las peticiones sobre el mismo tema no vuelvan a
+   consultar el backend mientras el resultado siga fresco.
+"""
+import asyncio
+import functools
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from src.utils.cassette import current_cassette
+
+_run_memo: ContextVar[Optional[Dict]] = ContextVar('run_memo', default=None)
+_MISSING = object()
+_SPACES_RE = re.compile(r'\s+')
+
+
+class TTLCache:
+    """
+    Cache LRU con caducidad por entrada (seguro entre hilos)
+
+    Args:
+        max_entries: Entradas máximas; al superarlas se descarta la menos usada
+        ttl: Segundos de validez de cada entrada
+    """
+
+    def __init__(self, max_entries: int = 512, ttl: float = 600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'entries': len(self._data), 'hits': self.hits, 'misses': self.misses}
+
+
+def normalize_text(value: str) -> str:
+    """Minúsculas y espacios colapsados, para que "IA  médica" y "ia médica" sean la misma clave"""
+    return _SPACES_RE.sub(' ', str(value or '')).strip().lower()
+
+
+@contextmanager
+def run_scope():
+    """
+    Abre el memo de una ejecución (una generación de noticia)
+
+    Los hilos que copian el contexto (etapas del grafo) comparten el mismo dict.
+    Si ya hay un memo abierto se reutiliza.
+    """
+    if _run_memo.get() is not None:
+        yield
+        return
+    token = _run_memo.set({})
+    try:
+        yield
+    finally:
+        _run_memo.reset(token)
+
+
+def _lookup(cache: TTLCache, key):
+    """Resultado del memo de la ejecución o del cache de proceso, o _MISSING"""
+    memo = _run_memo.get()
+    if memo is not None and key in memo:
+        return memo[key]
+    # Con un cassette activo el cache de proceso se salta: cada llamada debe quedar
+    # grabada (o servirse desde el cassette) aunque otra petición la tuviera en cache
+    if current_cassette() is not None:
+        return _MISSING
+    result = cache.get(key, _MISSING)
+    if result is not _MISSING and memo is not None:
+        memo[key] = result
+    return result
+
+
+def _store(cache: TTLCache, key, result, cacheable: Callable[[Any], bool]):
+    if not cacheable(result):
+        return
+    cache.set(key, result)
+    memo = _run_memo.get()
+    if memo is not None:
+        memo[key] = result
+
+
+def memoize(cache: TTLCache, key_fn: Callable[..., Hashable],
+            cacheable: Callable[[Any], bool] = lambda result: True, name: str = None):
+    """
+    Decorador: memo de la ejecución y, debajo, cache de proceso con TTL
+
+    Funciona con funciones normales y con corrutinas.
+
+    Args:
+        cache: Cache de proceso compartido
+        key_fn: Recibe los mismos argumentos que la función y retorna la clave normalizada
+        cacheable: Decide si un resultado se guarda (p. ej. no guardar errores)
+        name: Prefijo de la clave (por defecto, el nombre de la función); una variante
+            síncrona y otra asíncrona con el mismo nombre comparten entradas
+    """
+    def decorator(fn):
+        prefix = name or fn.__name__
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                key = (prefix, key_fn(*args, **kwargs))
+                result = _lookup(cache, key)
+                if result is _MISSING:
+                    result = await fn(*args, **kwargs)
+                    _store(cache, key, result, cacheable)
+                return result
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (prefix, key_fn(*args, **kwargs))
+            result = _lookup(cache, key)
+            if result is _MISSING:
+                result = fn(*args, **kwargs)
+                _store(cache, key, result, cacheable)
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,278 @@
+"""
+Perfilado bajo demanda de una petición
+
+Un hilo muestrea cada pocos milisegundos las pilas (sys._current_frames) de los
+hilos que trabajan para la petición perfilada: el que la atiende y los que se
+unen con profiled_thread() (las etapas del grafo). Es un muestreo, no una
+traza, así que el coste es bajo y no depende de cuántas funciones se llamen.
+
+Por cada petición se guardan en el directorio de perfiles:
+- <id>.folded: pilas colapsadas ("a;b;c N"), entrada de flamegraph.pl o speedscope
+- <id>.json: resumen con duración, muestras, pilas más frecuentes y las
+  líneas con más memoria asignada según tracemalloc
+"""
+import asyncio
+import functools
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_active_profiler: ContextVar[Optional['SamplingProfiler']] = ContextVar('active_profiler', default=None)
+_profile_requested: ContextVar[bool] = ContextVar('profile_requested', default=False)
+
+# tracemalloc es global al proceso: se arranca con el primer perfil activo y se detiene con el último,
+# salvo que ya estuviera activo (PYTHONTRACEMALLOC, otra herramienta): entonces no es nuestro y no se detiene
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_owned = False
+
+
+class SamplingProfiler:
+    """
+    Perfilador por muestreo de un conjunto de hilos
+
+    Args:
+        interval: Segundos entre muestras
+        max_depth: Profundidad máxima de pila que se registra
+    """
+
+    def __init__(self, interval: float = 0.005, max_depth: int = 64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.duration = 0.0
+        self._threads: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._started = 0.0
+
+    def add_thread(self, ident: int):
+        with self._lock:
+            self._threads[ident] = self._threads.get(ident, 0) + 1
+
+    def remove_thread(self, ident: int):
+        with self._lock:
+            count = self._threads.get(ident, 0) - 1
+            if count > 0:
+                self._threads[ident] = count
+            else:
+                self._threads.pop(ident, None)
+
+    def _frame_stack(self, frame) -> str:
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            module = os.path.splitext(os.path.basename(code.co_filename))[0]
+            names.append(f"{module}:{code.co_name}")
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                idents = list(self._threads)
+            frames = sys._current_frames()
+            for ident in idents:
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.stacks[self._frame_stack(frame)] += 1
+            self.samples += 1
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._sampler = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        self.duration = time.perf_counter() - self._started
+
+    def collapsed(self) -> str:
+        """Pilas en formato colapsado, de la más frecuente a la menos"""
+        return '\n'.join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+@contextmanager
+def profiled_thread():
+    """
+    Incluye el hilo actual en el perfil activo del contexto (si lo hay)
+
+    Se usa en los hilos de trabajo que ejecutan parte de una petición, p. ej.
+    las etapas del grafo, que copian el contexto de la petición.
+    """
+    profiler = _active_profiler.get()
+    if profiler is None:
+        yield
+        return
+    ident = threading.get_ident()
+    profiler.add_thread(ident)
+    try:
+        yield
+    finally:
+        profiler.remove_thread(ident)
+
+
+def request_profiling(force: bool = False, sample_rate: float = 0.0) -> bool:
+    """
+    Decide si la petición actual se perfila (cabecera o muestreo)
+
+    Returns:
+        bool: True si se perfilará
+    """
+    requested = force or random.random() < sample_rate
+    _profile_requested.set(requested)
+    return requested
+
+
+def _start_tracemalloc():
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0:
+            _tracemalloc_owned = not tracemalloc.is_tracing()
+            if _tracemalloc_owned:
+                tracemalloc.start(10)
+        _tracemalloc_users += 1
+
+
+def _stop_tracemalloc():
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and _tracemalloc_owned:
+            tracemalloc.stop()
+            _tracemalloc_owned = False
+
+
+def _allocation_top(snapshot, baseline, top_n: int) -> List[Dict]:
+    # Se excluyen las asignaciones del propio perfilador
+    own = (tracemalloc.Filter(False, __file__), tracemalloc.Filter(False, tracemalloc.__file__))
+    stats = snapshot.filter_traces(own).compare_to(baseline.filter_traces(own), 'lineno')
+    return [{
+        'location': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+        'size_kb': round(stat.size_diff / 1024, 1),
+        'count': stat.count_diff
+    } for stat in stats[:top_n]]
+
+
+def _save_profile(output_dir: str, name: str, profiler: SamplingProfiler, allocations: List[Dict],
+                  top_n: int, request_id: Optional[str]) -> str:
+    os.makedirs(output_dir, exist_ok=True)
+    # El id de la petición viene de una cabecera: solo se conservan caracteres seguros para un nombre de archivo.
+    # No es único (el cliente puede repetirlo), así que el sufijo aleatorio evita pisar otro perfil del mismo segundo
+    safe_id = re.sub(r'[^A-Za-z0-9_.-]', '_', request_id or '')[:64].lstrip('.')
+    profile_id = '-'.join(filter(None, (time.strftime('%Y%m%d-%H%M%S'), safe_id, uuid.uuid4().hex[:12])))
+    with open(os.path.join(output_dir, f"{profile_id}.folded"), 'w', encoding='utf-8') as f:
+        f.write(profiler.collapsed())
+    summary = {
+        'id': profile_id,
+        'name': name,
+        'created': time.time(),
+        'duration': round(profiler.duration, 3),
+        'samples': profiler.samples,
+        'interval': profiler.interval,
+        'top_stacks': [{'stack': s, 'samples': c} for s, c in profiler.stacks.most_common(top_n)],
+        'top_allocations': allocations
+    }
+    with open(os.path.join(output_dir, f"{profile_id}.json"), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return profile_id
+
+
+@contextmanager
+def profile_block(name: str, output_dir: str, interval: float = 0.005, top_n: int = 25,
+                  request_id: Optional[str] = None):
+    """Perfila el bloque (hilo actual y los que se unan con profiled_thread) y guarda el resultado"""
+    profiler = SamplingProfiler(interval)
+    token = _active_profiler.set(profiler)
+    _start_tracemalloc()
+    baseline = tracemalloc.take_snapshot()
+    profiler.add_thread(threading.get_ident())
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        allocations = _allocation_top(tracemalloc.take_snapshot(), baseline, top_n)
+        _stop_tracemalloc()
+        _active_profiler.reset(token)
+        # Guardar el perfil no debe costar la respuesta (disco lleno, directorio sin permisos...)
+        try:
+            _save_profile(output_dir, name, profiler, allocations, top_n, request_id)
+        except OSError as e:
+            logger.warning("No se pudo guardar el perfil", extra={'profile': name, 'error': str(e)})
+
+
+def profiled(output_dir: str, interval: float = 0.005, top_n: int = 25,
+             request_id_getter: Callable[[], Optional[str]] = lambda: None):
+    """
+    Decorador: perfila la llamada solo si la petición lo pidió (request_profiling)
+
+    Funciona con funciones normales y con corrutinas.
+    """
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if not _profile_requested.get():
+                    return await fn(*args, **kwargs)
+                with profile_block(fn.__name__, output_dir, interval, top_n, request_id_getter()):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _profile_requested.get():
+                return fn(*args, **kwargs)
+            with profile_block(fn.__name__, output_dir, interval, top_n, request_id_getter()):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def list_profiles(output_dir: str, limit: int = 50) -> List[Dict]:
+    """
+    Resúmenes de los perfiles guardados, del más reciente al más antiguo
+
+    Returns:
+        List[Dict]: id, name, created, duration, samples y archivos de cada perfil
+    """
+    if not os.path.isdir(output_dir):
+        return []
+    profiles = []
+    for filename in sorted(os.listdir(output_dir), reverse=True):
+        if not filename.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(output_dir, filename), encoding='utf-8') as f:
+                summary = json.load(f)
+        except (OSError, ValueError):
+            continue
+        profiles.append({
+            'id': summary['id'],
+            'name': summary.get('name'),
+            'created': summary.get('created'),
+            'duration': summary.get('duration'),
+            'samples': summary.get('samples'),
+            'files': [filename, f"{summary['id']}.folded"]
+        })
+        if len(profiles) >= limit:
+            break
+    return profiles
@@ -0,0 +1,46 @@
+"""
+Diferencias entre dos versiones de un informe
+
+La reinvestigación suele reescribir el informe reordenando frases, así que se
+compara frase a frase (no línea a línea) y solo se listan las frases quitadas
+y añadidas, sin contexto: es lo que el Critic necesita para revisar una nueva
+versión sin volver a leerla entera.
+"""
+import re
+from difflib import SequenceMatcher
+from typing import List
+
+_SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+
+
+def split_sentences(text: str) -> List[str]:
+    """Frases del texto (líneas vacías y espacios repetidos descartados)"""
+    sentences = []
+    for line in (text or '').splitlines():
+        line = ' '.join(line.split())
+        if line:
+            sentences.extend(s for s in _SENTENCE_RE.split(line) if s)
+    return sentences
+
+
+def diff_report(old: str, new: str) -> str:
+    """
+    Frases quitadas ("- ") y añadidas ("+ ") entre dos versiones de un informe
+
+    Args:
+        old: Versión anterior
+        new: Versión nueva
+
+    Returns:
+        str: Una frase por línea; vacío si no hay cambios
+    """
+    old_sentences = split_sentences(old)
+    new_sentences = split_sentences(new)
+    lines = []
+    matcher = SequenceMatcher(None, old_sentences, new_sentences, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        lines.extend(f"- {s}" for s in old_sentences[i1:i2])
+        lines.extend(f"+ {s}" for s in new_sentences[j1:j2])
+    return '\n'.join(lines)
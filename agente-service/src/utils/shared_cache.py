@@ -0,0 +1,238 @@
+"""
+Cache compartido entre los procesos de un mismo host
+
+Con gunicorn cada worker tiene su propia memoria: un cache de proceso
+(src.utils.memo.TTLCache) arranca frío N veces y acierta N veces menos. Este
+cache vive en un archivo sqlite en modo WAL con mmap: todos los workers leen
+las mismas páginas mapeadas en memoria, sin servicio de red de por medio, y
+las escrituras de uno no bloquean las lecturas de los demás.
+
+Cada entrada tiene TTL y el archivo se mantiene por debajo de un tamaño
+máximo descartando las entradas menos usadas. Es un cache: cualquier error de
+sqlite (archivo bloqueado, disco lleno, valor corrupto) se trata como un fallo
+de cache y la llamada se ejecuta igual; si ni siquiera se puede crear el
+directorio del archivo, el cache queda desactivado.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from src.utils.cassette import current_cassette
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_MISSING = object()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    namespace TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache (accessed_at);
+"""
+
+
+def cache_key(namespace: str, parts) -> str:
+    """Clave estable de una llamada (las mismas partes dan la misma clave en todos los procesos)"""
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return f"{namespace}:{hashlib.sha256(raw.encode('utf-8')).hexdigest()}"
+
+
+class SharedCache:
+    """
+    Cache con TTL y tamaño acotado en un archivo sqlite compartido (WAL + mmap)
+
+    Args:
+        path: Archivo de la base de datos (en disco local; no sirve en NFS)
+        max_bytes: Tamaño máximo de los valores guardados; al superarlo se descartan los menos usados
+        ttl: Segundos de validez por defecto de cada entrada
+        evict_every: Escrituras entre dos revisiones de caducidad y tamaño
+    """
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024, ttl: float = 600, evict_every: int = 64):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.evict_every = evict_every
+        self.enabled = True
+        if os.path.dirname(path):
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            except OSError as e:
+                logger.warning("Cache compartido desactivado: no se pudo crear su directorio",
+                               extra={'path': path, 'error': str(e)})
+                self.enabled = False
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid = None
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.evicted = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        # Una conexión por proceso: la heredada de un fork (gunicorn --preload) no se puede usar
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=2, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # Las lecturas se sirven desde las páginas mapeadas, compartidas con los demás procesos
+            conn.execute(f"PRAGMA mmap_size={self.max_bytes * 2}")
+            conn.executescript(_SCHEMA)
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def get(self, key: str, default=None):
+        if not self.enabled:
+            return default
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connection()
+                row = conn.execute("SELECT value, expires_at, accessed_at FROM cache WHERE key = ?", (key,)).fetchone()
+                if row is None or row[1] <= now:
+                    self.misses += 1
+                    return default
+                # El último acceso se actualiza como mucho cada décimo de TTL: leer no debe escribir siempre
+                if now - row[2] > self.ttl / 10:
+                    conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+                value = json.loads(row[0])
+                self.hits += 1
+                return value
+            except (sqlite3.Error, ValueError):
+                # Un valor que no se puede leer cuenta como fallo de cache
+                self.errors += 1
+                return default
+
+    def set(self, key: str, value: Any, ttl: float = None):
+        if not self.enabled:
+            return
+        try:
+            raw = json.dumps(value, ensure_ascii=False)
+        except (TypeError, ValueError):
+            return
+        size = len(raw.encode('utf-8'))
+        if size > self.max_bytes / 10:
+            return
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connection()
+                conn.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?, ?)",
+                             (key, key.split(':', 1)[0], raw, size, now + (ttl or self.ttl), now))
+                self._writes += 1
+                if self._writes % self.evict_every == 0:
+                    self._evict(conn, now)
+            except sqlite3.Error:
+                self.errors += 1
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """Quita lo caducado y, si aún sobra, las entradas menos usadas hasta el 90% del máximo"""
+        self.evicted += conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,)).rowcount
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        target = self.max_bytes * 0.9
+        while total > target:
+            rows = conn.execute("SELECT key, size FROM cache ORDER BY accessed_at LIMIT 256").fetchall()
+            if not rows:
+                break
+            victims = []
+            for key, size in rows:
+                victims.append((key,))
+                total -= size
+                if total <= target:
+                    break
+            conn.executemany("DELETE FROM cache WHERE key = ?", victims)
+            self.evicted += len(victims)
+
+    def clear(self):
+        with self._lock:
+            try:
+                self._connection().execute("DELETE FROM cache")
+            except sqlite3.Error:
+                self.errors += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            try:
+                entries, size = self._connection().execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+            except sqlite3.Error:
+                entries, size = None, None
+            # hits/misses son de este proceso; entries/bytes, del archivo compartido
+            return {'path': self.path, 'enabled': self.enabled, 'entries': entries, 'bytes': size, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses, 'evicted': self.evicted, 'errors': self.errors}
+
+
+def _bypass(cache: Optional[SharedCache]) -> bool:
+    # Con un cassette activo cada llamada debe quedar grabada (o servirse desde el cassette)
+    return cache is None or not cache.enabled or current_cassette() is not None
+
+
+def shared_call(cache: Optional[SharedCache], namespace: str, parts, fn: Callable[[], Any],
+                cacheable: Callable[[Any], bool] = lambda result: True, ttl: float = None):
+    """
+    Resultado de fn desde el cache compartido, o ejecutándola y guardándolo
+
+    Args:
+        cache: Cache compartido (None lo desactiva)
+        namespace: Tipo de llamada (http, health, llm), prefijo de la clave
+        parts: Lo que identifica la llamada (método, URL, payload, prompt...)
+        fn: La llamada real
+        cacheable: Decide si un resultado se guarda (p. ej. no guardar errores)
+        ttl: Validez propia de estas entradas
+    """
+    if _bypass(cache):
+        return fn()
+    key = cache_key(namespace, parts)
+    result = cache.get(key, _MISSING)
+    if result is _MISSING:
+        result = fn()
+        if cacheable(result):
+            cache.set(key, result, ttl)
+    return result
+
+
+async def ashared_call(cache: Optional[SharedCache], namespace: str, parts, fn: Callable[[], Awaitable[Any]],
+                       cacheable: Callable[[Any], bool] = lambda result: True, ttl: float = None):
+    """Versión asíncrona de shared_call (sqlite se lee y escribe en un hilo: puede esperar al lock del archivo)"""
+    if _bypass(cache):
+        return await fn()
+    key = cache_key(namespace, parts)
+    result = await asyncio.to_thread(cache.get, key, _MISSING)
+    if result is _MISSING:
+        result = await fn()
+        if cacheable(result):
+            await asyncio.to_thread(cache.set, key, result, ttl)
+    return result
+
+
+_shared: Dict[str, SharedCache] = {}
+_shared_lock = threading.Lock()
+
+
+def get_shared_cache() -> Optional[SharedCache]:
+    """
+    Cache compartido del host, configurado por entorno, o None si está desactivado
+
+    SHARED_CACHE_ENABLED (true), SHARED_CACHE_PATH (data/shared_cache.sqlite3),
+    SHARED_CACHE_MAX_MB (256), SHARED_CACHE_TTL (600)
+    """
+    if os.getenv('SHARED_CACHE_ENABLED', 'true').lower() != 'true':
+        return None
+    path = os.getenv('SHARED_CACHE_PATH', os.path.join('data', 'shared_cache.sqlite3'))
+    with _shared_lock:
+        if path not in _shared:
+            _shared[path] = SharedCache(path, int(float(os.getenv('SHARED_CACHE_MAX_MB', 256)) * 1024 * 1024),
+                                        float(os.getenv('SHARED_CACHE_TTL', 600)))
+        return _shared[path]
@@ -0,0 +1,177 @@
+"""
+Utilidades para leer las salidas compactas (JSON) del plan y de la crítica
+
+Los modelos no siempre respetan el formato al pie de la letra: puede venir
+envuelto en ```json, precedido por "Final Answer:" o con texto alrededor,
+así que se busca el primer objeto JSON balanceado y se recurre a heurísticas
+si no hay ninguno.
+"""
+import json
+import re
+from typing import Dict, List, Optional
+
+_CODE_RE = re.compile(r'CODE0([12])')
+
+
+def extract_json_object(text: str) -> Optional[Dict]:
+    """
+    Extrae el primer objeto JSON válido de un texto
+
+    Args:
+        text: Salida del modelo
+
+    Returns:
+        Dict o None si no hay ningún objeto JSON válido
+    """
+    if not text:
+        return None
+    start = text.find('{')
+    while start != -1:
+        depth = 0
+        in_string = False
+        escaped = False
+        for i in range(start, len(text)):
+            char = text[i]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == '\\':
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char == '{':
+                depth += 1
+            elif char == '}':
+                depth -= 1
+                if depth == 0:
+                    try:
+                        value = json.loads(text[start:i + 1])
+                        if isinstance(value, dict):
+                            return value
+                    except ValueError:
+                        pass
+                    break
+        start = text.find('{', start + 1)
+    return None
+
+
+def _as_list(value) -> List:
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return value
+    return [value]
+
+
+def compact_plan(plan_text: str, max_chars: int = 1200) -> str:
+    """
+    Convierte el plan del Manager en un bloque corto de viñetas
+
+    El plan se inyecta en todos los prompts posteriores, así que se limita su
+    tamaño. Si el plan no viene en JSON se recorta el texto original.
+    """
+    plan = extract_json_object(plan_text)
+    if not plan:
+        text = (plan_text or '').strip()
+        return text if len(text) <= max_chars else text[:max_chars].rsplit(' ', 1)[0] + '…'
+
+    lines = []
+    if plan.get('objetivo'):
+        lines.append(f"Objetivo: {plan['objetivo']}")
+    for key, label in (('subtareas', 'Subtareas'), ('aspectos', 'Aspectos clave'),
+                       ('criterios', 'Criterios'), ('consultas', 'Consultas')):
+        items = [str(item) for item in _as_list(plan.get(key)) if item]
+        if items:
+            lines.append(f"{label}: " + '; '.join(items))
+    text = '\n'.join(lines)
+    return text if len(text) <= max_chars else text[:max_chars].rsplit(' ', 1)[0] + '…'
+
+
+def _parse_problems(value) -> List[Dict]:
+    problems = []
+    for item in _as_list(value):
+        if isinstance(item, dict):
+            problems.append({
+                'tipo': str(item.get('tipo', 'otro')),
+                'detalle': str(item.get('detalle', '')).strip()
+            })
+        elif item:
+            problems.append({'tipo': 'otro', 'detalle': str(item).strip()})
+    return problems
+
+
+def parse_critique(text: str) -> Dict:
+    """
+    Lee la salida de la crítica
+
+    Returns:
+        Dict con 'codigo' (CODE01/CODE02 o None si no se encontró), 'problemas'
+        (lista de dicts con tipo y detalle) y 'recomendaciones' (lista de str)
+    """
+    data = extract_json_object(text) or {}
+    code = str(data.get('codigo', '')).upper().strip()
+    if code not in ('CODE01', 'CODE02'):
+        # Sin JSON: tomar el último código mencionado (suele ser el veredicto)
+        matches = _CODE_RE.findall(text or '')
+        code = f'CODE0{matches[-1]}' if matches else None
+
+    return {
+        'codigo': code,
+        'problemas': _parse_problems(data.get('problemas')),
+        'recomendaciones': [str(r) for r in _as_list(data.get('recomendaciones')) if r]
+    }
+
+
+def format_critique_findings(critique: Dict) -> str:
+    """Texto compacto con los problemas y recomendaciones de la crítica"""
+    lines = [f"Veredicto: {critique.get('codigo') or 'sin código'}"]
+    for i, problem in enumerate(critique.get('problemas', []), 1):
+        lines.append(f"{i}. [{problem['tipo']}] {problem['detalle']}")
+    for recommendation in critique.get('recomendaciones', []):
+        lines.append(f"- Recomendación: {recommendation}")
+    return '\n'.join(lines)
+
+
+def parse_recritique(text: str, open_issues: List[Dict]) -> Dict:
+    """
+    Lee la salida de una crítica incremental (problemas abiertos + cambios del informe)
+
+    El código no lo decide el modelo: es CODE02 solo si se resolvieron todos los
+    problemas abiertos y no aparecieron nuevos. Sin JSON se lee como una crítica completa;
+    si tampoco trae código, los problemas abiertos siguen abiertos (CODE01), nunca se aprueba.
+
+    Args:
+        text: Salida del modelo
+        open_issues: Problemas abiertos, en el orden en que se numeraron en el prompt
+
+    Returns:
+        Dict como parse_critique, más 'resueltos' (problemas que se dieron por resueltos)
+    """
+    data = extract_json_object(text)
+    if not data:
+        critique = parse_critique(text)
+        if critique['codigo'] is None:
+            critique['codigo'] = 'CODE01'
+        if critique['codigo'] == 'CODE01' and not critique['problemas']:
+            critique['problemas'] = list(open_issues)
+        critique['resueltos'] = []
+        return critique
+
+    resolved_ids = set()
+    for item in _as_list(data.get('estado')):
+        if isinstance(item, dict) and str(item.get('resuelto')).lower() == 'true':
+            try:
+                resolved_ids.add(int(item.get('id')))
+            except (TypeError, ValueError):
+                continue
+
+    still_open = [issue for i, issue in enumerate(open_issues, 1) if i not in resolved_ids]
+    problems = still_open + _parse_problems(data.get('nuevos_problemas'))
+    return {
+        'codigo': 'CODE01' if problems else 'CODE02',
+        'problemas': problems,
+        'recomendaciones': [str(r) for r in _as_list(data.get('recomendaciones')) if r],
+        'resueltos': [issue for i, issue in enumerate(open_issues, 1) if i in resolved_ids]
+    }
@@ -0,0 +1,33 @@
+"""
+Proceso trabajador de la cola distribuida
+
+Uso:
+    REDIS_URL=redis://host:6379/0 WORKER_NODES=nodo-a,nodo-b python worker.py nodo-a
+
+Cada nodo atiende su propia cola; el servidor Flask enruta a cada nodo los
+temas que le corresponden en el anillo de hashing consistente, así las caches
+locales de cada trabajador se reutilizan entre solicitudes del mismo tema.
+"""
+
+import sys
+from src.config.settings import DISTRIBUTED_CONFIG, LOGGING_CONFIG
+from src.controllers.jobs_controller import run_admitted_job
+from src.services.job_queue import JobWorker, get_broker, is_local_broker
+from src.utils.logger import setup_logging
+
+if __name__ == '__main__':
+    setup_logging(LOGGING_CONFIG['level'], LOGGING_CONFIG['json'])
+    node_id = sys.argv[1] if len(sys.argv) > 1 else DISTRIBUTED_CONFIG["nodes"][0]
+    if node_id not in DISTRIBUTED_CONFIG["nodes"]:
+        print(f"⚠️  El nodo '{node_id}' no está en WORKER_NODES ({', '.join(DISTRIBUTED_CONFIG['nodes'])}); no recibirá trabajos")
+
+    broker = get_broker()
+    if is_local_broker(broker):
+        print("⚠️  REDIS_URL no está configurada: este trabajador no comparte cola con el servidor")
+
+    worker = JobWorker(node_id, run_admitted_job, broker)
+    try:
+        worker.run_forever()
+    except KeyboardInterrupt:
+        worker.stop()
+        print(f"👋 Trabajador '{node_id}' detenido")